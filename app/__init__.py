@@ -1,19 +1,33 @@
 from flask import Flask
 from config import Config
 from .extensions import db, login_manager, bcrypt, migrate
+from .database import engine_options, configure_engine
+from .image_store import UploadRequest
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.request_class = UploadRequest
 
     # Initialize extensions
+    if app.config['DATABASE_PROFILE_ENABLED']:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app)
     db.init_app(app)
+    if app.config['DATABASE_PROFILE_ENABLED']:
+        with app.app_context():
+            configure_engine(app, db.engine)
     bcrypt.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'login'
     login_manager.login_message_category = 'info'
     migrate.init_app(app, db)
 
+    from .models import user_cache
+    user_cache.init_app(app)
+
+    from . import metrics
+    metrics.init_app(app)
+
     # Import and register routes
     from .routes import init_routes
     init_routes(app)
@@ -0,0 +1,50 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def engine_options(app):
+    """Builds SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    Postgres gets an explicit connection pool, pre-ping and a server-side
+    statement timeout. SQLite needs no pool settings; its tuning is applied as
+    connection pragmas by configure_engine. Options already present in
+    SQLALCHEMY_ENGINE_OPTIONS win over the profile defaults.
+    """
+    config = app.config
+    options = {}
+    backend = make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+
+    if backend == 'postgresql':
+        options = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+            'connect_args': {
+                'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}",
+            },
+        }
+    elif backend == 'sqlite':
+        # Python's sqlite3 busy handler, on top of the busy_timeout pragma below
+        options = {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def configure_engine(app, engine):
+    """Registers the SQLite connection pragmas (WAL, busy_timeout, synchronous) on a new engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+    config = app.config
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the single writer instead of blocking on the rollback journal
+        cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        cursor.close()
+
@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from PIL import ImageDraw, ImageFont, ImageOps
+
+ANNOTATION_COLOR = "red"  # Enforce red color for all modifications
+FONT_CANDIDATES = ("arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf")
+
+
+@lru_cache(maxsize=32)
+def load_font(font_size):
+    """Loads the annotation font at the given size, cached so each size is read from disk only once per process."""
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, font_size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(font_size)
+    except TypeError:  # Pillow < 10.1 has no sized default font
+        return ImageFont.load_default()
+
+
+def to_absolute(coords, width, height):
+    """Converts [0,1] ratio coordinates to pixels in one pass.
+
+    Even positions are x values (scaled by width) and odd positions are y values
+    (scaled by height). Values outside [0,1] are treated as pixels already.
+    """
+    scales = (width, height)
+    return [coord * scales[index % 2] if 0 <= coord <= 1 else coord for index, coord in enumerate(coords)]
+
+
+def draw_modifications(img, modifications):
+    """Draws every modification onto img with a single ImageDraw canvas and returns the image.
+
+    The EXIF orientation is applied first, matching what the model saw after
+    preprocessing, so the relative coordinates land in the right place.
+    Palette and grayscale images are converted to RGB so the red marks keep their color.
+    """
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+    width, height = img.size
+    draw = ImageDraw.Draw(img)
+
+    for mod in modifications:
+        shape = mod.get('shape')
+        text = mod.get('text')
+        line_width = mod.get('line_width', 2)  # Default line width
+        font_size = mod.get('font_size', 16)  # Default font size
+        try:
+            coords = to_absolute(mod['coordinates'], width, height)
+
+            if shape == "circle":
+                # Assuming coords are [center_x, center_y, radius]
+                x, y, r = coords
+                draw.ellipse((x - r, y - r, x + r, y + r), outline=ANNOTATION_COLOR, width=line_width)
+            elif shape == "rectangle":
+                # Assuming coords are [x1, y1, x2, y2]
+                x0, y0, x1, y1 = coords
+                # Ensure that x0 < x1 and y0 < y1
+                x0, x1 = min(x0, x1), max(x0, x1)
+                y0, y1 = min(y0, y1), max(y0, y1)
+                draw.rectangle((x0, y0, x1, y1), outline=ANNOTATION_COLOR, width=line_width)
+            elif shape == "line":
+                # Assuming coords are [x1, y1, x2, y2]
+                draw.line(coords, fill=ANNOTATION_COLOR, width=line_width)
+
+            if text:
+                # Adjust position for text as needed
+                draw.text((coords[0], coords[1] + 10), text, fill=ANNOTATION_COLOR, font=load_font(font_size))
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            print(f"Warning: Skipping malformed image modification {mod}: {e}")
+
+    return img
+
+
+def _render_page(args):
+    # Top-level so it can be pickled for the process pool
+    from .gemini import apply_image_modifications
+
+    img_path, modifications, output_folder = args
+    return apply_image_modifications(img_path, modifications, output_folder)
+
+
+def render_pages(pages, output_folder="corrected_images", max_workers=None):
+    """Renders many annotated pages in a process pool.
+
+    Args:
+        pages (list of tuple): (img_path, modifications) pairs.
+        output_folder (str): The folder to save the modified images.
+        max_workers (int): Number of worker processes. Defaults to the CPU count.
+
+    Returns:
+        list of str: The output path for each page, or None where rendering failed, in input order.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    jobs = [(img_path, modifications, output_folder) for img_path, modifications in pages]
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_render_page(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_render_page, jobs))
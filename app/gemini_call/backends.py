@@ -0,0 +1,309 @@
+import collections
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+
+
+def payload_size(contents):
+    """Approximate request size in bytes: exact for inline blobs and text, raw pixel size for PIL images."""
+    if isinstance(contents, str):
+        return len(contents.encode('utf-8'))
+    total = 0
+    for part in contents:
+        if isinstance(part, str):
+            total += len(part.encode('utf-8'))
+        elif isinstance(part, ImageRef):
+            continue  # Already uploaded; the request only carries the reference
+        elif isinstance(part, dict):
+            total += len(part['data'])
+        elif hasattr(part, 'size') and hasattr(part, 'getbands'):
+            width, height = part.size
+            total += width * height * len(part.getbands())
+    return total
+
+
+class BackendError(Exception):
+    """Raised by a backend when a model call fails.
+
+    Args:
+        message (str): Description of the failure.
+        retryable (bool): Whether repeating the same call may succeed (e.g. quota or transient server errors).
+        status (int): HTTP status of the failed call when known, e.g. 429 for quota errors.
+        retry_after (float): Seconds the provider asked us to wait before retrying, when it said so.
+    """
+
+    def __init__(self, message, retryable=False, status=None, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.retry_after = retry_after
+
+
+class BlockedResponseError(BackendError):
+    """Raised when the provider answered but withheld the content, e.g. a safety block or no candidates.
+
+    Repeating the call gets the same answer, so it is never retried, and it
+    doesn't count towards the circuit breaker: the provider is up.
+    """
+
+
+class BackendResponse:
+    """The text of a model response plus any prompt feedback the provider attached to it."""
+
+    def __init__(self, text, prompt_feedback=None):
+        self.text = text
+        self.prompt_feedback = prompt_feedback
+
+
+class ImageRef:
+    """Reference to an image registered with a backend, usable in place of the image in generate() contents.
+
+    Args:
+        key (str): Content key the image was registered under.
+        handle: Backend-specific object that identifies the uploaded image.
+        expires_at (float): time.time() after which the backend may have dropped the image, or None.
+    """
+
+    def __init__(self, key, handle, expires_at=None):
+        self.key = key
+        self.handle = handle
+        self.expires_at = expires_at
+
+    def expired(self, margin=0):
+        return self.expires_at is not None and time.time() + margin >= self.expires_at
+
+
+class ImageRegistry:
+    """Per-process map of content key to ImageRef, shared by every exam a backend grades.
+
+    Problem images are registered once and then referenced from every page
+    request, so the same assignment is uploaded once across all students
+    rather than once per answer page.
+    """
+
+    # Re-upload this many seconds before a reference expires, so it can't lapse mid-exam
+    EXPIRY_MARGIN = 3600
+
+    def __init__(self):
+        self._refs = {}
+        self._lock = threading.Lock()
+        self.uploads = 0
+
+    def register_images(self, images, keys):
+        """Returns an ImageRef for each image, uploading only those not already registered under their key.
+
+        Args:
+            images (list): PIL images or inline {'mime_type', 'data'} blobs.
+            keys (list of str): A content key per image; equal keys must mean equal images.
+        """
+        refs = []
+        for image, key in zip(images, keys):
+            with self._lock:
+                ref = self._refs.get(key)
+            if ref is None or ref.expired(self.EXPIRY_MARGIN):
+                ref = self._upload(image, key)
+                with self._lock:
+                    self._refs[key] = ref
+                    self.uploads += 1
+            refs.append(ref)
+        return refs
+
+    def _upload(self, image, key):
+        raise NotImplementedError
+
+
+def encode_image(image):
+    """Returns (mime_type, bytes) for a PIL image or an inline blob."""
+    if isinstance(image, dict):
+        return image['mime_type'], image['data']
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return 'image/png', buffer.getvalue()
+
+
+class GeminiBackend(ImageRegistry):
+    """Grading backend that calls the Gemini API through google.generativeai.
+
+    Args:
+        model_name (str): The name of the Gemini model to use.
+        api_key (str): Gemini API key. Defaults to the GEMINI_API_KEY environment variable.
+    """
+
+    # Files uploaded through the File API are deleted by Gemini after 48 hours
+    FILE_TTL = 48 * 3600
+    # Quota exhaustion, server errors and timeouts can succeed on a later attempt
+    RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+    def __init__(self, model_name='gemini-1.5-flash', api_key=None):
+        import google.generativeai as genai
+
+        super().__init__()
+        self.model_name = model_name
+        self._genai = genai
+        genai.configure(api_key=api_key or os.environ.get('GEMINI_API_KEY'))
+        self._model = genai.GenerativeModel(model_name)
+
+    def _upload(self, image, key):
+        mime_type, data = encode_image(image)
+        uploaded = self._genai.upload_file(io.BytesIO(data), mime_type=mime_type, display_name=key[:40])
+        return ImageRef(key, uploaded, expires_at=time.time() + self.FILE_TTL)
+
+    def generate(self, contents, response_schema=None):
+        """Sends a list of images, ImageRefs and/or text (or a single prompt string) to the model and returns a BackendResponse.
+
+        With a response_schema the model is asked for JSON output matching it (structured output).
+        """
+        from google.api_core import exceptions as google_exceptions
+
+        if not isinstance(contents, str):
+            contents = [part.handle if isinstance(part, ImageRef) else part for part in contents]
+        try:
+            generation_config = None
+            if response_schema is not None:
+                generation_config = {'response_mime_type': 'application/json', 'response_schema': response_schema}
+            response = self._model.generate_content(contents, generation_config=generation_config)
+            response.resolve()
+        except google_exceptions.GoogleAPICallError as e:
+            status = int(e.code) if e.code is not None else None
+            raise BackendError(str(e), retryable=status in self.RETRYABLE_STATUSES, status=status) from e
+        try:
+            text = response.text
+        except ValueError as e:
+            # .text raises when the response was blocked or has no candidates
+            raise BlockedResponseError(f"Response has no text ({e}); prompt feedback: {response.prompt_feedback}") from e
+        return BackendResponse(text, response.prompt_feedback)
+
+
+class FakeBackend(ImageRegistry):
+    """Deterministic offline backend that returns canned grading JSON, for load testing without network access.
+
+    Scores are derived from a hash of the prompt, so the same page always gets
+    the same result regardless of call order or concurrency. Registered images
+    are kept in memory and count towards bytes_sent once, at upload time.
+
+    Args:
+        latency (float): Base seconds each call sleeps for.
+        jitter (float): Extra random seconds added to each call, uniformly in [0, jitter].
+        tail_rate (float): Probability in [0, 1] that a call is a straggler taking tail_latency extra seconds.
+        tail_latency (float): Extra seconds a straggler call takes.
+        error_rate (float): Probability in [0, 1] that a call raises a retryable BackendError.
+        rate_limit_rate (float): Probability in [0, 1] that a call fails with a 429 quota error.
+        quota_per_minute (int): Calls allowed in any 60-second window; calls beyond it fail with a 429,
+            like a provider quota. None means unlimited.
+        malformed_rate (float): Probability in [0, 1] that a call returns text that is not valid JSON.
+        empty_rate (float): Probability in [0, 1] that a page call answers "0" (no answers on the page).
+        questions_per_page (int): Number of page_results returned for each page.
+        seed (int): Seed for the random generator used for jitter and injected failures.
+        seconds_per_mb (float): Extra latency per MB of image payload, to model upload time.
+        model_name (str): Name reported as the backend's model, which also keys cached results.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, malformed_rate=0.0, empty_rate=0.0,
+                 questions_per_page=1, seed=0, seconds_per_mb=0.0, rate_limit_rate=0.0, quota_per_minute=None,
+                 tail_rate=0.0, tail_latency=0.0, model_name='fake'):
+        super().__init__()
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.empty_rate = empty_rate
+        self.questions_per_page = questions_per_page
+        self.seconds_per_mb = seconds_per_mb
+        self.rate_limit_rate = rate_limit_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.quota_per_minute = quota_per_minute
+        self.calls = 0
+        self.rate_limited = 0
+        self._recent_calls = collections.deque()
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _upload(self, image, key):
+        mime_type, data = encode_image(image)
+        with self._lock:
+            self.bytes_sent += len(data)
+        if self.seconds_per_mb:
+            time.sleep(self.seconds_per_mb * len(data) / (1024 * 1024))
+        return ImageRef(key, {'mime_type': mime_type, 'data': data})
+
+    def generate(self, contents, response_schema=None):
+        """Returns a canned response after the configured latency, or raises/garbles it per the configured rates.
+
+        response_schema is accepted for interface parity; malformed_rate still garbles responses, so
+        validation and re-asks can be exercised offline.
+        """
+        if not isinstance(contents, str):
+            for part in contents:
+                if isinstance(part, ImageRef) and self._refs.get(part.key) is not part:
+                    raise BackendError(f"Unknown image reference {part.key}")
+        payload_bytes = payload_size(contents)
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._recent_calls and self._recent_calls[0] <= now - 60:
+                self._recent_calls.popleft()
+            over_quota = self.quota_per_minute is not None and len(self._recent_calls) >= self.quota_per_minute
+            if over_quota or self._rng.random() < self.rate_limit_rate:
+                self.rate_limited += 1
+                retry_after = self._recent_calls[0] + 60 - now if over_quota else None
+                raise BackendError("429 Resource has been exhausted (fake quota)", retryable=True, status=429,
+                                   retry_after=retry_after)
+            self._recent_calls.append(now)
+            self.bytes_sent += payload_bytes
+            delay = self.latency + self._rng.uniform(0, self.jitter) if self.jitter else self.latency
+            if self.tail_rate and self._rng.random() < self.tail_rate:
+                delay += self.tail_latency
+            roll = self._rng.random()
+        delay += self.seconds_per_mb * payload_bytes / (1024 * 1024)
+        if delay:
+            time.sleep(delay)
+
+        if roll < self.error_rate:
+            raise BackendError("Injected fake backend error", retryable=True)
+
+        if isinstance(contents, str):  # A text-only call is the overall feedback request
+            return BackendResponse("Fake feedback: strongest and weakest areas are summarized here.")
+
+        # The grading prompt is the first text part; re-asks append more text after it
+        prompt = next((part for part in contents if isinstance(part, str)), "")
+        if roll < self.error_rate + self.malformed_rate:
+            return BackendResponse("This is not JSON")
+        if roll < self.error_rate + self.malformed_rate + self.empty_rate:
+            return BackendResponse("0")
+
+        page_results = []
+        image_modifications = []
+        for q in range(self.questions_per_page):
+            score = int(hashlib.sha256(f"{q}:{prompt}".encode('utf-8')).hexdigest()[:8], 16) % 11
+            page_results.append({
+                "question_number": q + 1,
+                "score": score,
+                "analysis": f"Fake analysis for question {q + 1}.",
+            })
+            image_modifications.append({
+                "shape": "rectangle",
+                "color": "red",
+                "coordinates": [0.1, 0.1 + 0.2 * q, 0.6, 0.25 + 0.2 * q],
+                "line_width": 2,
+                "font_size": 16,
+                "text": f"Check question {q + 1}",
+                "question_number": q + 1,
+            })
+        text = json.dumps({"page_results": page_results, "image_modifications": image_modifications})
+        return BackendResponse(f"```json\n{text}\n```")
+
+
+def get_backend(name='gemini', **kwargs):
+    """Creates a grading backend by name ('gemini' or 'fake')."""
+    if name == 'gemini':
+        return GeminiBackend(**kwargs)
+    if name == 'fake':
+        return FakeBackend(**kwargs)
+    raise ValueError(f"Unknown grading backend: {name}")
@@ -0,0 +1,445 @@
+import json
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from .gemini import ProblemSet, grade_answer_gemini
+from .pages import PageSource
+
+# Multi-page TIFFs and PDFs count as one file but are graded page by page
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.tif', '.tiff', '.pdf')
+
+
+def _page_files(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def find_submissions(path):
+    """Collects student submissions from a class folder.
+
+    Each subfolder is one student whose answer pages are the images inside it,
+    in file name order. Image files directly inside path are single-file
+    submissions named after the file, e.g. one scanned PDF per student.
+
+    Returns:
+        dict: Student id -> list of answer file paths, sorted by student id.
+    """
+    submissions = {}
+    for name in sorted(os.listdir(path)):
+        full_path = os.path.join(path, name)
+        if os.path.isdir(full_path):
+            pages = _page_files(full_path)
+            if pages:
+                submissions[name] = pages
+        elif name.lower().endswith(IMAGE_EXTENSIONS):
+            submissions[os.path.splitext(name)[0]] = [full_path]
+    return submissions
+
+
+def summarize_class(student_results, elapsed):
+    """Builds the class summary: score statistics, per-question averages and throughput.
+
+    Args:
+        student_results (dict): Student id -> grade_answer_gemini results, or None where grading failed.
+        elapsed (float): Wall-clock seconds the batch took.
+    """
+    graded = {student: results for student, results in student_results.items() if results is not None}
+    final_scores = [results["final_score"] for results in graded.values()]
+    pages = sum(len(results["image_modifications"]) for results in graded.values())
+    blank_pages = sum(len(results.get("blank_pages", [])) for results in graded.values())
+
+    question_scores = {}
+    for results in graded.values():
+        for question_number, score in zip(results["question_numbers"], results["scores"]):
+            if question_number is not None:
+                question_scores.setdefault(str(question_number), []).append(score)
+
+    return {
+        "students": len(student_results),
+        "graded": len(graded),
+        "failed": sorted(student for student, results in student_results.items() if results is None),
+        "pages": pages,
+        "blank_pages_skipped": blank_pages,  # Model calls saved by blank-page detection
+        "elapsed_seconds": elapsed,
+        "pages_per_minute": pages * 60 / elapsed if elapsed else None,
+        "final_score": {
+            "mean": statistics.mean(final_scores) if final_scores else None,
+            "median": statistics.median(final_scores) if final_scores else None,
+            "min": min(final_scores, default=None),
+            "max": max(final_scores, default=None),
+        },
+        "question_averages": {number: statistics.mean(scores) for number, scores in sorted(question_scores.items())},
+    }
+
+
+def grade_class(problem_images, submissions, grading_standards, scoring_difficulty, max_workers=8, backend=None,
+                cache=None, preprocess=None, timings=None, on_student_result=None, blank_page=None):
+    """Grades every student of one assignment against the same problem set and rubric.
+
+    The problem images are loaded, preprocessed and registered with the
+    backend once for the whole class. Answer pages from all students go
+    through one shared pool of max_workers threads, so a student with few
+    pages never leaves workers idle. A page is only decoded while a worker
+    grades it, so at most max_workers answer images are held in memory.
+
+    Args:
+        problem_images (list of str or bytes): Paths to problem images.
+        submissions (dict): Student id -> list of answer page paths (see find_submissions).
+        grading_standards (str): Textual description of the grading standards.
+        scoring_difficulty (int): A value between 1-10 representing the stringency of grading.
+        max_workers (int): Answer pages graded concurrently across the whole class.
+        backend (GeminiBackend or FakeBackend): Backend used for model calls. Defaults to a GeminiBackend.
+        cache (ResponseCache): Optional cache of parsed page results.
+        preprocess (dict): Keyword arguments for preprocess_image, or None to send images as loaded.
+        timings (StageTimings): Optional collector for per-stage durations.
+        on_student_result (callable): Optional callback invoked as on_student_result(student_id, results)
+            as soon as each student is finished, in completion order. results is None if grading failed.
+        blank_page (dict): Blank-page detection options for grade_answer_gemini, or None to grade every page.
+
+    Returns:
+        dict: {"students": student id -> results (or None), "summary": summarize_class output}.
+    """
+    start = time.perf_counter()
+    problem_set = ProblemSet(problem_images, preprocess, timings)
+    student_results = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as page_pool, \
+            ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(submissions)))) as student_pool:
+        # Student threads only dispatch pages to page_pool and wait, then make the feedback call
+        futures = {
+            student_pool.submit(grade_answer_gemini, None, answer_images, grading_standards, scoring_difficulty,
+                                cache=cache, backend=backend, timings=timings, problem_set=problem_set,
+                                executor=page_pool, blank_page=blank_page): student
+            for student, answer_images in submissions.items()
+        }
+        for future in as_completed(futures):
+            student = futures[future]
+            student_results[student] = future.result()
+            if on_student_result is not None:
+                on_student_result(student, student_results[student])
+
+    student_results = {student: student_results[student] for student in submissions}
+    return {
+        "students": student_results,
+        "summary": summarize_class(student_results, time.perf_counter() - start),
+    }
+
+
+def write_class_results(class_results, output_dir):
+    """Writes one <student>.json per graded student plus class_summary.json to output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    for student, results in class_results["students"].items():
+        if results is None:
+            continue
+        file_name = re.sub(r'[^A-Za-z0-9._-]', '_', student) + '.json'
+        with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    with open(os.path.join(output_dir, 'class_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(class_results["summary"], f, indent=2)
+
+
+def load_manifest(path):
+    """Reads a batch manifest.
+
+    The manifest is a JSON object whose top-level "problems", "standards" (or
+    "standards_file") and "difficulty" are defaults for every submission, plus
+    a "submissions" list. Each submission has an "id" and its "answers" (page
+    images, multi-page TIFFs or PDFs) and may override any default. Relative paths are resolved against
+    the manifest's folder.
+
+    Returns:
+        list of dict: One {"id", "answers", "problems", "standards", "difficulty"} per submission.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    def resolve(paths):
+        return [os.path.join(base, p) for p in paths]
+
+    def read_standards(entry, default):
+        if entry.get('standards_file'):
+            with open(os.path.join(base, entry['standards_file']), encoding='utf-8') as f:
+                return f.read()
+        return entry.get('standards', default)
+
+    defaults = {
+        'problems': resolve(manifest.get('problems', [])),
+        'standards': read_standards(manifest, None),
+        'difficulty': manifest.get('difficulty', 5),
+    }
+    submissions = []
+    seen = set()
+    for entry in manifest['submissions']:
+        submission_id = str(entry['id'])
+        if submission_id in seen:
+            raise ValueError(f"Duplicate submission id in manifest: {submission_id}")
+        seen.add(submission_id)
+        submission = {
+            'id': submission_id,
+            'answers': resolve(entry['answers']),
+            'problems': resolve(entry['problems']) if 'problems' in entry else defaults['problems'],
+            'standards': read_standards(entry, defaults['standards']),
+            'difficulty': entry.get('difficulty', defaults['difficulty']),
+        }
+        if not submission['standards']:
+            raise ValueError(f"Submission {submission_id} has no grading standards")
+        submissions.append(submission)
+    return submissions
+
+
+class Checkpoint:
+    """Append-only JSONL record of graded pages and finished submissions, so an interrupted batch can resume.
+
+    Every line is flushed and fsynced before the next one is written. A line
+    cut short by a crash is ignored on load. Page records carry the page's
+    input fingerprint, so resuming with a changed rubric or page regrades it
+    instead of reusing a stale result.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}  # submission id -> {page index: page record}
+        self.submissions = {}  # submission id -> submission record
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn write from an interrupted run
+                    self._apply(record)
+        self._file = open(path, 'a+', encoding='utf-8')
+        if self._file.tell():
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != '\n':
+                self._file.write('\n')  # Don't glue the next record onto a torn line
+        self._lock = threading.Lock()
+
+    def _apply(self, record):
+        if record.get('type') == 'page':
+            self.pages.setdefault(record['submission'], {})[record['page']] = record
+        elif record.get('type') == 'submission':
+            self.submissions[record['submission']] = record
+
+    def append(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(record)
+
+    def previous_pages(self, submission_id, num_pages):
+        """Checkpointed page records for a submission in grade_answer_gemini's previous_pages format."""
+        pages = self.pages.get(submission_id, {})
+        return [pages.get(i) for i in range(num_pages)]
+
+    def close(self):
+        self._file.close()
+
+
+# Per-process state of the batch workers, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(records, backend_name, backend_options, scheduler_options, breaker_options, cache_options, preprocess,
+                 blank_page, max_workers):
+    from .backends import get_backend
+    from .cache import ResponseCache
+    from .scheduler import CircuitBreaker, ModelScheduler, ScheduledBackend
+
+    # Ctrl+C reaches the whole process group; only the parent handles it, so workers stop cleanly on shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker['records'] = records
+    scheduler = ModelScheduler(breaker=CircuitBreaker(**breaker_options), **scheduler_options)
+    _worker['backend'] = ScheduledBackend(get_backend(backend_name, **backend_options), scheduler)
+    _worker['cache'] = ResponseCache(**cache_options) if cache_options else None
+    _worker['preprocess'] = preprocess
+    _worker['blank_page'] = blank_page
+    _worker['max_workers'] = max_workers
+
+
+def _grade_submission(submission, previous_pages, previous_feedback):
+    """Runs in a worker process. Page records are sent to the parent as they finish; returns the submission record.
+
+    An 'end' record follows the submission's last page record through the
+    same queue, so the parent knows when every page record has arrived.
+    """
+    records = _worker['records']
+
+    def send_page(record):
+        records.put(dict(record, type='page', submission=submission['id']))
+
+    try:
+        results = grade_answer_gemini(submission['problems'], submission['answers'], submission['standards'],
+                                      submission['difficulty'], max_workers=_worker['max_workers'],
+                                      cache=_worker['cache'], backend=_worker['backend'],
+                                      preprocess=_worker['preprocess'], blank_page=_worker['blank_page'],
+                                      previous_pages=previous_pages, previous_feedback=previous_feedback,
+                                      on_page_record=send_page)
+    finally:
+        records.put({'type': 'end', 'submission': submission['id']})
+    if results is None:
+        return {'type': 'submission', 'submission': submission['id'], 'status': 'failed'}
+    return {
+        'type': 'submission',
+        'submission': submission['id'],
+        'status': 'done' if all(results['page_fingerprints']) else 'incomplete',
+        'final_score': results['final_score'],
+        'feedback': results['feedback'],
+        'feedback_fingerprint': results['feedback_fingerprint'],
+        'page_fingerprints': results['page_fingerprints'],
+        'blank_pages': results['blank_pages'],
+    }
+
+
+def count_pages(answer_files):
+    """Returns (pages, None) for a submission's answer files, or (0, error message) if one is missing or unreadable.
+
+    Only frame counts are read; a multi-page TIFF or PDF is one file but many pages.
+    """
+    try:
+        return len(PageSource(answer_files)), None
+    except Exception as e:
+        return 0, str(e)
+
+
+class Progress:
+    """Pages done, throughput and ETA for a batch run, printed at most every interval seconds."""
+
+    def __init__(self, total_pages, done_pages, interval=2.0):
+        self.total_pages = total_pages
+        self.resumed_pages = done_pages
+        self.done_pages = done_pages
+        self.interval = interval
+        self.start = time.monotonic()
+        self._last_print = 0.0
+
+    def pages_per_minute(self):
+        elapsed = time.monotonic() - self.start
+        graded = self.done_pages - self.resumed_pages
+        return graded * 60 / elapsed if elapsed and graded else 0.0
+
+    def update(self, pages=1, force=False):
+        self.done_pages += pages
+        now = time.monotonic()
+        if not force and now - self._last_print < self.interval:
+            return
+        self._last_print = now
+        rate = self.pages_per_minute()
+        remaining = self.total_pages - self.done_pages
+        eta = time.strftime('%H:%M:%S', time.gmtime(remaining / rate * 60)) if rate else '--:--:--'
+        print(f"{self.done_pages}/{self.total_pages} pages ({self.done_pages / self.total_pages:.1%}), "
+              f"{rate:.1f} pages/min, ETA {eta}", flush=True)
+
+
+def run_manifest(submissions, checkpoint, processes=2, max_workers=4, backend_name='gemini', backend_options=None,
+                 scheduler_options=None, breaker_options=None, cache_options=None, preprocess=None, blank_page=None):
+    """Grades every submission not yet finished in the checkpoint, across a pool of worker processes.
+
+    Submissions already recorded as done are skipped. For the rest, pages
+    whose checkpointed fingerprint still matches are reused, so an
+    interrupted run loses at most the pages that were in flight. The parent
+    process is the only writer of the checkpoint.
+
+    Args:
+        submissions (list of dict): Entries from load_manifest.
+        checkpoint (Checkpoint): Where page and submission records are appended.
+        processes (int): Worker processes; each grades one submission at a time.
+        max_workers (int): Pages graded concurrently inside each worker process.
+        backend_name (str): 'gemini' or 'fake'.
+        backend_options (dict): Keyword arguments for get_backend.
+        scheduler_options (dict): Keyword arguments for each process's ModelScheduler; split rate limits across processes.
+        breaker_options (dict): Keyword arguments for each process's CircuitBreaker.
+        cache_options (dict): Keyword arguments for each process's ResponseCache, or None for no cache.
+        preprocess (dict): Keyword arguments for preprocess_image, or None.
+        blank_page (dict): Blank-page detection options for grade_answer_gemini, or None to grade every page.
+
+    Returns:
+        dict: Submission id -> submission record, for every submission in the manifest that has one.
+    """
+    page_counts = {}
+    pending = []
+    for s in submissions:
+        record = checkpoint.submissions.get(s['id'], {})
+        if record.get('status') == 'done':
+            # Finished submissions aren't opened again; their page count is in the checkpoint
+            page_counts[s['id']] = len(record.get('page_fingerprints', []))
+            continue
+        page_counts[s['id']], error = count_pages(s['answers'])
+        if error is not None:
+            # One missing or corrupt file fails its own submission, not the whole run
+            checkpoint.append({'type': 'submission', 'submission': s['id'], 'status': 'failed', 'error': error})
+            print(f"{s['id']}: failed, {error}", flush=True)
+            continue
+        pending.append(s)
+    total_pages = sum(page_counts.values())
+    reusable = sum(1 for s in pending for record in checkpoint.previous_pages(s['id'], page_counts[s['id']]) if record)
+    progress = Progress(total_pages, total_pages - sum(page_counts[s['id']] for s in pending) + reusable)
+    print(f"{len(submissions) - len(pending)} submissions done or unreadable, {len(pending)} to grade "
+          f"({reusable} pages reusable from the checkpoint)", flush=True)
+
+    records = multiprocessing.Queue()
+    stop = threading.Event()
+    ended = {s['id']: threading.Event() for s in pending}  # Set once a submission's 'end' record is read
+
+    def write_page_records():
+        while not stop.is_set() or not records.empty():
+            try:
+                record = records.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if record['type'] == 'end':
+                ended[record['submission']].set()
+                continue
+            previous = checkpoint.pages.get(record['submission'], {}).get(record['page'])
+            reused = previous is not None and previous.get('fingerprint') == record['fingerprint']
+            if not reused:
+                checkpoint.append(record)
+                progress.update()
+
+    writer = threading.Thread(target=write_page_records, daemon=True)
+    writer.start()
+    initargs = (records, backend_name, backend_options or {}, scheduler_options or {}, breaker_options or {},
+                cache_options, preprocess, blank_page, max_workers)
+    executor = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=initargs)
+    try:
+        futures = {}
+        for submission in pending:
+            record = checkpoint.submissions.get(submission['id'], {})
+            previous_feedback = ({'fingerprint': record['feedback_fingerprint'], 'feedback': record['feedback']}
+                                 if record.get('feedback_fingerprint') else None)
+            previous_pages = checkpoint.previous_pages(submission['id'], page_counts[submission['id']])
+            futures[executor.submit(_grade_submission, submission, previous_pages, previous_feedback)] = submission
+        for future in as_completed(futures):
+            submission = futures[future]
+            try:
+                record = future.result()
+                end_timeout = None
+            except Exception as e:
+                record = {'type': 'submission', 'submission': submission['id'], 'status': 'failed', 'error': str(e)}
+                # A worker that died outright never sends its 'end' record
+                end_timeout = 5.0
+            # The submission record must not be checkpointed before its page records, which arrive ahead of 'end'
+            ended[submission['id']].wait(end_timeout)
+            checkpoint.append(record)
+            print(f"{submission['id']}: {record['status']}"
+                  + (f", score {record['final_score']}" if 'final_score' in record else ''), flush=True)
+    except KeyboardInterrupt:
+        print("Interrupted; finished pages are saved in the checkpoint, rerun the same command to resume.", flush=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        stop.set()
+        writer.join()
+        progress.update(0, force=True)
+
+    return {s['id']: checkpoint.submissions[s['id']] for s in submissions if s['id'] in checkpoint.submissions}
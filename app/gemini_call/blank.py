@@ -0,0 +1,122 @@
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+# Thresholds used when a blank_page options dict leaves them out
+DEFAULT_THUMBNAIL_SIZE = 512  # pixels, longest edge the page is analysed at
+DEFAULT_INK_DELTA = 40  # grey levels away from the paper for a pixel to count as ink
+DEFAULT_MAX_INK_RATIO = 0.0002  # share of ink pixels a blank page may have; about 40 at the default size
+DEFAULT_MAX_STD = 8.0  # standard deviation of the difference from the paper a blank page may have, in grey levels
+MIN_STROKE_PIXELS = 6  # smallest group of touching ink pixels that counts; smaller ones are dust
+MAX_GROUPED_INK_RATIO = 0.05  # above this share of ink, pixels aren't grouped into strokes at all
+
+
+def page_extremes(img, size=DEFAULT_THUMBNAIL_SIZE):
+    """Returns the darkest and the lightest pixel of each block of an upright grayscale copy of a page.
+
+    Blocks are square and sized so the result is about size pixels on the
+    longest edge. Transparency is flattened onto white first. Box averaging
+    would blend a stroke a pixel or two wide on a 300 dpi scan into the
+    paper; a block's extreme pixel keeps it at full contrast.
+
+    Returns:
+        tuple: (darkest, lightest) uint8 arrays of the same shape.
+    """
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ('RGBA', 'LA', 'P', 'PA'):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGBA', img.size, 'white')
+        img = Image.alpha_composite(background, rgba)
+    page = np.asarray(img.convert('L'))
+    height, width = page.shape
+    factor = max(1, -(-max(height, width) // size))
+    page = np.pad(page, ((0, -height % factor), (0, -width % factor)), mode='edge')
+    blocks = page.reshape(page.shape[0] // factor, factor, page.shape[1] // factor, factor)
+    return blocks.min(axis=(1, 3)), blocks.max(axis=(1, 3))
+
+
+def template_thumbnail(img, size=DEFAULT_THUMBNAIL_SIZE):
+    """Returns a problem sheet's darkest-pixel thumbnail with its print thickened by one pixel.
+
+    Comparing an answer page against the darkest template pixel nearby
+    tolerates the pixel or two of misalignment a scan adds, so only new
+    marks count as ink.
+    """
+    return Image.fromarray(page_extremes(img, size)[0]).filter(ImageFilter.MinFilter(3))
+
+
+def stroke_pixels(ink, min_size=MIN_STROKE_PIXELS):
+    """Drops ink pixels in 8-connected groups of fewer than min_size pixels.
+
+    Dust and sensor specks cover a block or a few neighbouring ones, while
+    even a short answer like "x = 4" is made of longer strokes, so a
+    speckled scan doesn't need a ratio high enough to hide a real answer.
+    Pages with more ink than MAX_GROUPED_INK_RATIO are returned unchanged;
+    they are far from blank either way.
+    """
+    if ink.mean() > MAX_GROUPED_INK_RATIO:
+        return ink
+    remaining = set(map(tuple, np.argwhere(ink).tolist()))
+    strokes = np.zeros_like(ink)
+    while remaining:
+        stack = [remaining.pop()]
+        group = []
+        while stack:
+            y, x = stack.pop()
+            group.append((y, x))
+            for neighbour in ((y + dy, x + dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)):
+                if neighbour in remaining:
+                    remaining.remove(neighbour)
+                    stack.append(neighbour)
+        if len(group) >= min_size:
+            ys, xs = zip(*group)
+            strokes[list(ys), list(xs)] = True
+    return strokes
+
+
+def detect_blank_page(img, templates=(), size=DEFAULT_THUMBNAIL_SIZE, ink_delta=DEFAULT_INK_DELTA,
+                      max_ink_ratio=DEFAULT_MAX_INK_RATIO, max_std=DEFAULT_MAX_STD):
+    """Tells whether an answer page has nothing on it worth sending to the model.
+
+    The page is reduced to the darkest and lightest pixel of each block (see
+    page_extremes), so thin, light strokes on a high-resolution scan aren't
+    averaged away. Each block is compared with the paper (the page's median
+    grey level), where marks lighter than the paper also count, for
+    light-on-dark pages. For each template, only marks darker than the
+    matching template pixel count, so an unanswered copy of the problem
+    sheet is blank too. Specks too small to be a stroke are ignored (see
+    stroke_pixels). The page is blank when, for the paper or any template,
+    few pixels are ink and the difference barely varies.
+
+    Args:
+        img (PIL.Image.Image): The answer page. It is not modified.
+        templates (list of PIL.Image.Image): Thumbnails from template_thumbnail, typically the problem sheets.
+        size (int): Longest edge in pixels the page is analysed at.
+        ink_delta (int): Grey levels away from the reference for a pixel to count as ink.
+        max_ink_ratio (float): Largest share of ink pixels, not counting specks, a blank page may have.
+        max_std (float): Largest standard deviation of the difference, not counting specks, a blank page may have.
+
+    Returns:
+        tuple: (is_blank, stats) where stats is {"ink_ratio", "std", "reference"} for the closest reference,
+            "paper" or the index of the template.
+    """
+    darkest, lightest = (extreme.astype(np.int16) for extreme in page_extremes(img, size))
+    differences = [("paper", np.maximum(np.median(darkest) - darkest, lightest - np.median(lightest)))]
+    thumbnail_size = (darkest.shape[1], darkest.shape[0])
+    for index, template in enumerate(templates):
+        if template.size != thumbnail_size:
+            template = template.resize(thumbnail_size, Image.BOX)
+        # The template's own print and paper tone cancel out; only new, darker marks remain
+        differences.append((index, np.clip(np.asarray(template, dtype=np.int16) - darkest, 0, None)))
+
+    best = None
+    for name, difference in differences:
+        ink = difference > ink_delta
+        strokes = stroke_pixels(ink)
+        # Specks would dominate the spread at full contrast, so they are left out of it as well as the ink
+        stats = {"ink_ratio": float(np.mean(strokes)), "std": float(difference[strokes | ~ink].std()),
+                 "reference": name}
+        if best is None or stats["ink_ratio"] < best["ink_ratio"]:
+            best = stats
+        if stats["ink_ratio"] <= max_ink_ratio and stats["std"] <= max_std:
+            return True, stats
+    return False, best
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def digest_from_store_path(path):
+    """Returns the digest encoded in a content-addressed image store path (ab/cd/<sha256>.ext), or None."""
+    digest = os.path.splitext(os.path.basename(path))[0]
+    if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+        return None
+    shard2 = os.path.basename(os.path.dirname(path))
+    shard1 = os.path.basename(os.path.dirname(os.path.dirname(path)))
+    return digest if (shard1, shard2) == (digest[:2], digest[2:4]) else None
+
+
+def digest_image(image_data):
+    """Returns the sha256 hex digest of an image given as a file path (str) or raw bytes.
+
+    Paths in the content-addressed image store already carry their digest, so they are not re-read.
+    """
+    sha = hashlib.sha256()
+    if isinstance(image_data, bytes):
+        sha.update(image_data)
+    else:
+        digest = digest_from_store_path(image_data)
+        if digest is not None:
+            return digest
+        with open(image_data, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+def make_cache_key(problem_digests, answer_digest, page_index, grading_standards, scoring_difficulty, model_name, prompt_version, options=None):
+    """Builds the content-addressed key for one graded answer page.
+
+    Every input that can change the model's answer is part of the key, so a
+    changed rubric, difficulty, model, prompt template or preprocessing option
+    (passed as options) never hits a stale entry.
+    """
+    payload = json.dumps([
+        prompt_version,
+        model_name,
+        scoring_difficulty,
+        grading_standards,
+        list(problem_digests),
+        answer_digest,
+        page_index,
+        options,
+    ], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Persistent on-disk cache of parsed page results, with size and age based eviction.
+
+    Entries are stored as JSON files sharded by the first two characters of
+    the key. Hit/miss/eviction counters are kept in memory and exposed via stats().
+
+    Args:
+        cache_dir (str): Directory that holds the cache files.
+        max_entries (int): Maximum number of entries kept before the oldest are evicted.
+        max_bytes (int): Maximum total size of the cache files in bytes.
+        max_age (float): Entries older than this many seconds are treated as misses and removed. None disables expiry.
+    """
+
+    def __init__(self, cache_dir="grading_cache", max_entries=10000, max_bytes=200 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        entries = self._scan()
+        self._entry_count = len(entries)
+        self._total_bytes = sum(size for _, size, _ in entries)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Returns the cached value for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            if self.max_age is not None and time.time() - os.path.getmtime(path) > self.max_age:
+                size = os.path.getsize(path)
+                os.remove(path)
+                with self._lock:
+                    self.evictions += 1
+                    self.misses += 1
+                    self._entry_count -= 1
+                    self._total_bytes -= size
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Stores a JSON-serializable value under key, then evicts old entries if the cache is over its limits."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            old_size = os.path.getsize(path)
+        except FileNotFoundError:
+            old_size = None
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)  # Atomic, so readers never see a half-written entry
+
+        with self._lock:
+            if old_size is None:
+                self._entry_count += 1
+            else:
+                self._total_bytes -= old_size
+            self._total_bytes += os.path.getsize(path)
+            over_limit = self._entry_count > self.max_entries or self._total_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        # Only reached when the running totals are over a limit. Trimming to 90% of
+        # the limits leaves headroom so the directory walk doesn't repeat on every set.
+        entries = self._scan()
+        total_bytes = sum(size for _, size, _ in entries)
+        target_entries = int(self.max_entries * 0.9)
+        target_bytes = int(self.max_bytes * 0.9)
+        entries.sort()  # Oldest first
+        removed = 0
+        for _, size, path in entries:
+            if len(entries) - removed <= target_entries and total_bytes <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            removed += 1
+            total_bytes -= size
+        with self._lock:
+            self.evictions += removed
+            self._entry_count = len(entries) - removed
+            self._total_bytes = total_bytes
+
+    def stats(self):
+        """Returns the hit/miss/eviction counters and the hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,126 +1,216 @@
-import google.generativeai as genai
-from PIL import Image, ImageDraw, ImageFont  # Import ImageFont
-import io
+from PIL import Image
+import contextlib
+import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import os
+import threading
+import time
+import weakref
+from .annotate import draw_modifications
+from .backends import BlockedResponseError, GeminiBackend, ImageRegistry
+from .blank import DEFAULT_THUMBNAIL_SIZE, detect_blank_page, template_thumbnail
+from .cache import make_cache_key
+from .pages import PageSource, load_image  # load_image lived here before pages.py; callers still import it from here
+from .preprocess import preprocess_image
+from .schema import PAGE_RESPONSE_SCHEMA, parse_page_response, reask_prompt
+from .timing import count, record_since, stage
 
 # Load environment variables from .env file
 load_dotenv()
 
 YOUR_API_KEY = os.environ.get('GEMINI_API_KEY')
 
-def apply_image_modifications(img_path, modifications, output_folder="corrected_images"):
+# Bump whenever the grading prompt changes so cached page results are not reused across templates
+PROMPT_VERSION = 2
+# Follow-up requests for a page whose response doesn't match PAGE_RESPONSE_SCHEMA
+MAX_REASKS = 2
+
+def apply_image_modifications(img_path, modifications, output_folder="corrected_images", timings=None, output_name=None):
     """Applies image modifications to an image and saves it to the specified output folder.
 
     Args:
-        img_path (str): Path to the image to modify.
+        img_path (str or PIL.Image.Image): Path to the image to modify, or an already opened page such as one from
+            PageSource.open(i) (a TIFF frame or rasterized PDF page). An opened image is left open.
         modifications (list): A list of modification instructions.
         output_folder (str): The folder to save the modified image.
+        timings (StageTimings): Optional collector; rendering and saving are recorded as the 'annotation' stage.
+        output_name (str): File name for the saved image. Defaults to "<name>_modified<ext>", which collides
+            when two pages share a file name, so callers saving many students' pages should pass a unique name.
+
+    Returns:
+        str: Path of the saved image, or None if it could not be created.
     """
+    annotation_start = time.perf_counter()
     try:
-        img = Image.open(img_path)
-        width, height = img.size  # Get image dimensions
-        draw = ImageDraw.Draw(img)
-
-        for mod in modifications:
-            shape = mod['shape']
-            color = "red"  # Enforce red color for all modifications
-            coords = mod['coordinates']
-            text = mod['text']
-            question_number = mod['question_number']
-            line_width = mod.get('line_width', 2)  # Default line width
-            font_size = mod.get('font_size', 16)  # Default font size
-
-            font = ImageFont.truetype("arial.ttf", font_size)  # Or another font you have
-
-            # Convert relative coordinates to absolute
-            if shape in ["circle", "rectangle", "line"]:
-                abs_coords = []
-                for coord in coords:
-                    if 0 <= coord <= 1: # If it's a ratio
-                        abs_coords.append(coord * (width if coords.index(coord) % 2 == 0 else height)) #X are divided by width, y are divided by height
-                    else:
-                        abs_coords.append(coord) #Use the old data if not a ration
-                coords = abs_coords
-
-            if shape == "circle":
-                # Assuming coords are [center_x, center_y, radius]
-                x, y, r = coords
-                draw.ellipse((x - r, y - r, x + r, y + r), outline=color, width=line_width)
-            elif shape == "rectangle":
-                # Assuming coords are [x1, y1, x2, y2]
-                x0, y0, x1, y1 = coords
-                # Ensure that x0 < x1 and y0 < y1
-                x0, x1 = min(x0, x1), max(x0, x1)
-                y0, y1 = min(y0, y1), max(y0, y1)
-                draw.rectangle((x0, y0, x1, y1), outline=color, width=line_width)
-            elif shape == "line":
-                # Assuming coords are [x1, y1, x2, y2]
-                draw.line(coords, fill=color, width=line_width)
-
-            if text:
-                # Adjust position for text as needed
-                draw.text((coords[0], coords[1] + 10), text, fill=color, font=font)  # Use the font
-
-        # Create the output folder if it doesn't exist
-        os.makedirs(output_folder, exist_ok=True)
-        # Save the modified image to the output folder
-        base_filename = os.path.basename(img_path)  #Get the file name from the path
-        filename, ext = os.path.splitext(base_filename) #Split the name and extension
-        output_path = os.path.join(output_folder, f"{filename}_modified{ext}")
-        img.save(output_path)
+        opened = isinstance(img_path, Image.Image)
+        with contextlib.nullcontext(img_path) if opened else Image.open(img_path) as img:
+            img = draw_modifications(img, modifications)
+
+            # Create the output folder if it doesn't exist
+            os.makedirs(output_folder, exist_ok=True)
+            # Save the modified image to the output folder
+            if output_name is None:
+                base_filename = os.path.basename(getattr(img_path, 'filename', '') or 'page.png' if opened else img_path)  #Get the file name from the path
+                filename, ext = os.path.splitext(base_filename) #Split the name and extension
+                output_name = f"{filename}_modified{ext}"
+            output_path = os.path.join(output_folder, output_name)
+            img.save(output_path)
         print(f"Modified image saved as {output_path}")
+        return output_path
 
     except FileNotFoundError:
         print(f"Error: Image file not found: {img_path}")
     except Exception as e:
         print(f"Error applying image modifications: {e}")
+    finally:
+        record_since(timings, 'annotation', annotation_start)
+    return None
 
 
-def grade_answer_gemini(problem_images, answer_images, grading_standards, scoring_difficulty, output_folder="corrected_images", model_name='gemini-1.5-flash'):
+class ProblemSet:
+    """Problem images loaded, preprocessed and digested once, ready to be shared by every student of an assignment.
+
+    The backend registration is also done once per problem set, on the first
+    page that needs the model, and reused by every later page request.
+
+    Args:
+        problem_images (list of str or bytes): Paths to problem images; a multi-page TIFF or PDF adds one image per page.
+        preprocess (dict): Keyword arguments for preprocess_image, or None to send the images as loaded.
+        timings (StageTimings): Optional collector for the load_image and preprocess stages.
+    """
+
+    def __init__(self, problem_images, preprocess=None, timings=None):
+        self.preprocess = preprocess
+        pages = PageSource(problem_images, timings)
+        self.digests = [pages.digest(i) for i in range(len(pages))]
+        self.bytes_before = self.bytes_after = None
+        if preprocess is None:
+            # Kept open: the originals are what gets uploaded on first registration
+            self.images = [pages.load(i) for i in range(len(pages))]
+        else:
+            # Only the compact blobs are kept; each decoded original is closed as soon as it is encoded
+            self.images = []
+            for i in range(len(pages)):
+                with pages.open(i) as img, stage(timings, 'preprocess'):
+                    self.images.append(preprocess_image(img, **preprocess))
+            self.bytes_before = sum(pages.source_size(i) for i in range(len(pages)))
+            self.bytes_after = sum(len(blob["data"]) for blob in self.images)
+        # The registration key includes the preprocessing options because they change the uploaded bytes
+        self.keys = [hashlib.sha256(json.dumps([digest, preprocess], sort_keys=True).encode('utf-8')).hexdigest()
+                     for digest in self.digests]
+        self.sources = pages
+        self._refs = weakref.WeakKeyDictionary()  # backend -> ImageRefs it returned for these images
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def references(self, backend, timings=None):
+        """Returns the backend references for the problem images, registering them on first use.
+
+        References are kept per backend, and registered again through the
+        backend's ImageRegistry (which re-uploads them) once any is close to
+        expiring, so a problem set shared across a long class run stays valid.
+        """
+        with self._lock:
+            refs = self._refs.get(backend)
+            if refs is None or any(ref.expired(ImageRegistry.EXPIRY_MARGIN) for ref in refs):
+                with stage(timings, 'register_images'):
+                    refs = self._refs[backend] = backend.register_images(self.images, self.keys)
+        return refs
+
+    def blank_templates(self, size=DEFAULT_THUMBNAIL_SIZE):
+        """Returns the problem sheets as detect_blank_page templates, built on first use."""
+        with self._lock:
+            if size not in self._templates:
+                templates = []
+                for i in range(len(self.sources)):
+                    with self.sources.open(i) as img:
+                        templates.append(template_thumbnail(img, size))
+                self._templates[size] = templates
+            return self._templates[size]
+
+
+def grade_answer_gemini(problem_images, answer_images, grading_standards, scoring_difficulty, output_folder="corrected_images", model_name='gemini-1.5-flash', max_workers=1, cache=None, backend=None, timings=None, on_page_result=None, preprocess=None, problem_set=None, executor=None, previous_pages=None, previous_feedback=None, on_page_record=None, blank_page=None):
     """
     Grades student answers and generates image modification instructions.
 
     Args:
         problem_images (list of str or bytes): Paths to problem images.
-        answer_images (list of str or bytes): Paths to answer images.
+        answer_images (list of str or bytes, or PageSource): Paths to answer images, multi-page TIFFs or PDFs; each
+            frame or PDF page is graded as its own page. Pass a PageSource to choose the PDF rasterization dpi.
         grading_standards (str): Textual description of the grading standards.
         scoring_difficulty (int):  A value between 1-10 representing the stringency of grading. Higher values make it harder to get a high score.
         output_folder (str): The folder to save corrected images.
         model_name (str): The name of the Gemini model to use.
+        max_workers (int): Maximum number of answer pages graded concurrently. 1 grades pages one at a time.
+        cache (ResponseCache): Optional cache of parsed page results. Pages whose inputs were graded before skip the model call.
+        backend (GeminiBackend or FakeBackend): Backend used for model calls. Defaults to a GeminiBackend for model_name.
+            Problem images are uploaded through backend.register_images once and referenced from every page request;
+            reuse one backend across exams to share the upload across all students of an assignment.
+        timings (StageTimings): Optional collector for per-stage durations (load_image, preprocess, blank_detection, register_images, prompt_build, model_call, json_extraction, feedback_call).
+        on_page_result (callable): Optional callback invoked as on_page_result(page_index, scores, analyses, image_modifications)
+            from the calling thread as soon as each page is graded, in completion order.
+        preprocess (dict): Keyword arguments for preprocess_image (max_edge, grayscale, image_format, quality). When given,
+            images are oriented, resized and re-encoded before upload and the results include a "payload" size report.
+            The original images are left untouched for annotation.
+        problem_set (ProblemSet): Problem images already prepared for this assignment; problem_images and preprocess
+            are then ignored. Pass the same ProblemSet for every student to load, preprocess and upload it once.
+        executor (concurrent.futures.Executor): Shared pool to run the page calls on instead of a per-call pool,
+            so pages from many students are scheduled together. max_workers is then ignored.
+        previous_pages (list of dict): Earlier result per page index, as {"fingerprint", "scores", "analyses",
+            "image_modifications", "question_numbers"} or None. A page whose fingerprint (page bytes, problem images,
+            rubric, difficulty, model, prompt version, preprocessing) is unchanged is reused without a model call.
+        previous_feedback (dict): Earlier {"fingerprint", "feedback"}; reused when every page result is unchanged.
+        on_page_record (callable): Like on_page_result, but called with one dict per page in the previous_pages format
+            plus "page", so a caller can checkpoint pages and feed them back on the next run. Not called for failed pages.
+        blank_page (dict): Keyword arguments for blank.detect_blank_page (size, ink_delta, max_ink_ratio, max_std), plus
+            "use_template" (default True) to also compare pages against the problem sheets. When given, pages
+            detected as blank get the result of a "no answers on this page" response without a model call and are
+            listed in the results' "blank_pages". None sends every page to the model.
 
     Returns:
         dict: Grading results and image modification instructions.
     """
 
-    genai.configure(api_key=YOUR_API_KEY)
-    # Refresh the model instance with every call
-    model = genai.GenerativeModel(model_name)
-
-    def load_image(image_data):
-        """Helper function to load image data, handling both file paths and bytes."""
-        try:
-            if isinstance(image_data, str): # assume it's a path
-                return Image.open(image_data)
-            elif isinstance(image_data, bytes): # it's already the image data
-                return Image.open(io.BytesIO(image_data)) # use io.BytesIO to convert bytes to file-like object
-            else:
-                raise TypeError("Image data must be a file path (string) or image data (bytes).")
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Image file not found: {image_data}")
-        except Exception as e:
-            raise Exception(f"Error loading image: {e}")
+    if backend is None:
+        # Refresh the model instance with every call
+        backend = GeminiBackend(model_name, api_key=YOUR_API_KEY)
+    model_name = backend.model_name
 
     try:
-        problem_imgs = [load_image(img) for img in problem_images]
-        answer_imgs = [load_image(img) for img in answer_images]
-
-        all_scores = []
-        all_analyses = []
-        image_modifications = [] # A list to hold modification instructions for each image
-
-        for i, answer_img in enumerate(answer_imgs):
+        if problem_set is None:
+            problem_set = ProblemSet(problem_images, preprocess, timings)
+        preprocess = problem_set.preprocess
+        problem_digests = problem_set.digests
+        # Pages are opened one at a time inside grade_page, so at most the pages in flight are decoded at once
+        answer_pages = answer_images if isinstance(answer_images, PageSource) else PageSource(answer_images, timings)
+
+        payload = None
+        if preprocess is not None:
+            payload = {
+                "problem_bytes_before": problem_set.bytes_before,
+                "problem_bytes_after": problem_set.bytes_after,
+                "pages": [None] * len(answer_pages),
+            }
+
+        def page_failed(error):
+            """The grade_page_with_model result of a page that couldn't be graded: a zero carrying the error."""
+            count(timings, 'page_failed')
+            return [0], [{"error": error}], [], [None], False
+
+        def grade_page_with_model(i, answer_img):
+            """Grades a single answer page, returning its scores, analyses, modification list, question numbers and whether the response parsed."""
+            page_scores = []
+            page_analyses = []
+            page_question_numbers = []  # Parallel to page_scores; None where the model gave no question number
+            page_modifications = []
+            page_ok = False
+            if preprocess is not None:
+                with stage(timings, 'preprocess'):
+                    answer_img = preprocess_image(answer_img, **preprocess)
+                payload["pages"][i] = {"bytes_before": answer_pages.source_size(i), "bytes_after": len(answer_img["data"])}
+            prompt_start = time.perf_counter()
             prompt = f"""
             You are an automated grader and image modification instructor. Analyze the student's answer sheet page and generate detailed instructions for correcting it.
             Problem Images: [PROBLEM_IMAGES]
@@ -153,7 +243,7 @@ def grade_answer_gemini(problem_images, answer_images, grading_standards, scorin
 
             In addition to grading, suggest concise and clear instructions for marking incorrect or incomplete areas on the image (shape, color, coordinates, text). Keep the text for image modifications short and specific. Please output the x,y coordinates in range [0,1], make it a relative position in the picture and mark it with RED.
 
-            Respond in JSON format with a list of question results and image modification instructions. If you can't create valid JSON, respond with just 0.
+            Respond in JSON format with a list of question results and image modification instructions.
             
             ```json
             {{
@@ -180,7 +270,7 @@ def grade_answer_gemini(problem_images, answer_images, grading_standards, scorin
             }}
             ```
 
-            If no questions are answered on this page, respond with 0.
+            If no questions are answered on this page, respond with empty "page_results" and "image_modifications" lists.
             """
 
             PROBLEM_IMAGES_DISPLAY = f"Multiple Problem Images (specify topics in grading standards for best performance)."
@@ -188,73 +278,147 @@ def grade_answer_gemini(problem_images, answer_images, grading_standards, scorin
             prompt = prompt.replace("[PROBLEM_IMAGES]", PROBLEM_IMAGES_DISPLAY)
             prompt = prompt.replace("[ANSWER_IMAGE]", ANSWER_IMAGE_DISPLAY)
             prompt = prompt.replace("[GRADING_STANDARDS]", grading_standards)
+            # Problem images are referenced, not re-sent; registration is deferred so cached exams upload nothing
+            images_for_prompt = problem_set.references(backend, timings) + [answer_img]
+            record_since(timings, 'prompt_build', prompt_start)
 
-            images_for_prompt = problem_imgs + [answer_img]
-            response = model.generate_content(images_for_prompt + [prompt])
-
-            if response.prompt_feedback:
-                print(f"Prompt Feedback (Answer Sheet Page {i+1}):", response.prompt_feedback)
+            contents = images_for_prompt + [prompt]
+            for attempt in range(MAX_REASKS + 1):
+                try:
+                    with stage(timings, 'model_call'):
+                        response = backend.generate(contents, response_schema=PAGE_RESPONSE_SCHEMA)
+                except BlockedResponseError as e:
+                    # The model refused this page only; it keeps no fingerprint, so the next regrade retries it.
+                    # Other BackendErrors (outages, exhausted retries, an open circuit) fail the whole grading
+                    # rather than scoring the page as zero.
+                    print(f"Model call blocked for Answer Sheet Page {i+1}: {e}")
+                    return page_failed(f"Model call blocked for Answer Sheet Page {i+1}: {e}")
+                count(timings, 'model_response')
+
+                if response.prompt_feedback:
+                    print(f"Prompt Feedback (Answer Sheet Page {i+1}):", response.prompt_feedback)
+
+                with stage(timings, 'json_extraction'):
+                    result, errors = parse_page_response(response.text)
+                if result is not None:
+                    break
+                count(timings, 'parse_failure')
+                print(f"Invalid response for Answer Sheet Page {i+1} (attempt {attempt + 1}): {errors[:3]}")
+                if attempt < MAX_REASKS:
+                    # Re-ask for this page only, telling the model what was wrong with its answer
+                    count(timings, 'reask')
+                    contents = images_for_prompt + [prompt, f"Previous response:\n{response.text}", reask_prompt(errors)]
+            else:
+                return page_failed(f"Invalid response for Answer Sheet Page {i+1} after {MAX_REASKS + 1} attempts: {errors[:3]}")
+
+            if not result["page_results"]:
+                print(f"Answer Sheet Page {i+1}: No answers found on this page.")
+            for question_result in result["page_results"]:
+                page_scores.append(question_result["score"])
+                page_analyses.append(question_result["analysis"])
+                page_question_numbers.append(question_result["question_number"])
+            page_modifications = result["image_modifications"]
+            page_ok = True
+
+            return page_scores, page_analyses, page_modifications, page_question_numbers, page_ok
+
+        page_fingerprints = [None] * len(answer_pages)  # Stays None for pages that failed, so a regrade retries them
+        blank_pages = []
+        detector_options = dict(blank_page or {})
+        use_template = detector_options.pop("use_template", True)
+
+        def is_blank(answer_img):
+            with stage(timings, 'blank_detection'):
+                templates = problem_set.blank_templates(detector_options.get("size", DEFAULT_THUMBNAIL_SIZE)) if use_template else ()
+                blank, _ = detect_blank_page(answer_img, templates, **detector_options)
+            return blank
+
+        def grade_page(i):
+            """Grades a single answer page, reusing an earlier result or the cache when the same inputs were graded before."""
+            # Every input that can change the page's grade goes into its fingerprint
+            fingerprint = make_cache_key(problem_digests, answer_pages.digest(i), i, grading_standards,
+                                         scoring_difficulty, model_name, PROMPT_VERSION, options={"preprocess": preprocess})
+            previous = previous_pages[i] if previous_pages is not None and i < len(previous_pages) else None
+            if previous is not None and previous.get("fingerprint") == fingerprint:
+                count(timings, 'page_reused')
+                page_fingerprints[i] = fingerprint
+                return previous["scores"], previous["analyses"], previous["image_modifications"], previous["question_numbers"]
+
+            if cache is not None:
+                cached = cache.get(fingerprint)
+                if cached is not None:
+                    page_fingerprints[i] = fingerprint
+                    question_numbers = cached.get("question_numbers", [None] * len(cached["scores"]))
+                    return cached["scores"], cached["analyses"], cached["image_modifications"], question_numbers
+
+            # Reused and cached pages never get decoded; this one is closed as soon as its model calls are done
+            with answer_pages.open(i) as answer_img:
+                if blank_page is not None and is_blank(answer_img):
+                    count(timings, 'blank_page_skipped')
+                    blank_pages.append(i)
+                    # Not cached, and fingerprinted with the detector settings so it never matches a regrade's page
+                    # fingerprint: turning detection off or changing a threshold always re-examines the page
+                    page_fingerprints[i] = make_cache_key(problem_digests, answer_pages.digest(i), i, grading_standards,
+                                                          scoring_difficulty, model_name, PROMPT_VERSION,
+                                                          options={"preprocess": preprocess, "blank_page": blank_page})
+                    return [], [], [], []
+                page_scores, page_analyses, page_modifications, page_question_numbers, page_ok = grade_page_with_model(i, answer_img)
+            if page_ok:
+                page_fingerprints[i] = fingerprint
+                if cache is not None:
+                    # Only successfully parsed pages are cached; failures should be retried next time
+                    cache.set(fingerprint, {
+                        "scores": page_scores,
+                        "analyses": page_analyses,
+                        "image_modifications": page_modifications,
+                        "question_numbers": page_question_numbers,
+                    })
+            return page_scores, page_analyses, page_modifications, page_question_numbers
+
+        def page_done(i):
+            if on_page_result is not None:
+                on_page_result(i, *page_outputs[i][:3])
+            if on_page_record is not None and page_fingerprints[i] is not None:
+                page_scores, page_analyses, page_modifications, page_question_numbers = page_outputs[i]
+                on_page_record({
+                    "page": i,
+                    "fingerprint": page_fingerprints[i],
+                    "scores": page_scores,
+                    "analyses": page_analyses,
+                    "image_modifications": page_modifications,
+                    "question_numbers": page_question_numbers,
+                })
+
+        if executor is not None or (max_workers > 1 and len(answer_pages) > 1):
+            # Dispatch every page at once; results are collected by page index so order is preserved.
+            # A page is only opened once a worker picks it up, so decoded pages are bounded by the pool size.
+            page_outputs = [None] * len(answer_pages)
+            with contextlib.ExitStack() as stack:
+                if executor is None:
+                    executor = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+                futures = {executor.submit(grade_page, i): i for i in range(len(answer_pages))}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    page_outputs[i] = future.result()
+                    page_done(i)
+        else:
+            page_outputs = []
+            for i in range(len(answer_pages)):
+                page_outputs.append(grade_page(i))
+                page_done(i)
 
-            response.resolve()
+        all_scores = []
+        all_analyses = []
+        image_modifications = [] # A list to hold modification instructions for each image
+        question_numbers = [] # Parallel to all_scores
+        page_indexes = [] # Parallel to all_scores: the answer page each score came from
 
-            try:
-                try:
-                    json_string = response.text.strip()
-                    if json_string.startswith("```json"):
-                        json_string = json_string[len("```json"):].strip()
-                    if json_string.endswith("```"):
-                        json_string = json_string[:-len("```")].strip()
-
-                    if json_string == "0":
-                        print(f"Answer Sheet Page {i+1}: No answers found on this page.")
-                        image_modifications.append([]) # Append an empty list to indicate no modifications
-                        continue
-
-                    result = json.loads(json_string)
-                    page_results = result.get("page_results")
-                    modifications = result.get("image_modifications")  # Get the image modification instructions
-                    image_modifications.append(modifications if modifications else [])  # Add modifications, or an empty list if none.
-
-
-                    if page_results is None:
-                        raise ValueError(f"The response for Answer Sheet Page {i+1} did not contain 'page_results'. Invalid format.")
-
-                    for question_result in page_results:
-                         if not isinstance(question_result, dict):
-                            print(f"Warning: Expected a dictionary for question_result, got {type(question_result)}. Skipping this result.")
-                            continue
-                         score = question_result.get("score")
-                         analysis = question_result.get("analysis")
-
-                         if score is None or analysis is None:
-                            print(f"Warning: Missing 'score' or 'analysis' for a question. Skipping this question.")
-                            continue
-
-                         all_scores.append(score)
-                         all_analyses.append(analysis)
-
-
-                except json.JSONDecodeError as e:
-                    print(f"JSONDecodeError for Answer Sheet Page {i+1}: {e}")
-                    print(f"Raw response text for Answer Sheet Page {i+1}: {response.text}")
-                    image_modifications.append([]) # Append empty modification instruction list
-                    if response.text.strip() == "0":
-                        all_scores.append(0)
-                        all_analyses.append({"error": f"Gemini API returned 0 for Answer Sheet Page {i+1} due to safety restrictions/errors or because no answers were provided."})
-                    else:
-                        all_scores.append(0)
-                        all_analyses.append({"error": f"Failed to decode JSON for Answer Sheet Page {i+1}. Raw response needs investigation."})
-                except ValueError as e:
-                    print(f"ValueError for Answer Sheet Page {i+1}: {e}")
-                    image_modifications.append([]) # Append empty modification instruction list
-                    all_scores.append(0)
-                    all_analyses.append({"error": str(e)})
-
-            except Exception as e:
-                print(f"Unexpected error occurred for Answer Sheet Page {i+1}: {e}")
-                image_modifications.append([]) # Append empty modification instruction list
-                all_scores.append(0)
-                all_analyses.append({"error": f"An unexpected error occurred on Answer Sheet Page {i+1}: {e}"})
+        for i, (page_scores, page_analyses, page_modifications, page_question_numbers) in enumerate(page_outputs):
+            all_scores.extend(page_scores)
+            all_analyses.extend(page_analyses)
+            image_modifications.append(page_modifications)
+            question_numbers.extend(page_question_numbers)
+            page_indexes.extend([i] * len(page_scores))
 
         # Calculate final score (example - can be adjusted based on grading standards)
         final_score = sum(all_scores)
@@ -268,16 +432,30 @@ def grade_answer_gemini(problem_images, answer_images, grading_standards, scorin
 
         Keep the response concise and helpful. Mention the strongest and weakest areas based on the score ranges.
         """
-        feedback_response = model.generate_content(feedback_prompt)
-        feedback_response.resolve()
-        overall_feedback = feedback_response.text
+        # Feedback summarizes every page, so it is reused only when the aggregate it was written from is unchanged
+        feedback_fingerprint = hashlib.sha256(json.dumps(
+            [final_score, all_analyses, grading_standards, scoring_difficulty, model_name, PROMPT_VERSION], sort_keys=True
+        ).encode('utf-8')).hexdigest()
+        if previous_feedback is not None and previous_feedback.get("fingerprint") == feedback_fingerprint:
+            count(timings, 'feedback_reused')
+            overall_feedback = previous_feedback["feedback"]
+        else:
+            with stage(timings, 'feedback_call'):
+                feedback_response = backend.generate(feedback_prompt)
+            overall_feedback = feedback_response.text
 
         return {
             "scores": all_scores,
             "analyses": all_analyses,
             "final_score": final_score,
             "feedback": overall_feedback,
-            "image_modifications": image_modifications  # Return the modification instructions
+            "image_modifications": image_modifications,  # Return the modification instructions
+            "question_numbers": question_numbers,
+            "page_indexes": page_indexes,
+            "payload": payload,  # Upload sizes before/after preprocessing, None when preprocessing is off
+            "page_fingerprints": page_fingerprints,  # Per page; None where the page failed and must be regraded
+            "feedback_fingerprint": feedback_fingerprint,
+            "blank_pages": sorted(blank_pages),  # Pages detected as blank and not sent to the model
         }
     except FileNotFoundError as e:
         print(e)
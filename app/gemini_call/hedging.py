@@ -0,0 +1,108 @@
+import collections
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .timing import percentile
+
+
+class HedgedBackend:
+    """Wraps a backend so slow calls get a duplicate request and the first answer wins.
+
+    When a call hasn't returned after the hedge_percentile of recent call
+    latencies, the same request is sent again and whichever finishes first is
+    returned. The loser is cancelled if it hasn't started yet; a request that
+    is already on the wire can't be aborted, so its result is discarded.
+    Extra requests are capped at max_extra times the number of calls, so a
+    slow provider can't double the bill. Wrap a ScheduledBackend to keep the
+    duplicates within the rate limits.
+
+    Args:
+        backend: The backend to call (GeminiBackend, FakeBackend or ScheduledBackend).
+        hedge_percentile (float): Percentile (0-100) of recent latencies after which a call is hedged.
+        max_extra (float): Hedged requests allowed per call, e.g. 0.1 for at most 10% extra spend.
+        min_samples (int): Latencies observed before hedging starts, so the threshold is meaningful.
+        window (int): Number of recent latencies the percentile is computed over.
+        max_workers (int): Threads available for running calls and their hedges.
+    """
+
+    def __init__(self, backend, hedge_percentile=95, max_extra=0.1, min_samples=20, window=200, max_workers=32):
+        self.backend = backend
+        self.hedge_percentile = hedge_percentile
+        self.max_extra = max_extra
+        self.min_samples = min_samples
+        self._latencies = collections.deque(maxlen=window)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+        self._lock = threading.Lock()
+        self.hedge_calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while there are too few samples."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            return percentile(list(self._latencies), self.hedge_percentile)
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedged + 1 > self.max_extra * self.hedge_calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def _primary_call(self, contents, response_schema, start):
+        # Every primary that completes is recorded, measured from the original request, even when its hedge
+        # won: recording only winners would drop the slow tail and pull the hedge delay ever lower
+        response = self.backend.generate(contents, response_schema=response_schema)
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+        return response
+
+    def generate(self, contents, response_schema=None):
+        """Returns the first successful response from the call or its hedge; raises if both fail."""
+        start = time.perf_counter()
+        with self._lock:
+            self.hedge_calls += 1
+        delay = self.hedge_delay()
+        primary = self._executor.submit(self._primary_call, contents, response_schema, start)
+        pending = {primary}
+        if delay is not None:
+            done, _ = wait(pending, timeout=delay)
+            if not done and self._may_hedge():
+                pending.add(self._executor.submit(self.backend.generate, contents, response_schema=response_schema))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                response = future.result()
+                for loser in pending:
+                    loser.cancel()
+                if future is not primary:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return response
+        raise error
+
+    def register_images(self, images, keys):
+        return self.backend.register_images(images, keys)
+
+    def stats(self):
+        """Returns the calls seen, hedges sent, hedges that won and the current hedge delay in seconds."""
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                "calls": self.hedge_calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "extra_spend": self.hedged / self.hedge_calls if self.hedge_calls else 0.0,
+                "hedge_delay": delay,
+            }
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
@@ -0,0 +1,112 @@
+import io
+import json
+import os
+from functools import lru_cache
+
+from .annotate import draw_modifications
+from .pages import PageSource
+
+OVERLAY_VERSION = 1
+
+
+def overlay_path(overlay_dir, homework_id, page_index):
+    """Returns where the overlay document for one page of a homework is stored."""
+    return os.path.join(overlay_dir, str(homework_id), f"page_{page_index}.json")
+
+
+def save_overlay(overlay_dir, homework_id, page_index, image_path, modifications, frame=None):
+    """Persists a page's image modifications as a compact overlay document instead of a re-encoded image.
+
+    Args:
+        overlay_dir (str): Root folder for overlay documents.
+        homework_id (UUID or str): The homework the page belongs to.
+        page_index (int): Zero-based index of the answer page.
+        image_path (str): Path to the original, unmodified page image.
+        modifications (list): The page's image modification instructions.
+        frame (int): Page of a multi-page TIFF or PDF, or None for a single image.
+
+    Returns:
+        str: Path of the saved overlay document.
+    """
+    path = overlay_path(overlay_dir, homework_id, page_index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    document = {
+        "version": OVERLAY_VERSION,
+        "image": image_path,
+        "frame": frame,
+        "modifications": modifications or [],
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+
+def save_overlays(overlay_dir, homework_id, pages, image_modifications):
+    """Saves one overlay document per answer page and returns their paths.
+
+    pages holds an image path, or an (image path, frame) pair, per answer page.
+    """
+    pages = [page if isinstance(page, tuple) else (page, None) for page in pages]
+    return [
+        save_overlay(overlay_dir, homework_id, page_index, image_path, modifications, frame)
+        for page_index, ((image_path, frame), modifications) in enumerate(zip(pages, image_modifications))
+    ]
+
+
+def load_overlay(overlay_dir, homework_id, page_index):
+    """Returns the overlay document for a page, or None if the page has no overlay."""
+    try:
+        with open(overlay_path(overlay_dir, homework_id, page_index), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def render_overlay(image_path, modifications, image_format="PNG", frame=None):
+    """Rasterizes the original image with its modifications entirely in memory and returns the encoded bytes.
+
+    frame picks one page of a multi-page TIFF or PDF; PDF pages are rasterized first.
+    """
+    with PageSource.from_pages([(image_path, frame)]).open(0) as img:
+        img = draw_modifications(img, modifications)
+        buffer = io.BytesIO()
+        img.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+# Page files browsers display as they are; anything else is rasterized to PNG before it is served
+BROWSER_IMAGE_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.webp': 'image/webp'}
+
+
+@lru_cache(maxsize=32)
+def render_original(image_path, frame=None):
+    """Returns one page of a TIFF or PDF, or a single image browsers can't show, as PNG bytes.
+
+    Stored page files are content-addressed and never rewritten, so the
+    path and frame are enough to cache the rendering.
+    """
+    return render_overlay(image_path, [], frame=frame)
+
+
+@lru_cache(maxsize=32)
+def _render_cached(path, mtime):
+    # mtime is part of the cache key so a rewritten overlay is never served stale
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    # Documents written before multi-page files were accepted have no frame
+    return render_overlay(document["image"], document["modifications"], frame=document.get("frame"))
+
+
+def render_page(overlay_dir, homework_id, page_index):
+    """Returns the annotated page as PNG bytes, rendering it on first request and caching it afterwards.
+
+    Returns None if the page has no overlay document.
+    """
+    path = overlay_path(overlay_dir, homework_id, page_index)
+    try:
+        mtime = os.path.getmtime(path)
+    except FileNotFoundError:
+        return None
+    return _render_cached(path, mtime)
@@ -0,0 +1,181 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+
+from PIL import Image
+
+from .cache import digest_image
+from .preprocess import source_size
+from .timing import record_since
+
+
+def load_image(image_data, timings=None):
+    """Helper function to load image data, handling both file paths and bytes."""
+    load_start = time.perf_counter()
+    try:
+        if isinstance(image_data, str): # assume it's a path
+            return Image.open(image_data)
+        elif isinstance(image_data, bytes): # it's already the image data
+            return Image.open(io.BytesIO(image_data)) # use io.BytesIO to convert bytes to file-like object
+        else:
+            raise TypeError("Image data must be a file path (string) or image data (bytes).")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image file not found: {image_data}")
+    except Exception as e:
+        raise Exception(f"Error loading image: {e}")
+    finally:
+        record_since(timings, 'load_image', load_start)
+
+
+# Resolution PDF pages are rasterized at unless a PageSource is given another
+DEFAULT_PDF_DPI = 200
+# PDF page sizes are in points
+POINTS_PER_INCH = 72
+
+
+def is_pdf(image_data):
+    """Tells a PDF from an image by its first bytes, for paths and raw bytes alike."""
+    if isinstance(image_data, bytes):
+        return image_data[:5] == b'%PDF-'
+    with open(image_data, 'rb') as f:
+        return f.read(5) == b'%PDF-'
+
+
+def open_pdf(image_data):
+    """Opens a PDF with pypdfium2, which bundles its own PDFium and works offline.
+
+    Raises:
+        ImportError: If pypdfium2 isn't installed; only PDF inputs need it.
+    """
+    try:
+        import pypdfium2
+    except ImportError:
+        raise ImportError("PDF submissions need pypdfium2: pip install pypdfium2")
+    return pypdfium2.PdfDocument(image_data)
+
+
+def count_frames(image_data):
+    """Returns how many pages a file holds: PDF pages, TIFF frames, or 1 for a single image."""
+    if is_pdf(image_data):
+        pdf = open_pdf(image_data)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    with load_image(image_data) as img:
+        # Reads only the frame directory, not the pixel data
+        return getattr(img, 'n_frames', 1)
+
+
+class PageSource:
+    """The pages of a submission, opened only while a page is being worked on.
+
+    Each input is a single image, a multi-frame TIFF or a PDF, and expands to
+    one page per frame, in order. Nothing is decoded up front: open(i) loads
+    (or, for a PDF, rasterizes at dpi) page i only, and closes it and its file
+    handle when the with block ends, so the decoded bitmaps held at any time
+    are the pages currently being graded, not the whole exam. Missing files
+    are reported here, before any page is sent to the model.
+
+    Args:
+        images (list of str or bytes): Paths to page images, TIFFs or PDFs, or their bytes.
+        timings (StageTimings): Optional collector for the load_image stage (which includes rasterizing).
+        dpi (int): Resolution PDF pages are rasterized at.
+    """
+
+    def __init__(self, images, timings=None, dpi=DEFAULT_PDF_DPI):
+        self.timings = timings
+        self.dpi = dpi
+        self.pages = []  # (input index, frame index or None for a single image, is PDF)
+        self.inputs = list(images)
+        for index, image_data in enumerate(self.inputs):
+            if isinstance(image_data, str) and not os.path.isfile(image_data):
+                raise FileNotFoundError(f"Image file not found: {image_data}")
+            pdf = is_pdf(image_data)
+            frames = count_frames(image_data)
+            if frames == 1 and not pdf:
+                self.pages.append((index, None, False))
+            else:
+                self.pages.extend((index, frame, pdf) for frame in range(frames))
+        self._input_digests = {}
+
+    @classmethod
+    def from_pages(cls, pages, timings=None, dpi=DEFAULT_PDF_DPI):
+        """Builds a PageSource from pages that were already expanded, one (image, frame) pair per page.
+
+        This is how the web app stores pages: one row per TIFF frame or PDF
+        page, with frame None for a single image. Files aren't reopened to
+        count their frames, and pages of the same file share its digest.
+        """
+        source = cls([], timings, dpi)
+        indexes = {}  # image -> input index
+        for image_data, frame in pages:
+            index = indexes.get(image_data)
+            if index is None:
+                if isinstance(image_data, str) and not os.path.isfile(image_data):
+                    raise FileNotFoundError(f"Image file not found: {image_data}")
+                index = indexes[image_data] = len(source.inputs)
+                source.inputs.append(image_data)
+            source.pages.append((index, frame, frame is not None and is_pdf(image_data)))
+        return source
+
+    def __len__(self):
+        return len(self.pages)
+
+    def digest(self, i):
+        """sha256 identifying page i's content, read in chunks without decoding anything.
+
+        A page of a multi-page file is identified by the file's digest, its
+        frame and (for a PDF) the dpi, so changing any page of such a file
+        changes the digest of all its pages.
+        """
+        index, frame, pdf = self.pages[i]
+        input_digest = self._input_digests.get(index)
+        if input_digest is None:
+            input_digest = self._input_digests[index] = digest_image(self.inputs[index])
+        if frame is None:
+            return input_digest
+        parts = [input_digest, frame, self.dpi if pdf else None]
+        return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+    def source_size(self, i):
+        """Encoded size of page i; a multi-page file's size is split evenly across its pages."""
+        index, frame, _ = self.pages[i]
+        size = source_size(self.inputs[index])
+        if frame is None:
+            return size
+        return size // sum(1 for page in self.pages if page[0] == index)
+
+    def load(self, i):
+        """Returns page i as a PIL image; the caller closes it. Prefer open(i)."""
+        index, frame, pdf = self.pages[i]
+        image_data = self.inputs[index]
+        if not pdf:
+            img = load_image(image_data, self.timings)
+            if frame is not None:
+                img.seek(frame)
+            return img
+
+        load_start = time.perf_counter()
+        pdf_document = open_pdf(image_data)
+        try:
+            page = pdf_document[frame]
+            try:
+                return page.render(scale=self.dpi / POINTS_PER_INCH).to_pil()
+            finally:
+                page.close()
+        finally:
+            pdf_document.close()
+            record_since(self.timings, 'load_image', load_start)
+
+    @contextlib.contextmanager
+    def open(self, i):
+        """Yields page i as a PIL image and closes it when the block exits."""
+        img = self.load(i)
+        try:
+            yield img
+        finally:
+            img.close()
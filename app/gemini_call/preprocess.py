@@ -0,0 +1,55 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'PNG': 'image/png'}
+
+
+def source_size(image_data):
+    """Returns the encoded size in bytes of an image given as a file path or raw bytes."""
+    if isinstance(image_data, bytes):
+        return len(image_data)
+    return os.path.getsize(image_data)
+
+
+def preprocess_image(img, max_edge=2048, grayscale=False, image_format='JPEG', quality=85):
+    """Shrinks a page image into a compact blob for the model call.
+
+    The EXIF orientation is applied first, so the model sees the page upright.
+    annotate.draw_modifications applies the same transpose, so the relative
+    [0,1] coordinates the model returns still land on the original image.
+    Resizing keeps the aspect ratio for the same reason.
+
+    Args:
+        img (PIL.Image.Image): The opened page image. Its pixels are not modified, though a JPEG that hasn't been
+            decoded yet is switched to reduced-size decoding.
+        max_edge (int): Longest edge in pixels after resizing. None keeps the original size.
+        grayscale (bool): Convert to 8-bit grayscale, which also shrinks the encoded size.
+        image_format (str): 'JPEG', 'WEBP' or 'PNG'.
+        quality (int): Encoder quality for JPEG/WebP.
+
+    Returns:
+        dict: An inline blob {'mime_type': ..., 'data': bytes} accepted by the Gemini SDK.
+    """
+    if max_edge and img.format == 'JPEG':
+        # Lets the JPEG decoder scale down by up to 8x while decoding, so a large scan is never fully decoded
+        img.draft(img.mode, (max_edge, max_edge))
+    img = ImageOps.exif_transpose(img)
+    if max_edge and max(img.size) > max_edge:
+        img = img.copy()
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    if grayscale:
+        img = img.convert('L')
+    elif img.mode not in ('RGB', 'L'):
+        # Flatten transparency onto white; JPEG has no alpha and scans are on white paper
+        background = Image.new('RGB', img.size, 'white')
+        rgba = img.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        img = background
+
+    buffer = io.BytesIO()
+    save_args = {'optimize': True} if image_format == 'PNG' else {'quality': quality}
+    img.save(buffer, format=image_format, **save_args)
+    return {'mime_type': MIME_TYPES[image_format], 'data': buffer.getvalue()}
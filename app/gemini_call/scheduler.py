@@ -0,0 +1,280 @@
+import collections
+import random
+import threading
+import time
+
+from .backends import BackendError, BlockedResponseError
+from .timing import percentile
+
+# Gemini bills every image as a fixed number of tokens regardless of its size
+TOKENS_PER_IMAGE = 258
+
+
+def estimate_tokens(contents):
+    """Rough input token count for a generate() call: ~4 characters per text token plus a flat cost per image."""
+    if isinstance(contents, str):
+        return len(contents) // 4 + 1
+    tokens = 0
+    for part in contents:
+        tokens += len(part) // 4 + 1 if isinstance(part, str) else TOKENS_PER_IMAGE
+    return tokens
+
+
+class CircuitOpenError(BackendError):
+    """Raised without calling the model while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 units per second up to capacity; reservations may go into debt.
+
+    Letting the balance go negative turns each reservation into a wait time,
+    so callers are served in the order they reserved instead of racing for refills.
+    Not thread-safe on its own; ModelScheduler calls it under its lock.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        # Six seconds of budget: enough to absorb a burst without overshooting a provider's per-minute window
+        self.capacity = capacity or max(1, per_minute / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """Takes amount units and returns how many seconds the caller must wait before using them."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)  # A single call larger than the bucket would otherwise never fit
+        return max(0.0, -self.tokens / self.rate)
+
+
+class CircuitBreaker:
+    """Stops model calls after repeated failures, then lets one probe call through after reset_timeout.
+
+    Quota errors (429) and blocked responses count as successes: the
+    provider is up and answered, we are just too fast (which backoff
+    handles) or the prompt was refused.
+
+    Args:
+        failure_threshold (int): Consecutive failed calls that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a probe call is allowed.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if self._probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def before_call(self):
+        """Raises CircuitOpenError unless the circuit is closed or this call is the half-open probe."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if not self._probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._probing = True
+                return
+            raise CircuitOpenError("Model calls suspended after repeated failures (circuit open)", retryable=True,
+                                   retry_after=max(0.0, self.opened_at + self.reset_timeout - time.monotonic()))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class ModelScheduler:
+    """Process-wide gate every model call goes through.
+
+    Each call waits for request and token budget (token buckets for
+    requests/min and tokens/min) and for a free in-flight slot, then runs.
+    Retryable BackendErrors are retried with exponential backoff and full
+    jitter, honoring the provider's retry-after when given. Errors that are
+    not retryable, or that remain after max_retries, are raised to the caller
+    so a page is never silently scored as zero.
+
+    Args:
+        requests_per_minute (int): Request budget, or None for no limit.
+        tokens_per_minute (int): Input token budget (see estimate_tokens), or None for no limit.
+        max_in_flight (int): Calls allowed to run at the same time.
+        max_retries (int): Retries after the first attempt for retryable errors.
+        base_delay (float): Backoff before the first retry, in seconds; doubles per attempt.
+        max_delay (float): Upper bound on a single backoff, in seconds.
+        breaker (CircuitBreaker): Circuit breaker shared by all calls. Defaults to CircuitBreaker().
+        seed (int): Seed for the backoff jitter, for reproducible load tests.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_in_flight=8, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, breaker=None, seed=None):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0  # 429 responses seen
+        self.failures = 0  # Calls that raised after all retries
+        self.wait_samples = collections.deque(maxlen=10000)
+
+    def _acquire(self, tokens):
+        """Blocks until the call fits the rate budgets and an in-flight slot is free; returns seconds waited."""
+        start = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+            delay = 0.0
+            if self.request_bucket is not None:
+                delay = max(delay, self.request_bucket.reserve(1, start))
+            if self.token_bucket is not None:
+                delay = max(delay, self.token_bucket.reserve(tokens, start))
+        try:
+            if delay:
+                time.sleep(delay)
+            self._slots.acquire()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        waited = time.monotonic() - start
+        with self._lock:
+            self.in_flight += 1
+            self.wait_samples.append(waited)
+        return waited
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def backoff(self, attempt, error):
+        """Seconds to sleep before retry number attempt (0-based)."""
+        delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if error.retry_after is not None:
+            delay = max(delay, min(error.retry_after, self.max_delay))
+        return delay
+
+    def call(self, fn, tokens=1):
+        """Runs fn() under the rate limits, retrying retryable BackendErrors; returns its result."""
+        attempt = 0
+        while True:
+            self._acquire(tokens)
+            # Every call the breaker lets through reports back, however it ends; otherwise a
+            # half-open probe that raised something unexpected would leave the circuit stuck
+            healthy = None
+            try:
+                self.breaker.before_call()
+                healthy = False
+                with self._lock:
+                    self.calls += 1
+                result = fn()
+                healthy = True
+            except BackendError as e:
+                if e.status == 429:
+                    with self._lock:
+                        self.throttled += 1
+                if healthy is False and (e.status == 429 or isinstance(e, BlockedResponseError)):
+                    healthy = True
+                if not e.retryable or attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                error = e
+            else:
+                return result
+            finally:
+                if healthy:
+                    self.breaker.record_success()
+                elif healthy is False:
+                    self.breaker.record_failure()
+                self._release()
+
+            with self._lock:
+                self.retries += 1
+            time.sleep(self.backoff(attempt, error))
+            attempt += 1
+
+    def stats(self):
+        """Returns queue depth, in-flight calls, counters, circuit state and wait-time percentiles (seconds)."""
+        with self._lock:
+            waits = list(self.wait_samples)
+            stats = {
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+            }
+        stats["circuit"] = self.breaker.state
+        stats["wait"] = {
+            "p50": percentile(waits, 50),
+            "p95": percentile(waits, 95),
+            "p99": percentile(waits, 99),
+            "max": max(waits, default=None),
+        }
+        return stats
+
+
+class ScheduledBackend:
+    """Wraps a backend so every generate() goes through a ModelScheduler.
+
+    Image registration is passed straight through: uploads are not model calls
+    and have their own provider limits. Other attributes (model_name, calls,
+    uploads, ...) are read from the wrapped backend.
+
+    Args:
+        backend: The GeminiBackend or FakeBackend to call.
+        scheduler (ModelScheduler): Scheduler shared by every backend in the process.
+    """
+
+    def __init__(self, backend, scheduler):
+        self.backend = backend
+        self.scheduler = scheduler
+
+    def generate(self, contents, response_schema=None):
+        return self.scheduler.call(lambda: self.backend.generate(contents, response_schema=response_schema),
+                                   estimate_tokens(contents))
+
+    def register_images(self, images, keys):
+        return self.backend.register_images(images, keys)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+def scheduler_from_config(config):
+    """Builds a ModelScheduler from the GRADING_* settings of a Flask config or Config class."""
+    get = config.get if hasattr(config, 'get') else lambda key: getattr(config, key)
+    return ModelScheduler(
+        requests_per_minute=get('GRADING_REQUESTS_PER_MINUTE') or None,
+        tokens_per_minute=get('GRADING_TOKENS_PER_MINUTE') or None,
+        max_in_flight=get('GRADING_MAX_IN_FLIGHT'),
+        max_retries=get('GRADING_MAX_RETRIES'),
+        base_delay=get('GRADING_RETRY_BASE_DELAY'),
+        max_delay=get('GRADING_RETRY_MAX_DELAY'),
+        breaker=CircuitBreaker(get('GRADING_CIRCUIT_FAILURES'), get('GRADING_CIRCUIT_RESET')),
+    )
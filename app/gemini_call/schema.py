@@ -0,0 +1,133 @@
+import json
+
+# Response schema for a graded page, in the OpenAPI subset Gemini's structured output accepts
+PAGE_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "page_results": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "question_number": {"type": "INTEGER"},
+                    "score": {"type": "NUMBER"},
+                    "analysis": {"type": "STRING"},
+                },
+                "required": ["question_number", "score", "analysis"],
+            },
+        },
+        "image_modifications": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "shape": {"type": "STRING", "enum": ["circle", "rectangle", "line"]},
+                    "color": {"type": "STRING"},
+                    "coordinates": {"type": "ARRAY", "items": {"type": "NUMBER"}},
+                    "line_width": {"type": "INTEGER"},
+                    "font_size": {"type": "INTEGER"},
+                    "text": {"type": "STRING"},
+                    "question_number": {"type": "INTEGER"},
+                },
+                "required": ["shape", "coordinates"],
+            },
+        },
+    },
+    "required": ["page_results", "image_modifications"],
+}
+
+_TYPE_CHECKS = {
+    "OBJECT": lambda value: isinstance(value, dict),
+    "ARRAY": lambda value: isinstance(value, list),
+    "STRING": lambda value: isinstance(value, str),
+    # bool is an int subclass but never a valid score or coordinate
+    "INTEGER": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "NUMBER": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+}
+
+
+def compile_validator(schema):
+    """Turns a schema into a validator function, walking the schema once instead of on every response.
+
+    The returned function takes a decoded value and returns a list of error
+    strings, empty when the value matches.
+    """
+    type_check = _TYPE_CHECKS[schema["type"]]
+    enum = schema.get("enum")
+    properties = {name: compile_validator(sub) for name, sub in schema.get("properties", {}).items()}
+    required = schema.get("required", ())
+    items = compile_validator(schema["items"]) if "items" in schema else None
+    expected = schema["type"].lower()
+
+    def validate(value, path="$"):
+        if not type_check(value):
+            return [f"{path}: expected {expected}, got {type(value).__name__}"]
+        if enum is not None and value not in enum:
+            return [f"{path}: {value!r} is not one of {enum}"]
+        errors = []
+        if properties or required:
+            errors.extend(f"{path}.{name}: missing" for name in required if name not in value)
+            for name, validate_property in properties.items():
+                if name in value:
+                    errors.extend(validate_property(value[name], f"{path}.{name}"))
+        if items is not None:
+            for index, item in enumerate(value):
+                errors.extend(items(item, f"{path}[{index}]"))
+        return errors
+
+    return validate
+
+
+validate_page_response = compile_validator(PAGE_RESPONSE_SCHEMA)
+_validate_modification = compile_validator(PAGE_RESPONSE_SCHEMA["properties"]["image_modifications"]["items"])
+
+
+def extract_json(text):
+    """Decodes the first JSON value in text, tolerating markdown fences and prose around it.
+
+    Raises:
+        json.JSONDecodeError: If no JSON value can be decoded.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start = text.find("{")
+        if start < 0:
+            raise
+        value, _ = json.JSONDecoder().raw_decode(text[start:])
+        return value
+
+
+def parse_page_response(text):
+    """Parses and validates one page's grading response.
+
+    Invalid image modifications are dropped rather than failing the page,
+    since they only affect annotation. A bare "0" means no answers on the page.
+
+    Returns:
+        tuple: (result dict or None, list of error strings). result is None when the page must be re-asked.
+    """
+    try:
+        result = extract_json(text)
+    except json.JSONDecodeError as e:
+        return None, [f"response is not valid JSON: {e}"]
+    if result == 0:
+        return {"page_results": [], "image_modifications": []}, []
+
+    if isinstance(result, dict) and isinstance(result.get("image_modifications"), list):
+        result["image_modifications"] = [mod for mod in result["image_modifications"] if not _validate_modification(mod)]
+    errors = validate_page_response(result)
+    return (None, errors) if errors else (result, [])
+
+
+def reask_prompt(errors):
+    """Builds the follow-up prompt that asks the model to fix its previous response for the same page."""
+    listed = "\n".join(f"- {error}" for error in errors[:10])
+    return ("Your previous response for this page could not be used:\n"
+            f"{listed}\n"
+            "Grade the same page again and respond with only a JSON object matching the requested format, "
+            "with \"page_results\" and \"image_modifications\" lists.")
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+
+def percentile(values, pct):
+    """Returns the pct-th percentile (0-100) of values using linear interpolation, or None if values is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class StageTimings:
+    """Thread-safe collector of wall-clock durations per pipeline stage."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.samples[name].append(seconds)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager that records how long its body took under the given stage name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        """Returns count, total and p50/p95/p99 (in seconds) for every recorded stage."""
+        with self._lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+        return {
+            name: {
+                "count": len(values),
+                "total": sum(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for name, values in samples.items()
+        }
+
+
+# Process-wide callbacks fed every stage duration and event count, e.g. the /metrics histograms
+_observers = []
+_counter_observers = []
+
+
+def add_observer(observer):
+    """Registers observer(name, seconds) to be called for every stage recorded in this process."""
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def add_counter_observer(observer):
+    """Registers observer(name, amount) to be called for every event counted in this process."""
+    if observer not in _counter_observers:
+        _counter_observers.append(observer)
+
+
+def count(timings, name, amount=1):
+    """Counts an event (e.g. a parse failure) in timings (if given) and in every counter observer."""
+    if timings is not None:
+        timings.count(name, amount)
+    for observer in _counter_observers:
+        observer(name, amount)
+
+
+@contextmanager
+def _timed(timings, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_since(timings, name, start)
+
+
+def stage(timings, name):
+    """Times its body under the given stage name, or is a no-op when there is no timings and no observer."""
+    if timings is None and not _observers:
+        return nullcontext()
+    return _timed(timings, name)
+
+
+def record_since(timings, name, start):
+    """Records time.perf_counter() - start under name in timings (if given) and in every observer."""
+    seconds = time.perf_counter() - start
+    if timings is not None:
+        timings.record(name, seconds)
+    for observer in _observers:
+        observer(name, seconds)
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import Request, current_app
+
+ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.tif', '.tiff', '.pdf'}
+MULTI_PAGE_EXTENSIONS = {'.tif', '.tiff', '.pdf'}  # Expanded to one homework page per frame
+CHUNK_SIZE = 1024 * 1024
+DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+class HashingTempFile:
+    """Temporary file that computes the sha256 of everything written to it.
+
+    Werkzeug writes each multipart file part into this object chunk by chunk,
+    so the upload is hashed while it streams to disk and never held in memory.
+    If the file is closed without being committed to the store, it is deleted.
+    """
+
+    def __init__(self, tmp_dir):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=tmp_dir, suffix='.part', delete=False)
+        self.path = self._file.name
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.committed = False
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+    def page_frames(self, ext):
+        """page_frames() of the upload while it is still a temp file, so a bad upload never reaches the store."""
+        self._file.flush()
+        return page_frames(self.path, ext)
+
+    def detach(self):
+        """Flushes and closes the file and returns its path; the caller then owns the file, so close() keeps it."""
+        self.committed = True
+        self._file.close()
+        return self.path
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read/seek/tell/flush etc. go to the underlying file
+        return getattr(self._file, name)
+
+
+class ImageStore:
+    """Content-addressed blob store for uploaded page images.
+
+    Blobs live at <root>/ab/cd/<sha256><ext>, so identical uploads map to the
+    same file and are stored once.
+
+    Args:
+        root (str): Root folder of the store.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    def path_for(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}{ext}")
+
+    def resolve(self, reference):
+        """Returns the stored path of a blob given its sha256 digest or its path in the store, or None.
+
+        Anything that isn't exactly a blob of this store (other files, paths
+        that only point into it through '..' or links, temp files) is None,
+        so client-supplied references can't reach other files on the server.
+        """
+        if not isinstance(reference, str):
+            return None
+        if DIGEST_PATTERN.fullmatch(reference):
+            candidates = [self.path_for(reference, ext) for ext in sorted(ALLOWED_EXTENSIONS)]
+        else:
+            digest, ext = os.path.splitext(os.path.basename(reference))
+            if not DIGEST_PATTERN.fullmatch(digest) or ext not in ALLOWED_EXTENSIONS:
+                return None
+            path = self.path_for(digest, ext)
+            if os.path.realpath(reference) != os.path.realpath(path):
+                return None
+            candidates = [path]
+        return next((path for path in candidates if os.path.isfile(path)), None)
+
+    def commit(self, temp_file, ext):
+        """Moves a fully written HashingTempFile into the store.
+
+        Returns:
+            tuple: (sha256 hex digest, stored path, whether an identical blob already existed)
+        """
+        temp_path = temp_file.detach()
+        digest = temp_file.hexdigest()
+        path = self.path_for(digest, ext)
+        existed = os.path.exists(path)
+        if existed:
+            os.remove(temp_path)  # Duplicate upload costs no extra disk
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        return digest, path, existed
+
+    def put_file(self, fileobj, ext):
+        """Streams any readable file object into the store in chunks. Returns the same tuple as commit()."""
+        temp_file = HashingTempFile(self.tmp_dir)
+        try:
+            for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+                temp_file.write(chunk)
+            return self.commit(temp_file, ext)
+        finally:
+            temp_file.close()
+
+
+def get_image_store():
+    return ImageStore(current_app.config['IMAGE_STORE_DIR'])
+
+
+def normalized_extension(filename):
+    """Returns the lower-cased extension of an uploaded file name, or None if it isn't an allowed page format."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    return ext if ext in ALLOWED_EXTENSIONS else None
+
+
+def page_frames(path, ext):
+    """Returns the frame of each page a stored upload holds: [None] for a single image, else one index per page.
+
+    Only TIFFs and PDFs are opened, and only to read their page count.
+    """
+    from .gemini_call.pages import count_frames
+
+    if ext not in MULTI_PAGE_EXTENSIONS:
+        return [None]
+    frames = count_frames(path)
+    if frames == 1 and ext != '.pdf':
+        return [None]  # Same as PageSource: a single-frame TIFF is a plain image
+    return list(range(frames))
+
+
+class UploadRequest(Request):
+    """Request class that streams uploaded files straight into hashing temp files inside the image store."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingTempFile(get_image_store().tmp_dir)
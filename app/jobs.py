@@ -0,0 +1,265 @@
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Process
+
+from flask import current_app
+
+from . import metrics
+from .extensions import db
+from .models import GradingJob, Homework
+
+_response_cache = None
+_backend = None
+
+
+def get_response_cache():
+    """Returns this process's grading response cache, creating it from the app config on first use."""
+    global _response_cache
+    if _response_cache is None:
+        from .gemini_call.cache import ResponseCache
+
+        _response_cache = ResponseCache(
+            current_app.config['GRADING_CACHE_DIR'],
+            max_entries=current_app.config['GRADING_CACHE_MAX_ENTRIES'],
+            max_age=current_app.config['GRADING_CACHE_MAX_AGE'],
+        )
+    return _response_cache
+
+
+def get_grading_backend():
+    """Returns this process's grading backend, so problem images registered for one job are reused by the next.
+
+    The backend is wrapped in the process-wide ModelScheduler, so every model
+    call shares the same rate limits, retries and circuit breaker, and in a
+    HedgedBackend on top of that when GRADING_HEDGE_PERCENTILE is set.
+    """
+    global _backend
+    if _backend is None:
+        from .gemini_call.backends import get_backend
+        from .gemini_call.scheduler import ScheduledBackend, scheduler_from_config
+
+        config = current_app.config
+        _backend = ScheduledBackend(get_backend(config['GRADING_BACKEND']), scheduler_from_config(config))
+        if config['GRADING_HEDGE_PERCENTILE']:
+            from .gemini_call.hedging import HedgedBackend
+
+            _backend = HedgedBackend(_backend, config['GRADING_HEDGE_PERCENTILE'], config['GRADING_HEDGE_MAX_EXTRA'])
+    return _backend
+
+
+def enqueue_grading_job(homework, grading_standards, scoring_difficulty=5, problem_image_paths=None):
+    """Adds a grading job for a homework to the queue and returns it.
+
+    Args:
+        homework (Homework): The homework whose answer pages should be graded.
+        grading_standards (str): Textual description of the grading standards.
+        scoring_difficulty (int): A value between 1-10 representing the stringency of grading.
+        problem_image_paths (list of str): Paths to the problem images.
+    """
+    job = GradingJob(
+        homework_id=homework.id,
+        grading_standards=grading_standards,
+        scoring_difficulty=scoring_difficulty,
+        problem_image_paths=json.dumps(problem_image_paths or []),
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim_next_job(worker_name):
+    """Atomically moves the oldest queued job to 'running' and returns it, or None if the queue is empty.
+
+    The status check in the UPDATE makes the claim safe when several worker
+    processes race for the same row: only one of them sees a rowcount of 1.
+    """
+    while True:
+        job_id = db.session.execute(
+            db.select(GradingJob.id)
+            .where(GradingJob.status == 'queued')
+            .order_by(GradingJob.created_at)
+            .limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            db.update(GradingJob)
+            .where(GradingJob.id == job_id, GradingJob.status == 'queued')
+            .values(status='running', worker=worker_name, started_at=now, heartbeat_at=now,
+                    attempts=GradingJob.attempts + 1)
+        )
+        db.session.commit()
+        if claimed.rowcount == 1:
+            return db.session.get(GradingJob, job_id)
+
+
+def requeue_stale_jobs(lease, max_attempts):
+    """Hands running jobs whose worker stopped heartbeating back to the queue, and returns how many were requeued.
+
+    A worker that dies mid-job leaves its row in 'running' forever otherwise.
+    Jobs already claimed max_attempts times are failed instead, so a page
+    that crashes every worker can't loop through the pool indefinitely.
+
+    Args:
+        lease (float): Seconds since the last heartbeat after which a running job counts as abandoned.
+        max_attempts (int): Claims a job gets before it is failed rather than requeued.
+    """
+    now = datetime.utcnow()
+    stale = (GradingJob.status == 'running', GradingJob.heartbeat_at < now - timedelta(seconds=lease))
+    failed = db.session.execute(
+        db.update(GradingJob)
+        .where(*stale, GradingJob.attempts >= max_attempts)
+        .values(status='failed', error=f"Worker stopped responding on each of {max_attempts} attempts",
+                finished_at=now)
+    )
+    # Pages streamed by the dead worker are dropped; the next worker sends them again
+    requeued = db.session.execute(
+        db.update(GradingJob)
+        .where(*stale)
+        .values(status='queued', worker=None, started_at=None, heartbeat_at=None, page_results='[]')
+    )
+    db.session.commit()
+    if failed.rowcount:
+        metrics.GRADING_JOBS_TOTAL.inc('failed', amount=failed.rowcount)
+    return requeued.rowcount
+
+
+def preprocess_options():
+    """Returns the grade_answer_gemini preprocess options from the config, or None when preprocessing is off."""
+    config = current_app.config
+    if not config['GRADING_MAX_EDGE'] and not config['GRADING_GRAYSCALE']:
+        return None
+    return {
+        'max_edge': config['GRADING_MAX_EDGE'] or None,
+        'grayscale': config['GRADING_GRAYSCALE'],
+        'image_format': config['GRADING_IMAGE_FORMAT'],
+    }
+
+
+def blank_page_options():
+    """Returns the grade_answer_gemini blank_page options from the config, or None when blank pages are graded too."""
+    config = current_app.config
+    if not config['GRADING_SKIP_BLANK_PAGES']:
+        return None
+    return {
+        'ink_delta': config['GRADING_BLANK_INK_DELTA'],
+        'max_ink_ratio': config['GRADING_BLANK_MAX_INK_RATIO'],
+        'max_std': config['GRADING_BLANK_MAX_STD'],
+        'use_template': config['GRADING_BLANK_USE_TEMPLATE'],
+    }
+
+
+def run_job(job):
+    """Grades the homework attached to a claimed job and stores the results in Homework.analysis."""
+    from .gemini_call.gemini import grade_answer_gemini
+    from .gemini_call.pages import PageSource
+
+    homework = db.session.get(Homework, job.homework_id)
+
+    def save_page_result(page_index, scores, analyses, image_modifications):
+        # Committed per page so /jobs/<id>/stream can push it to the browser right away
+        job.add_page_result(page_index, scores, analyses, image_modifications)
+        job.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+
+    try:
+        # Pages whose inputs haven't changed since the last grading are reused instead of regraded
+        previous_pages, previous_feedback = homework.previous_results()
+        results = grade_answer_gemini(
+            job.get_problem_images(),
+            PageSource.from_pages(homework.get_pages()),
+            job.grading_standards,
+            job.scoring_difficulty,
+            max_workers=current_app.config['GRADING_MAX_WORKERS'],
+            cache=get_response_cache(),
+            backend=get_grading_backend(),
+            on_page_result=save_page_result,
+            preprocess=preprocess_options(),
+            blank_page=blank_page_options(),
+            previous_pages=previous_pages,
+            previous_feedback=previous_feedback,
+        )
+        if results is None:
+            raise RuntimeError("Grading returned no results")
+        homework.set_results(results)
+        save_annotations(homework, results['image_modifications'])
+        job.status = 'done'
+        print(f"Grading job {job.id} done, cache stats: {get_response_cache().stats()}, "
+              f"scheduler stats: {get_grading_backend().scheduler.stats()}")
+    except Exception as e:
+        print(f"Grading job {job.id} failed: {e}")
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    metrics.GRADING_JOBS_TOTAL.inc(job.status)
+
+
+def save_annotations(homework, image_modifications):
+    """Stores a graded homework's image modifications according to the ANNOTATION_MODE setting.
+
+    Overlay documents are always written, so annotated pages can be served on
+    demand. In 'raster' mode corrected copies are also written to a folder per
+    homework, so pages with the same file name never overwrite each other.
+    """
+    from .gemini_call.gemini import apply_image_modifications
+    from .gemini_call.overlays import save_overlays
+    from .gemini_call.pages import PageSource
+
+    pages = homework.get_pages()
+    save_overlays(current_app.config['OVERLAY_DIR'], homework.id, pages, image_modifications)
+
+    if current_app.config['ANNOTATION_MODE'] == 'raster':
+        output_folder = os.path.join(current_app.config['CORRECTED_IMAGES_DIR'], str(homework.id))
+        page_source = PageSource.from_pages(pages)
+        for page_index, ((image_path, frame), modifications) in enumerate(zip(pages, image_modifications)):
+            # Frames of a TIFF or PDF are saved as PNGs; a PDF can't hold the rasterized page as is
+            ext = '.png' if frame is not None else os.path.splitext(image_path)[1] or '.png'
+            with page_source.open(page_index) as img:
+                apply_image_modifications(img, modifications, output_folder, output_name=f"page_{page_index}{ext}")
+
+
+def worker_loop(poll_interval=1.0):
+    """Pulls and runs grading jobs forever. Must be called inside an application context."""
+    worker_name = f"{socket.gethostname()}-{os.getpid()}"
+    print(f"Grading worker {worker_name} started")
+    config = current_app.config
+    if config['METRICS_ENABLED']:
+        metrics.dump(config['METRICS_DIR'])
+    while True:
+        requeued = requeue_stale_jobs(config['GRADING_JOB_LEASE'], config['GRADING_JOB_MAX_ATTEMPTS'])
+        if requeued:
+            print(f"Worker {worker_name} requeued {requeued} abandoned grading jobs")
+        job = claim_next_job(worker_name)
+        if job is None:
+            db.session.remove()
+            time.sleep(poll_interval)
+            continue
+        print(f"Worker {worker_name} grading job {job.id}")
+        run_job(job)
+        if config['METRICS_ENABLED']:
+            metrics.dump(config['METRICS_DIR'])
+
+
+def _worker_main(poll_interval):
+    from . import create_app
+
+    app = create_app()
+    with app.app_context():
+        worker_loop(poll_interval)
+
+
+def start_workers(num_workers=2, poll_interval=1.0):
+    """Starts a pool of grading worker processes and returns them."""
+    processes = []
+    for _ in range(num_workers):
+        process = Process(target=_worker_main, args=(poll_interval,), daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
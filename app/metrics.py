@@ -0,0 +1,227 @@
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+
+from .extensions import db
+
+# Prometheus' default buckets, extended to cover slow model calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values, cheap enough to observe on every request.
+
+    Args:
+        name (str): Metric name.
+        documentation (str): HELP text.
+        labelnames (tuple of str): Label names; observe() takes their values in the same order.
+        buckets (tuple of float): Upper bounds of the buckets, ascending. +Inf is implicit.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            series = [[list(labels), list(counts), total, count] for labels, (counts, total, count) in self._series.items()]
+        return {'kind': self.kind, 'help': self.documentation, 'labelnames': list(self.labelnames),
+                'buckets': list(self.buckets), 'series': series}
+
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            series = [[list(labels), value] for labels, value in self._series.items()]
+        return {'kind': self.kind, 'help': self.documentation, 'labelnames': list(self.labelnames), 'series': series}
+
+
+GRADING_STAGE_SECONDS = Histogram('grading_stage_seconds', "Duration of each grading pipeline stage.", ('stage',))
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', "Time spent handling HTTP requests.",
+                                 ('method', 'route', 'status'))
+DB_COMMIT_SECONDS = Histogram('db_commit_seconds', "Duration of database session commits, including the flush.")
+GRADING_JOBS_TOTAL = Counter('grading_jobs_total', "Grading jobs finished, by final status.", ('status',))
+GRADING_EVENTS_TOTAL = Counter('grading_events_total',
+                               "Grading pipeline events, e.g. model_response, parse_failure, reask, page_failed.",
+                               ('event',))
+
+METRICS = (GRADING_STAGE_SECONDS, HTTP_REQUEST_SECONDS, DB_COMMIT_SECONDS, GRADING_JOBS_TOTAL, GRADING_EVENTS_TOTAL)
+
+
+def snapshot():
+    """Returns this process's metrics as a JSON-serializable dict."""
+    return {metric.name: metric.snapshot() for metric in METRICS}
+
+
+def dump(directory):
+    """Writes this process's metrics to <directory>/<pid>.json, so another process's /metrics can include them.
+
+    Grading workers run in separate processes; they dump when they start, which
+    replaces any file left by an earlier process with the same pid, and after
+    every job. render() skips and removes the files of processes that have exited.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid):
+    """Tells whether a process with this pid is running on this host."""
+    if os.name == 'nt':
+        return True  # os.kill(pid, 0) would send CTRL_C_EVENT on Windows; keep every dump there
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Running, under another user
+    return True
+
+
+def _merge(target, source):
+    for name, metric in source.items():
+        if name not in target:
+            target[name] = {key: value for key, value in metric.items() if key != 'series'}
+            target[name]['series'] = {}
+        merged = target[name]['series']
+        for entry in metric['series']:
+            labels = tuple(entry[0])
+            if metric['kind'] == 'counter':
+                merged[labels] = merged.get(labels, 0) + entry[1]
+            else:
+                counts, total, count = merged.get(labels, ([0] * len(entry[1]), 0.0, 0))
+                merged[labels] = ([a + b for a, b in zip(counts, entry[1])], total + entry[2], count + entry[3])
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render(directory=None):
+    """Renders the metrics of this process, plus any dumped by other processes into directory, in Prometheus text format."""
+    merged = {}
+    _merge(merged, snapshot())
+    if directory and os.path.isdir(directory):
+        own_file = f"{os.getpid()}.json"
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith('.json') or file_name == own_file:
+                continue
+            path = os.path.join(directory, file_name)
+            pid = os.path.splitext(file_name)[0]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                # A dead worker's totals would otherwise be added to every scrape forever
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    _merge(merged, json.load(f))
+            except (OSError, ValueError):
+                continue  # Being rewritten or truncated; picked up on the next scrape
+
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        labelnames = metric['labelnames']
+        for labels, value in sorted(metric['series'].items()):
+            if metric['kind'] == 'counter':
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(metric['buckets'] + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labelnames, labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def _observe_stage(name, seconds):
+    GRADING_STAGE_SECONDS.observe(seconds, name)
+
+
+def _count_event(name, amount):
+    GRADING_EVENTS_TOTAL.inc(name, amount=amount)
+
+
+def init_app(app):
+    """Starts recording grading stages, request timings per route and DB commit timings, if METRICS_ENABLED."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    from .gemini_call.timing import add_counter_observer, add_observer
+
+    add_observer(_observe_stage)
+    add_counter_observer(_count_event)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            # The route pattern, not the URL, keeps the label set bounded
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, route, str(response.status_code))
+        return response
+
+    if not event.contains(db.session, 'before_commit', _start_commit_timer):
+        event.listen(db.session, 'before_commit', _start_commit_timer)
+        event.listen(db.session, 'after_commit', _record_commit_time)
+
+
+def _start_commit_timer(session):
+    session.info['commit_start'] = time.perf_counter()
+
+
+def _record_commit_time(session):
+    start = session.info.pop('commit_start', None)
+    if start is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - start)
@@ -1,7 +1,9 @@
 from .extensions import db, login_manager
+from .user_cache import UserCache
 from flask_login import UserMixin
 import uuid
 import json
+from datetime import datetime
 
 class User(UserMixin, db.Model):
     id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -11,34 +13,225 @@ class User(UserMixin, db.Model):
     homeworks = db.relationship('Homework', back_populates='user', cascade='all, delete-orphan')
 
 class Homework(db.Model):
+    __table_args__ = (db.Index('ix_homework_user_id_due_date_id', 'user_id', 'due_date', 'id'),)
+
     id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = db.Column(db.String(100), nullable=False)
     subject = db.Column(db.String(50), nullable=False)
     due_date = db.Column((db.Date), nullable=False)
-    image_paths = db.Column((db.Text), nullable=False, default='[]')  # JSON list of paths
-    analysis = db.Column((db.Text), nullable=False, default='[]')  # JSON list of paths
+    analysis = db.Column((db.Text), nullable=False, default='[]')  # JSON of the full grading results
     user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False)
     
     user = db.relationship('User', back_populates='homeworks')
+    pages = db.relationship('HomeworkPage', back_populates='homework', cascade='all, delete-orphan',
+                            order_by='HomeworkPage.page_index')
+    question_results = db.relationship('QuestionResult', back_populates='homework', cascade='all, delete-orphan',
+                                       order_by='QuestionResult.position')
+    grading_jobs = db.relationship('GradingJob', back_populates='homework', cascade='all, delete-orphan')
 
-    def add_image(self, path):
-        """Add image path to homework"""
-        paths = json.loads(self.image_paths)
-        paths.append(path)
-        self.image_paths = json.dumps(paths)
+    def add_image(self, path, frame=None):
+        """Add image path to homework; frame picks one page of a multi-page TIFF or PDF"""
+        self.pages.append(HomeworkPage(page_index=len(self.pages), image_path=path, frame=frame))
 
     def get_images(self):
         """Get list of image paths"""
-        return json.loads(self.image_paths)
+        return [page.image_path for page in self.pages]
+
+    def get_pages(self):
+        """Get (image path, frame) for every page, the form PageSource.from_pages takes"""
+        return [(page.image_path, page.frame) for page in self.pages]
+
+    def replace_image(self, page_index, path, frame=None):
+        """Swap the image of one page, dropping its stored result so the next regrade recomputes it"""
+        page = self.pages[page_index]
+        page.image_path = path
+        page.frame = frame
+        page.fingerprint = None
+        page.result = None
+
+    def set_results(self, results):
+        """Store grading results, replacing any earlier per-question rows and per-page results"""
+        self.analysis = json.dumps(results)
+        # Results from before fingerprinting (or from tools that skip it) leave every page without a stored result
+        fingerprints = results.get('page_fingerprints') or []
+        image_modifications = results.get('image_modifications') or []
+        page_indexes = results.get('page_indexes') or []
+        for index, page in enumerate(self.pages):
+            fingerprint = fingerprints[index] if index < len(fingerprints) else None
+            modifications = image_modifications[index] if index < len(image_modifications) else []
+            positions = [position for position, index in enumerate(page_indexes) if index == page.page_index]
+            page.fingerprint = fingerprint
+            page.result = json.dumps({
+                'scores': [results['scores'][position] for position in positions],
+                'analyses': [results['analyses'][position] for position in positions],
+                'question_numbers': [results['question_numbers'][position] for position in positions],
+                'image_modifications': modifications,
+            }) if fingerprint is not None else None
+        question_numbers = results.get('question_numbers') or [None] * len(results['scores'])
+        page_indexes = results.get('page_indexes') or [None] * len(results['scores'])
+        self.question_results = [
+            QuestionResult(
+                position=position,
+                page_index=page_index,
+                question_number=question_number,
+                score=score,
+                analysis=analysis if isinstance(analysis, str) else json.dumps(analysis),
+            )
+            for position, (score, analysis, question_number, page_index)
+            in enumerate(zip(results['scores'], results['analyses'], question_numbers, page_indexes))
+        ]
+
+    def previous_results(self):
+        """Earlier per-page results and feedback, in the form grade_answer_gemini takes for an incremental regrade"""
+        previous_pages = [
+            dict(json.loads(page.result), fingerprint=page.fingerprint) if page.fingerprint and page.result else None
+            for page in self.pages
+        ]
+        analysis = json.loads(self.analysis or '[]')
+        previous_feedback = None
+        if isinstance(analysis, dict) and analysis.get('feedback_fingerprint'):
+            previous_feedback = {'fingerprint': analysis['feedback_fingerprint'], 'feedback': analysis['feedback']}
+        return previous_pages, previous_feedback
+
+    @staticmethod
+    def list_for_user(user_id, limit, after=None, descending=False):
+        """One page of a user's homeworks ordered by (due_date, id), using keyset pagination.
+
+        Only the columns the list view needs are selected, so the large analysis
+        text is never read. The seek condition on (due_date, id) is served by
+        ix_homework_user_id_due_date_id, so every page costs the same however
+        long the user's history is.
+
+        Args:
+            user_id (UUID): Owner of the homeworks.
+            limit (int): Maximum number of rows to return.
+            after (tuple): (due_date, id) of the last row of the previous page, or None for the first page.
+            descending (bool): Newest due dates first.
+        """
+        key = db.tuple_(Homework.due_date, Homework.id)
+        query = db.select(Homework.id, Homework.title, Homework.subject, Homework.due_date).where(Homework.user_id == user_id)
+        if after is not None:
+            query = query.where(key < after if descending else key > after)
+        if descending:
+            query = query.order_by(Homework.due_date.desc(), Homework.id.desc())
+        else:
+            query = query.order_by(Homework.due_date, Homework.id)
+        return db.session.execute(query.limit(limit)).all()
 
     def __repr__(self):
         return f'<Homework {self.title} ({self.subject})>'
 
+class HomeworkPage(db.Model):
+    __table_args__ = (db.UniqueConstraint('homework_id', 'page_index', name='uq_homework_page_index'),)
+
+    id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    homework_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('homework.id'), nullable=False, index=True)
+    page_index = db.Column(db.Integer, nullable=False)
+    image_path = db.Column(db.String(500), nullable=False)
+    frame = db.Column(db.Integer)  # Page within a multi-page TIFF or PDF, None for a single image
+    fingerprint = db.Column(db.String(64))  # Hash of every grading input for this page's stored result
+    result = db.Column(db.Text)  # JSON of the page's scores, analyses, question numbers and modifications
+
+    homework = db.relationship('Homework', back_populates='pages')
+
+    def __repr__(self):
+        return f'<HomeworkPage {self.page_index} of {self.homework_id}>'
+
+class QuestionResult(db.Model):
+    __table_args__ = (db.Index('ix_question_result_question_number_score', 'question_number', 'score'),)
+
+    id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    homework_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('homework.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # Order within the homework's results
+    page_index = db.Column(db.Integer)  # None for results backfilled from before pages were tracked
+    question_number = db.Column(db.Integer)
+    score = db.Column(db.Float, nullable=False)
+    analysis = db.Column(db.Text)
+
+    homework = db.relationship('Homework', back_populates='question_results')
+
+    @staticmethod
+    def average_score(question_number):
+        """Average score on one question across all graded submissions"""
+        return db.session.scalar(
+            db.select(db.func.avg(QuestionResult.score)).where(QuestionResult.question_number == question_number)
+        )
+
+    def __repr__(self):
+        return f'<QuestionResult Q{self.question_number} = {self.score}>'
+
+class GradingJob(db.Model):
+    id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    homework_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('homework.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    problem_image_paths = db.Column((db.Text), nullable=False, default='[]')  # JSON list of paths
+    grading_standards = db.Column((db.Text), nullable=False)
+    scoring_difficulty = db.Column(db.Integer, nullable=False, default=5)
+    page_results = db.Column((db.Text), nullable=False, default='[]')  # JSON list of finished pages, in completion order
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(50))
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Times a worker has claimed the job
+    heartbeat_at = db.Column(db.DateTime)  # Refreshed while a worker grades; a stale heartbeat means the worker died
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    homework = db.relationship('Homework', back_populates='grading_jobs')
+
+    def get_problem_images(self):
+        """Get list of problem image paths"""
+        return json.loads(self.problem_image_paths)
+
+    def add_page_result(self, page_index, scores, analyses, image_modifications):
+        """Record a graded page so it can be streamed before the whole job finishes"""
+        pages = json.loads(self.page_results)
+        pages.append({
+            'page': page_index,
+            'scores': scores,
+            'analyses': analyses,
+            'image_modifications': image_modifications,
+        })
+        self.page_results = json.dumps(pages)
+
+    def get_page_results(self):
+        """Get list of pages graded so far"""
+        return json.loads(self.page_results)
+
+    def to_dict(self):
+        """Status payload returned by the jobs API"""
+        return {
+            'id': str(self.id),
+            'homework_id': str(self.homework_id),
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<GradingJob {self.id} ({self.status})>'
+
+user_cache = UserCache(User)
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    # Profile and password changes must never be served from a stale cache entry
+    user_cache.invalidate(target.id)
+
 @login_manager.user_loader
 def load_user(user_id):
     try:
         # Convert string UUID from session to UUID object
-        return User.query.get(uuid.UUID(user_id))
+        user_uuid = uuid.UUID(user_id)
     except (ValueError, TypeError) as e:
         print(f"Invalid user ID format: {e}")
-        return None
\ No newline at end of file
+        return None
+
+    user = user_cache.get(user_uuid)
+    if user is None:
+        user = db.session.get(User, user_uuid)
+        if user is not None:
+            user_cache.set(user)
+    return user
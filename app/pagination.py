@@ -0,0 +1,20 @@
+import base64
+import json
+import uuid
+from datetime import date
+
+
+def encode_cursor(due_date, homework_id):
+    """Encodes the (due_date, id) keyset position of the last row on a page as an opaque URL-safe string."""
+    raw = json.dumps([due_date.isoformat(), str(homework_id)]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor from encode_cursor back into (due_date, id). Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        due_date, homework_id = json.loads(raw)
+        return date.fromisoformat(due_date), uuid.UUID(homework_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
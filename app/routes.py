@@ -1,8 +1,19 @@
+import hmac
+import io
+import json
+import os
+import time
+
 from . import bcrypt, db
-from .models import User
+from .models import User, Homework, GradingJob
 from .forms import RegistrationForm, LoginForm
+from .jobs import enqueue_grading_job
+from . import metrics
+from .pagination import encode_cursor, decode_cursor
+from .image_store import get_image_store, normalized_extension
+from .gemini_call.overlays import BROWSER_IMAGE_TYPES, load_overlay, render_original, render_page
 
-from flask import redirect, url_for, request, flash, render_template 
+from flask import redirect, url_for, request, flash, render_template, jsonify, abort, send_file, Response, stream_with_context
 from flask_login import current_user, login_user, login_required, logout_user
 
 def init_routes(app):
@@ -73,6 +84,235 @@ def init_routes(app):
         print(f"User {current_user.username} accessed homework")
         return render_template("homework.html", title="Homework")
 
+    @app.route('/api/homework')
+    @login_required
+    def homework_list():
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        if limit < 1:
+            return jsonify({'error': 'limit must be positive'}), 400
+        descending = request.args.get('order', 'asc') == 'desc'
+
+        after = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        # Fetch one extra row to know whether another page exists
+        rows = Homework.list_for_user(current_user.id, limit + 1, after, descending)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].due_date, rows[-1].id) if has_more else None
+
+        return jsonify({
+            'homeworks': [{
+                'id': str(row.id),
+                'title': row.title,
+                'subject': row.subject,
+                'due_date': row.due_date.isoformat(),
+            } for row in rows],
+            'next_cursor': next_cursor,
+        })
+
+    @app.route('/homework/<uuid:homework_id>/pages', methods=['POST'])
+    @login_required
+    def upload_pages(homework_id):
+        homework = db.session.get(Homework, homework_id)
+        if homework is None or homework.user_id != current_user.id:
+            abort(404)
+
+        uploads = request.files.getlist('pages')
+        if not uploads:
+            return jsonify({'error': 'No files uploaded in the "pages" field'}), 400
+        extensions = [normalized_extension(upload.filename) for upload in uploads]
+        if None in extensions:
+            return jsonify({'error': 'Pages must be PNG, JPEG, WebP, TIFF or PDF files'}), 400
+
+        # The bodies were already streamed to disk and hashed while the form was parsed. Every file is
+        # checked before any is committed, so a rejected request leaves nothing behind in the store.
+        frames_per_upload = []
+        for upload, ext in zip(uploads, extensions):
+            try:
+                frames = upload.stream.page_frames(ext)
+            except Exception as e:
+                return jsonify({'error': f'Could not read {upload.filename}: {e}'}), 400
+            if not frames:
+                return jsonify({'error': f'{upload.filename} has no pages'}), 400
+            frames_per_upload.append(frames)
+
+        store = get_image_store()
+        stored = []
+        for upload, ext, frames in zip(uploads, extensions, frames_per_upload):
+            digest, path, existed = store.commit(upload.stream, ext)
+            # Each TIFF frame or PDF page becomes its own homework page, graded and annotated on its own
+            for frame in frames:
+                homework.add_image(path, frame)
+                stored.append({
+                    'page_index': len(homework.pages) - 1,
+                    'sha256': digest,
+                    'frame': frame,
+                    'deduplicated': existed,
+                })
+        db.session.commit()
+        print(f"User {current_user.username} uploaded {len(stored)} pages to homework {homework.id}")
+        return jsonify({'pages': stored}), 201
+
+    @app.route('/homework/<uuid:homework_id>/pages/<int:page_index>', methods=['PUT'])
+    @login_required
+    def replace_page(homework_id, page_index):
+        homework = db.session.get(Homework, homework_id)
+        if homework is None or homework.user_id != current_user.id or page_index >= len(homework.pages):
+            abort(404)
+
+        upload = request.files.get('page')
+        if upload is None:
+            return jsonify({'error': 'No file uploaded in the "page" field'}), 400
+        ext = normalized_extension(upload.filename)
+        if ext is None:
+            return jsonify({'error': 'Pages must be PNG, JPEG, WebP, TIFF or PDF files'}), 400
+
+        try:
+            frames = upload.stream.page_frames(ext)
+        except Exception as e:
+            return jsonify({'error': f'Could not read {upload.filename}: {e}'}), 400
+        if len(frames) != 1:
+            return jsonify({'error': 'A replacement must be a single page'}), 400
+        digest, path, existed = get_image_store().commit(upload.stream, ext)
+        homework.replace_image(page_index, path, frames[0])
+        db.session.commit()
+        print(f"User {current_user.username} replaced page {page_index} of homework {homework.id}")
+        # Regrading afterwards only calls the model for this page
+        return jsonify({'page_index': page_index, 'sha256': digest, 'deduplicated': existed})
+
+    @app.route('/homework/<uuid:homework_id>/grade', methods=['POST'])
+    @login_required
+    def grade_homework(homework_id):
+        homework = db.session.get(Homework, homework_id)
+        if homework is None or homework.user_id != current_user.id:
+            abort(404)
+
+        data = request.get_json(silent=True) or request.form
+        grading_standards = data.get('grading_standards')
+        if not grading_standards:
+            return jsonify({'error': 'grading_standards is required'}), 400
+        try:
+            scoring_difficulty = int(data.get('scoring_difficulty', 5))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'scoring_difficulty must be an integer'}), 400
+        problem_images = data.get('problem_images') or []
+        if isinstance(problem_images, str):
+            problem_images = [problem_images]
+        # Only blobs in the image store may be graded against; the worker opens these paths as given
+        store = get_image_store()
+        problem_paths = [store.resolve(image) for image in problem_images] if isinstance(problem_images, list) else [None]
+        if None in problem_paths:
+            return jsonify({'error': 'problem_images must be sha256 digests or paths of uploaded images'}), 400
+
+        job = enqueue_grading_job(homework, grading_standards, scoring_difficulty, problem_paths)
+        print(f"User {current_user.username} queued grading job {job.id}")
+        return jsonify({'job_id': str(job.id), 'status': job.status}), 202
+
+    @app.route('/jobs/<uuid:job_id>')
+    @login_required
+    def job_status(job_id):
+        job = db.session.get(GradingJob, job_id)
+        if job is None or job.homework.user_id != current_user.id:
+            abort(404)
+        return jsonify(job.to_dict())
+
+    @app.route('/jobs/<uuid:job_id>/stream')
+    @login_required
+    def job_stream(job_id):
+        job = db.session.get(GradingJob, job_id)
+        if job is None or job.homework.user_id != current_user.id:
+            abort(404)
+        poll_interval = app.config['JOB_STREAM_POLL_INTERVAL']
+
+        def sse(event, data):
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+        def events():
+            sent = 0
+            while True:
+                # Re-read the row on every poll so the worker's commits are visible
+                db.session.expire_all()
+                job = db.session.get(GradingJob, job_id)
+                pages = job.get_page_results()
+                for page in pages[sent:]:
+                    yield sse('page', page)
+                sent = len(pages)
+
+                if job.status == 'done':
+                    results = json.loads(job.homework.analysis)
+                    yield sse('done', {
+                        'final_score': results.get('final_score'),
+                        'feedback': results.get('feedback'),
+                    })
+                    return
+                if job.status == 'failed':
+                    yield sse('failed', {'error': job.error})
+                    return
+
+                yield ": keep-alive\n\n"
+                db.session.rollback()  # End the read transaction before sleeping
+                time.sleep(poll_interval)
+
+        print(f"User {current_user.username} streaming grading job {job_id}")
+        return Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/homework/<uuid:homework_id>/pages/<int:page_index>/overlay')
+    @login_required
+    def page_overlay(homework_id, page_index):
+        homework = db.session.get(Homework, homework_id)
+        if homework is None or homework.user_id != current_user.id:
+            abort(404)
+        overlay = load_overlay(app.config['OVERLAY_DIR'], homework.id, page_index)
+        if overlay is None:
+            abort(404)
+        # The stored document points at the blob on the server's disk; the browser gets the page's URL instead
+        return jsonify({
+            'version': overlay['version'],
+            'image_url': url_for('page_image', homework_id=homework.id, page_index=page_index),
+            'modifications': overlay['modifications'],
+        })
+
+    @app.route('/homework/<uuid:homework_id>/pages/<int:page_index>/image')
+    @login_required
+    def page_image(homework_id, page_index):
+        homework = db.session.get(Homework, homework_id)
+        if homework is None or homework.user_id != current_user.id or page_index >= len(homework.pages):
+            abort(404)
+        page = homework.pages[page_index]
+        mimetype = BROWSER_IMAGE_TYPES.get(os.path.splitext(page.image_path)[1].lower())
+        if page.frame is None and mimetype is not None:
+            return send_file(page.image_path, mimetype=mimetype)
+        # TIFF frames and PDF pages are rasterized the same way they were for grading
+        return send_file(io.BytesIO(render_original(page.image_path, page.frame)), mimetype='image/png')
+
+    @app.route('/homework/<uuid:homework_id>/pages/<int:page_index>/annotated.png')
+    @login_required
+    def annotated_page(homework_id, page_index):
+        homework = db.session.get(Homework, homework_id)
+        if homework is None or homework.user_id != current_user.id:
+            abort(404)
+        png = render_page(app.config['OVERLAY_DIR'], homework.id, page_index)
+        if png is None:
+            abort(404)
+        return send_file(io.BytesIO(png), mimetype='image/png')
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        # Prometheus scrape target: this process plus the metrics dumped by the grading workers
+        if not app.config['METRICS_ENABLED']:
+            abort(404)
+        token = app.config['METRICS_TOKEN']
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            abort(401)
+        return Response(metrics.render(app.config['METRICS_DIR']), mimetype='text/plain; version=0.0.4')
+
     @app.route('/chats')
     @login_required
     def chat():
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from .extensions import db
+
+
+class UserCache:
+    """Bounded in-process LRU cache that lets load_user skip the database on most requests.
+
+    Only column values are cached, never ORM instances, so nothing leaks between
+    sessions. A hit rebuilds the object and merges it into the current session
+    without emitting a query. Entries expire after a TTL and are invalidated
+    explicitly whenever the row is updated or deleted. The TTL bounds staleness
+    across processes.
+
+    Args:
+        model: The mapped class to cache (User).
+        max_size (int): Maximum number of cached users.
+        ttl (float): Seconds an entry stays valid.
+    """
+
+    def __init__(self, model, max_size=1024, ttl=300):
+        self.model = model
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = app.config.get('USER_CACHE_MAX_SIZE', self.max_size)
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+
+    def get(self, user_id):
+        """Returns the cached user attached to the current session, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[user_id]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            values = entry[1]
+
+        user = self.model(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def set(self, user):
+        """Caches the column values of a freshly loaded user."""
+        values = {column.key: getattr(user, column.key) for column in self.model.__table__.columns}
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns the cache counters and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,148 @@
+"""Concurrent write throughput benchmark for the SQLite database profile.
+
+Runs the same workload twice against a scratch SQLite file, once with the
+database profile disabled (rollback journal, default pragmas) and once
+enabled (WAL, busy_timeout, synchronous=NORMAL). Writer processes save
+grading results the way the workers do while reader processes keep
+querying, which is what produces "database is locked" in production.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_db_writes --writers 4 --readers 2 --writes 200
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+from multiprocessing import Process, Queue
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from app.extensions import db
+from app.models import Homework, User
+from config import Config
+
+
+def make_config(db_path, profile_enabled):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+        DATABASE_PROFILE_ENABLED = profile_enabled
+    return BenchConfig
+
+
+def setup_database(config_class, num_homeworks):
+    app = create_app(config_class)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password='x')
+        db.session.add(user)
+        db.session.flush()
+        homeworks = [Homework(title=f'hw{i}', subject='bench', due_date=datetime.date.today(), user_id=user.id)
+                     for i in range(num_homeworks)]
+        db.session.add_all(homeworks)
+        db.session.commit()
+        return [homework.id for homework in homeworks]
+
+
+def writer(config_class, homework_ids, num_writes, results):
+    app = create_app(config_class)
+    done = errors = 0
+    with app.app_context():
+        for n in range(num_writes):
+            homework = db.session.get(Homework, homework_ids[n % len(homework_ids)])
+            try:
+                homework.set_results({'scores': [n % 10], 'analyses': ['bench'], 'final_score': n % 10})
+                db.session.commit()
+                done += 1
+            except OperationalError:  # "database is locked"
+                db.session.rollback()
+                errors += 1
+    results.put(('write', done, errors))
+
+
+def reader(config_class, duration, results):
+    app = create_app(config_class)
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    with app.app_context():
+        while time.monotonic() < deadline:
+            try:
+                db.session.execute(db.select(Homework.id, Homework.analysis)).all()
+                db.session.rollback()
+                done += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('read', done, errors))
+
+
+def check_processes(processes):
+    """Raises RuntimeError if any benchmark process is still running or exited with a non-zero code.
+
+    Processes still running are terminated first, so a failed run leaves nothing behind.
+    """
+    stuck = [process for process in processes if process.is_alive()]
+    for process in stuck:
+        process.terminate()
+        process.join()
+    if stuck:
+        raise RuntimeError(f"{stuck[0].name} did not finish in time")
+    for process in processes:
+        if process.exitcode != 0:
+            raise RuntimeError(f"{process.name} exited with code {process.exitcode}")
+
+
+def run(profile_enabled, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        config_class = make_config(os.path.join(tmp, 'bench.db'), profile_enabled)
+        homework_ids = setup_database(config_class, args.homeworks)
+        results = Queue()
+
+        # Each writer owns its own homeworks, like one grading job per submission
+        writers = [Process(target=writer, args=(config_class, homework_ids[k::args.writers], args.writes, results),
+                           name=f'writer-{k}')
+                   for k in range(args.writers)]
+        start = time.perf_counter()
+        for process in writers:
+            process.start()
+        readers = [Process(target=reader, args=(config_class, args.read_seconds, results), name=f'reader-{k}')
+                   for k in range(args.readers)]
+        for process in readers:
+            process.start()
+        # Bounded joins: a crashed or stuck child fails the run instead of hanging it
+        deadline = time.monotonic() + args.timeout
+        for process in writers:
+            process.join(max(0.0, deadline - time.monotonic()))
+        write_elapsed = time.perf_counter() - start
+        for process in readers:
+            process.join(max(0.0, deadline - time.monotonic()))
+        check_processes(writers + readers)
+
+        totals = {'write': [0, 0], 'read': [0, 0]}
+        for _ in range(len(writers) + len(readers)):
+            kind, done, errors = results.get(timeout=10)
+            totals[kind][0] += done
+            totals[kind][1] += errors
+
+    label = 'profile on ' if profile_enabled else 'profile off'
+    print(f"{label}: {totals['write'][0] / write_elapsed:8.1f} writes/s ({totals['write'][1]} locked), "
+          f"{totals['read'][0]} reads ({totals['read'][1]} locked), {write_elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQLite write throughput with and without the database profile.")
+    parser.add_argument('--writers', type=int, default=4, help="Writer processes")
+    parser.add_argument('--readers', type=int, default=2, help="Reader processes")
+    parser.add_argument('--writes', type=int, default=200, help="Commits per writer")
+    parser.add_argument('--homeworks', type=int, default=50, help="Rows the writers spread their updates over")
+    parser.add_argument('--read-seconds', type=float, default=5.0, help="How long each reader keeps querying")
+    parser.add_argument('--timeout', type=float, default=600.0, help="Seconds to wait for all processes of a run")
+    args = parser.parse_args()
+
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""Offline benchmark for the grading and annotation pipeline.
+
+Grades synthetic N-page exams built from the sample sheets in imgs/ against
+the FakeBackend, so no network access or API key is needed. Reports
+per-stage timings, exam latency percentiles, throughput per concurrency
+level, upload bytes per model call and peak RSS during each configuration, and writes the results as JSON for
+comparing commits.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_grading --pages 4 12 --concurrency 1 4 8 --output bench_results.json
+
+Compare upload sizes and latency with and without local preprocessing:
+    python -m benchmarks.bench_grading --seconds-per-mb 0.5
+    python -m benchmarks.bench_grading --seconds-per-mb 0.5 --max-edge 1600 --grayscale
+
+Exercise the scheduler against injected 429s and a fake per-minute quota:
+    python -m benchmarks.bench_grading --rate-limit-rate 0.2 --quota-per-minute 600 --rpm 500
+
+Compare exam latency with and without hedged requests on a long-tailed backend:
+    python -m benchmarks.bench_grading --tail-rate 0.05 --tail-latency 1.0 --hedge-percentile 90
+
+Count the model calls saved by skipping blank pages (e.g. scanned back sides):
+    python -m benchmarks.bench_grading --blank-share 0.25
+    python -m benchmarks.bench_grading --blank-share 0.25 --skip-blank
+
+Check that peak memory follows concurrency rather than exam length on scan-sized pages:
+    python -m benchmarks.bench_grading --pages 10 60 --concurrency 1 8 --scan-edge 4000 --max-edge 2048 --no-annotate
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from app.gemini_call.backends import FakeBackend
+from app.gemini_call.gemini import apply_image_modifications, grade_answer_gemini
+from app.gemini_call.hedging import HedgedBackend
+from app.gemini_call.scheduler import ModelScheduler, ScheduledBackend
+from app.gemini_call.timing import StageTimings, percentile
+from PIL import Image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMGS_DIR = os.path.join(REPO_ROOT, 'imgs')
+PROBLEM_IMAGES = [os.path.join(IMGS_DIR, 'testPaper.png')]
+SAMPLE_ANSWER_IMAGES = [os.path.join(IMGS_DIR, name) for name in ('ans1.png', 'ans2.png', 'ans3.png')]
+GRADING_STANDARDS = "Question 1 (10 points): Correct method and final answer."
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in MiB, or None where it can't be measured."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """Returns the current resident set size of this process in MiB, or None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class RssSampler:
+    """Samples the resident set size in a background thread and keeps the peak seen inside the with block.
+
+    ru_maxrss only ever grows over the whole process, so it can't tell one
+    configuration from the next; sampling can. Where /proc isn't available
+    the process-wide peak is reported instead.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.baseline_mb = self.peak_mb = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        gc.collect()
+        self.baseline_mb = self.peak_mb = current_rss_mb()
+        if self.baseline_mb is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.baseline_mb is None:
+            self.peak_mb = peak_rss_mb()
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    @property
+    def growth_mb(self):
+        return self.peak_mb - self.baseline_mb if self.baseline_mb is not None else None
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def synthetic_exam(num_pages, sample_images=SAMPLE_ANSWER_IMAGES, blank_image=None, blank_share=0.0):
+    """Returns answer page paths for an exam with num_pages pages, cycling through the sample sheets.
+
+    With blank_image and blank_share, about that share of the pages (e.g.
+    scanned back sides) is blank_image instead, spread evenly.
+    """
+    pages = [sample_images[i % len(sample_images)] for i in range(num_pages)]
+    if blank_image and blank_share:
+        step = max(1, round(1 / blank_share))
+        pages = [blank_image if i % step == step - 1 else page for i, page in enumerate(pages)]
+    return pages
+
+
+def blank_scan(folder, size=(1240, 1754)):
+    """Writes an off-white page with faint scanner noise into folder and returns its path."""
+    rng = random.Random(0)
+    page = Image.new('L', size, 245)
+    page.putdata([245 + rng.randint(-4, 4) for _ in range(size[0] * size[1])])
+    path = os.path.join(folder, 'blank_page.png')
+    page.save(path)
+    return path
+
+
+def scanned_samples(scan_edge, folder):
+    """Writes the sample sheets upscaled to a scan-like longest edge into folder and returns their paths."""
+    paths = []
+    for path in SAMPLE_ANSWER_IMAGES:
+        with Image.open(path) as img:
+            scale = scan_edge / max(img.size)
+            scan = img.convert('RGB').resize((round(img.width * scale), round(img.height * scale)))
+        scan_path = os.path.join(folder, f"scan_{os.path.basename(path)}")
+        scan.save(scan_path)
+        paths.append(scan_path)
+    return paths
+
+
+def run_config(num_pages, concurrency, args, output_folder, hedge=False, sample_images=SAMPLE_ANSWER_IMAGES,
+               blank_image=None):
+    """Grades and annotates args.exams synthetic exams and returns the measurements for one configuration."""
+    backend = FakeBackend(latency=args.latency, jitter=args.jitter, questions_per_page=args.questions, seed=args.seed,
+                          seconds_per_mb=args.seconds_per_mb, malformed_rate=args.malformed_rate, rate_limit_rate=args.rate_limit_rate,
+                          quota_per_minute=args.quota_per_minute, tail_rate=args.tail_rate,
+                          tail_latency=args.tail_latency)
+    scheduler = ModelScheduler(requests_per_minute=args.rpm, max_in_flight=args.max_in_flight or concurrency,
+                               base_delay=args.retry_base_delay, seed=args.seed)
+    scheduled = ScheduledBackend(backend, scheduler)
+    if hedge:
+        scheduled = HedgedBackend(scheduled, args.hedge_percentile, args.hedge_max_extra)
+    preprocess = None
+    if args.max_edge or args.grayscale:
+        preprocess = {'max_edge': args.max_edge, 'grayscale': args.grayscale}
+    timings = StageTimings()
+    exam_latencies = []
+    failed_exams = 0
+    blank_page = {} if args.skip_blank else None
+    answer_images = synthetic_exam(num_pages, sample_images, blank_image, args.blank_share)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with quiet, RssSampler() as rss:
+        for _ in range(args.exams):
+            exam_start = time.perf_counter()
+            results = grade_answer_gemini(PROBLEM_IMAGES, answer_images, GRADING_STANDARDS, 5,
+                                          max_workers=concurrency, backend=scheduled, timings=timings,
+                                          preprocess=preprocess, blank_page=blank_page)
+            if results and not args.no_annotate:
+                for img_path, modifications in zip(answer_images, results['image_modifications']):
+                    apply_image_modifications(img_path, modifications, output_folder, timings=timings)
+            if results is None:
+                failed_exams += 1
+            exam_latencies.append(time.perf_counter() - exam_start)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "pages": num_pages,
+        "concurrency": concurrency,
+        "hedging": scheduled.stats() if hedge else None,
+        "exams": args.exams,
+        "model_calls": backend.calls,
+        "blank_pages_skipped": timings.counters.get('blank_page_skipped', 0),
+        "preprocess": preprocess,
+        "bytes_per_call": backend.bytes_sent / backend.calls if backend.calls else None,
+        "exam_latency": {
+            "p50": percentile(exam_latencies, 50),
+            "p95": percentile(exam_latencies, 95),
+            "p99": percentile(exam_latencies, 99),
+        },
+        "pages_per_second": num_pages * args.exams / elapsed if elapsed else None,
+        "failed_exams": failed_exams,
+        "scheduler": scheduler.stats(),
+        "stages": timings.summary(),
+        "events": dict(timings.counters),
+        "peak_rss_mb": rss.peak_mb,
+        "rss_growth_mb": rss.growth_mb,
+    }
+
+
+def print_result(result):
+    latency = result["exam_latency"]
+    hedging = result["hedging"]
+    print(f"pages={result['pages']:<4} concurrency={result['concurrency']:<3} hedged={'yes' if hedging else 'no ':<3} "
+          f"p50={latency['p50'] * 1000:8.1f}ms p95={latency['p95'] * 1000:8.1f}ms p99={latency['p99'] * 1000:8.1f}ms "
+          f"throughput={result['pages_per_second']:8.1f} pages/s peak_rss={result['peak_rss_mb'] or 0:.1f}MiB "
+          f"(+{result['rss_growth_mb'] or 0:.1f}MiB) "
+          f"upload={(result['bytes_per_call'] or 0) / 1024:.0f}KiB/call failed_exams={result['failed_exams']} "
+          f"model_calls={result['model_calls']} calls_saved={result['blank_pages_skipped']}")
+    scheduler = result["scheduler"]
+    print(f"    scheduler        retries={scheduler['retries']} throttled={scheduler['throttled']} "
+          f"failures={scheduler['failures']} wait_p95={(scheduler['wait']['p95'] or 0) * 1000:.1f}ms circuit={scheduler['circuit']}")
+    events = result["events"]
+    if events:
+        responses = events.get("model_response", 0)
+        print(f"    events           " + " ".join(f"{name}={value}" for name, value in sorted(events.items())) +
+              f" parse_failure_rate={events.get('parse_failure', 0) / responses if responses else 0:.1%}")
+    if hedging:
+        print(f"    hedging          hedged={hedging['hedged']} wins={hedging['hedge_wins']} "
+              f"extra_spend={hedging['extra_spend']:.1%} delay={(hedging['hedge_delay'] or 0) * 1000:.1f}ms")
+    for name, summary in sorted(result["stages"].items()):
+        print(f"    {name:<16} n={summary['count']:<6} total={summary['total'] * 1000:9.1f}ms "
+              f"p50={summary['p50'] * 1000:7.2f}ms p95={summary['p95'] * 1000:7.2f}ms p99={summary['p99'] * 1000:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the grading pipeline offline against the fake backend.")
+    parser.add_argument('--pages', type=int, nargs='+', default=[4, 12], help="Exam sizes (answer pages) to benchmark")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8], help="max_workers values to benchmark")
+    parser.add_argument('--exams', type=int, default=10, help="Exams graded per configuration")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake model latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Fake model latency jitter in seconds")
+    parser.add_argument('--questions', type=int, default=2, help="Questions returned per page by the fake model")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--seconds-per-mb', type=float, default=0.0, help="Fake upload latency per MB of image payload")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Share of fake responses that are not valid JSON")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of fake calls that fail with a 429")
+    parser.add_argument('--quota-per-minute', type=int, default=None, help="Fake provider quota; calls beyond it get a 429")
+    parser.add_argument('--rpm', type=int, default=None, help="Scheduler requests/minute limit")
+    parser.add_argument('--max-in-flight', type=int, default=None, help="Scheduler in-flight limit (default: --concurrency)")
+    parser.add_argument('--retry-base-delay', type=float, default=0.05, help="Scheduler backoff base delay in seconds")
+    parser.add_argument('--tail-rate', type=float, default=0.0, help="Share of fake calls that are stragglers")
+    parser.add_argument('--tail-latency', type=float, default=1.0, help="Extra seconds a straggler call takes")
+    parser.add_argument('--hedge-percentile', type=float, default=None,
+                        help="Also run every configuration with hedging at this latency percentile")
+    parser.add_argument('--hedge-max-extra', type=float, default=0.1, help="Hedged requests allowed per call")
+    parser.add_argument('--max-edge', type=int, default=None, help="Preprocess pages down to this longest edge in pixels")
+    parser.add_argument('--grayscale', action='store_true', help="Preprocess pages to grayscale")
+    parser.add_argument('--scan-edge', type=int, default=None,
+                        help="Upscale the sample sheets to this longest edge, like full-resolution scans")
+    parser.add_argument('--blank-share', type=float, default=0.0, help="Share of synthetic pages that are blank scans")
+    parser.add_argument('--skip-blank', action='store_true', help="Detect blank pages locally and skip their model calls")
+    parser.add_argument('--no-annotate', action='store_true', help="Skip the apply_image_modifications stage")
+    parser.add_argument('--output', default='bench_results.json', help="Path of the JSON results file")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own print output")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_folder:
+        sample_images = scanned_samples(args.scan_edge, output_folder) if args.scan_edge else SAMPLE_ANSWER_IMAGES
+        blank_image = blank_scan(output_folder) if args.blank_share else None
+        for num_pages in args.pages:
+            for concurrency in args.concurrency:
+                for hedge in ([False, True] if args.hedge_percentile else [False]):
+                    result = run_config(num_pages, concurrency, args, output_folder, hedge, sample_images, blank_image)
+                    print_result(result)
+                    results.append(result)
+
+    report = {
+        "commit": current_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Offline benchmark for multi-page TIFF and PDF ingestion.
+
+Builds an N-page scan from the sample sheets in imgs/ as one multi-frame
+TIFF and one PDF, then for each format streams every page through
+PageSource, preprocess_image and apply_image_modifications, and grades the
+whole file against the FakeBackend. Reports pages/sec and peak RSS for each
+pass, and writes the results as JSON for comparing commits. The PDF rows are
+skipped when pypdfium2 isn't installed.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pages --pages 100 --scan-edge 3300 --dpi 200 --output bench_pages.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from app.gemini_call.backends import FakeBackend
+from app.gemini_call.gemini import apply_image_modifications, grade_answer_gemini
+from app.gemini_call.pages import PageSource
+from app.gemini_call.preprocess import preprocess_image
+from benchmarks.bench_grading import (GRADING_STANDARDS, PROBLEM_IMAGES, SAMPLE_ANSWER_IMAGES, RssSampler,
+                                      current_commit)
+
+# A box around the top left quarter, like a typical model annotation
+SAMPLE_MODIFICATIONS = [{"shape": "rectangle", "coordinates": [0.05, 0.05, 0.5, 0.5], "text": "Q1", "font_size": 24}]
+
+
+def write_scans(num_pages, scan_edge, folder):
+    """Writes a num_pages multi-frame TIFF and PDF of the sample sheets, scaled to scan_edge, and returns their paths."""
+    sheets = []
+    for path in SAMPLE_ANSWER_IMAGES:
+        with Image.open(path) as img:
+            scale = scan_edge / max(img.size)
+            sheets.append(img.convert('RGB').resize((round(img.width * scale), round(img.height * scale))))
+    frames = [sheets[i % len(sheets)] for i in range(num_pages)]
+    tiff_path = os.path.join(folder, 'scan.tiff')
+    frames[0].save(tiff_path, save_all=True, append_images=frames[1:], compression='tiff_deflate')
+    pdf_path = os.path.join(folder, 'scan.pdf')
+    frames[0].save(pdf_path, save_all=True, append_images=frames[1:], resolution=200.0)
+    return tiff_path, pdf_path
+
+
+def stream_pages(path, args, output_folder):
+    """Opens, preprocesses and annotates every page of path one at a time."""
+    pages = PageSource([path], dpi=args.dpi)
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        for i in range(len(pages)):
+            with pages.open(i) as img:
+                preprocess_image(img, max_edge=args.max_edge)
+                apply_image_modifications(img, SAMPLE_MODIFICATIONS, output_folder, output_name=f"page_{i}.png")
+        elapsed = time.perf_counter() - start
+    return {"pages": len(pages), "elapsed": elapsed, "pages_per_second": len(pages) / elapsed,
+            "peak_rss_mb": rss.peak_mb, "rss_growth_mb": rss.growth_mb}
+
+
+def grade_file(path, args):
+    """Grades every page of path in one grade_answer_gemini call against the FakeBackend."""
+    pages = PageSource([path], dpi=args.dpi)
+    backend = FakeBackend(latency=args.latency, seed=args.seed)
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        results = grade_answer_gemini(PROBLEM_IMAGES, pages, GRADING_STANDARDS, 5, max_workers=args.concurrency,
+                                      backend=backend, preprocess={'max_edge': args.max_edge})
+        elapsed = time.perf_counter() - start
+    return {"pages": len(pages), "graded_pages": len(results["image_modifications"]) if results else 0,
+            "model_calls": backend.calls, "elapsed": elapsed, "pages_per_second": len(pages) / elapsed,
+            "peak_rss_mb": rss.peak_mb, "rss_growth_mb": rss.growth_mb}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-page TIFF/PDF ingestion offline.")
+    parser.add_argument('--pages', type=int, default=100, help="Pages in the synthetic scan")
+    parser.add_argument('--scan-edge', type=int, default=3300, help="Longest edge of each TIFF page in pixels")
+    parser.add_argument('--dpi', type=int, default=200, help="Resolution PDF pages are rasterized at")
+    parser.add_argument('--max-edge', type=int, default=2048, help="Longest edge pages are preprocessed to")
+    parser.add_argument('--concurrency', type=int, default=4, help="max_workers for the grading pass")
+    parser.add_argument('--latency', type=float, default=0.01, help="Fake model latency in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_pages.json', help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    try:
+        import pypdfium2  # noqa: F401
+        formats = ('tiff', 'pdf')
+    except ImportError:
+        print("pypdfium2 is not installed; skipping the PDF rows")
+        formats = ('tiff',)
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        paths = dict(zip(('tiff', 'pdf'), write_scans(args.pages, args.scan_edge, folder)))
+        for file_format in formats:
+            path = paths[file_format]
+            with contextlib.redirect_stdout(io.StringIO()):
+                streamed = stream_pages(path, args, os.path.join(folder, 'annotated'))
+                graded = grade_file(path, args)
+            for name, result in (('stream', streamed), ('grade', graded)):
+                result.update({"format": file_format, "pass": name, "file_mb": os.path.getsize(path) / (1024 * 1024)})
+                print(f"{file_format:<5} {name:<7} pages={result['pages']:<4} "
+                      f"throughput={result['pages_per_second']:7.1f} pages/s "
+                      f"peak_rss={result['peak_rss_mb'] or 0:.1f}MiB (+{result['rss_growth_mb'] or 0:.1f}MiB) "
+                      f"file={result['file_mb']:.1f}MiB")
+                results.append(result)
+
+    report = {
+        "commit": current_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,68 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Database profile: SQLite pragmas, or pool settings for Postgres
+    DATABASE_PROFILE_ENABLED = os.environ.get('DATABASE_PROFILE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # Safe with WAL, much cheaper than FULL
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+
+    # Session user cache used by load_user
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))  # seconds
+    USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', 1024))
     
+    # Uploads
+    IMAGE_STORE_DIR = os.environ.get('IMAGE_STORE_DIR', 'image_store')  # Content-addressed page images
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 200 * 1024 * 1024))  # bytes per request
+
+    # Grading
+    GRADING_BACKEND = os.environ.get('GRADING_BACKEND', 'gemini')  # 'gemini' or 'fake' for offline load testing
+    GRADING_MAX_WORKERS = int(os.environ.get('GRADING_MAX_WORKERS', 4))  # Answer pages graded concurrently per job
+    # A running job whose worker hasn't heartbeated for this long is requeued, up to GRADING_JOB_MAX_ATTEMPTS claims
+    GRADING_JOB_LEASE = int(os.environ.get('GRADING_JOB_LEASE', 600))  # seconds
+    GRADING_JOB_MAX_ATTEMPTS = int(os.environ.get('GRADING_JOB_MAX_ATTEMPTS', 3))
+    JOB_STREAM_POLL_INTERVAL = float(os.environ.get('JOB_STREAM_POLL_INTERVAL', 0.5))  # seconds
+    # Every model call in a process shares these limits; set a limit to 0 to disable it
+    GRADING_REQUESTS_PER_MINUTE = int(os.environ.get('GRADING_REQUESTS_PER_MINUTE', 60))
+    GRADING_TOKENS_PER_MINUTE = int(os.environ.get('GRADING_TOKENS_PER_MINUTE', 1000000))
+    GRADING_MAX_IN_FLIGHT = int(os.environ.get('GRADING_MAX_IN_FLIGHT', 8))
+    GRADING_MAX_RETRIES = int(os.environ.get('GRADING_MAX_RETRIES', 5))
+    GRADING_RETRY_BASE_DELAY = float(os.environ.get('GRADING_RETRY_BASE_DELAY', 1.0))  # seconds, doubled per retry
+    GRADING_RETRY_MAX_DELAY = float(os.environ.get('GRADING_RETRY_MAX_DELAY', 60.0))  # seconds
+    GRADING_CIRCUIT_FAILURES = int(os.environ.get('GRADING_CIRCUIT_FAILURES', 5))  # consecutive failures that open it
+    GRADING_CIRCUIT_RESET = float(os.environ.get('GRADING_CIRCUIT_RESET', 30.0))  # seconds before a probe call
+    # Send a duplicate of any call slower than this percentile of recent calls; 0 disables hedging
+    GRADING_HEDGE_PERCENTILE = float(os.environ.get('GRADING_HEDGE_PERCENTILE', 0))
+    GRADING_HEDGE_MAX_EXTRA = float(os.environ.get('GRADING_HEDGE_MAX_EXTRA', 0.1))  # extra requests per call, at most
+    # Pages are oriented, resized and re-encoded before upload; set GRADING_MAX_EDGE=0 to send originals
+    GRADING_MAX_EDGE = int(os.environ.get('GRADING_MAX_EDGE', 2048))  # pixels, longest edge
+    GRADING_GRAYSCALE = os.environ.get('GRADING_GRAYSCALE', 'false').lower() in ['true', 'on', '1']
+    GRADING_IMAGE_FORMAT = os.environ.get('GRADING_IMAGE_FORMAT', 'JPEG')  # 'JPEG', 'WEBP' or 'PNG'
+    # Pages that look blank locally are recorded as "no answers" without a model call
+    GRADING_SKIP_BLANK_PAGES = os.environ.get('GRADING_SKIP_BLANK_PAGES', 'false').lower() in ['true', 'on', '1']
+    GRADING_BLANK_INK_DELTA = int(os.environ.get('GRADING_BLANK_INK_DELTA', 40))  # grey levels away from the paper
+    GRADING_BLANK_MAX_INK_RATIO = float(os.environ.get('GRADING_BLANK_MAX_INK_RATIO', 0.0002))  # share of ink pixels
+    GRADING_BLANK_MAX_STD = float(os.environ.get('GRADING_BLANK_MAX_STD', 8.0))  # grey levels
+    GRADING_BLANK_USE_TEMPLATE = os.environ.get('GRADING_BLANK_USE_TEMPLATE', 'true').lower() in ['true', 'on', '1']
+    GRADING_CACHE_DIR = os.environ.get('GRADING_CACHE_DIR', 'grading_cache')
+    GRADING_CACHE_MAX_ENTRIES = int(os.environ.get('GRADING_CACHE_MAX_ENTRIES', 10000))
+    GRADING_CACHE_MAX_AGE = int(os.environ.get('GRADING_CACHE_MAX_AGE', 30 * 24 * 3600))  # seconds
+    # 'overlay' stores marks as per-page JSON and rasterizes on demand; 'raster' also writes corrected PNGs
+    ANNOTATION_MODE = os.environ.get('ANNOTATION_MODE', 'overlay')
+    OVERLAY_DIR = os.environ.get('OVERLAY_DIR', 'overlays')
+    CORRECTED_IMAGES_DIR = os.environ.get('CORRECTED_IMAGES_DIR', 'corrected_images')
+
+    # Metrics
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ['true', 'on', '1']
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # When set, /metrics requires "Authorization: Bearer <token>"
+    METRICS_DIR = os.environ.get('METRICS_DIR', 'metrics')  # Worker processes dump their metrics here for /metrics
+
     # Email (optional for future password reset)
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.googlemail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
@@ -0,0 +1,61 @@
+import argparse
+
+from app.gemini_call.batch import Checkpoint, load_manifest, run_manifest
+from config import Config
+
+def run_batch():
+    parser = argparse.ArgumentParser(description="Grade the submissions of a manifest across worker processes, "
+                                                 "checkpointing every page so an interrupted run can resume.")
+    parser.add_argument('manifest', help="JSON manifest with problems, standards, difficulty and a submissions list")
+    parser.add_argument('--checkpoint', help="JSONL checkpoint to append to and resume from (default: <manifest>.checkpoint.jsonl)")
+    parser.add_argument('--processes', type=int, default=2, help="Worker processes, each grading one submission at a time")
+    parser.add_argument('--workers', type=int, default=Config.GRADING_MAX_WORKERS, help="Pages graded concurrently per process")
+    parser.add_argument('--backend', default=Config.GRADING_BACKEND, help="'gemini' or 'fake'")
+    parser.add_argument('--max-edge', type=int, default=Config.GRADING_MAX_EDGE, help="Longest edge sent to the model, 0 for originals")
+    parser.add_argument('--grayscale', action='store_true', default=Config.GRADING_GRAYSCALE)
+    parser.add_argument('--no-cache', action='store_true', help="Don't reuse or store cached page results")
+    parser.add_argument('--skip-blank', action='store_true', default=Config.GRADING_SKIP_BLANK_PAGES,
+                        help="Record pages that look blank locally as empty instead of calling the model")
+    args = parser.parse_args()
+
+    submissions = load_manifest(args.manifest)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.manifest}.checkpoint.jsonl")
+    preprocess = None
+    if args.max_edge or args.grayscale:
+        preprocess = {'max_edge': args.max_edge or None, 'grayscale': args.grayscale,
+                      'image_format': Config.GRADING_IMAGE_FORMAT}
+    cache_options = None if args.no_cache else {'cache_dir': Config.GRADING_CACHE_DIR,
+                                                'max_entries': Config.GRADING_CACHE_MAX_ENTRIES,
+                                                'max_age': Config.GRADING_CACHE_MAX_AGE}
+    # Every process has its own scheduler, so each gets an equal share of the rate limits
+    scheduler_options = {
+        'requests_per_minute': Config.GRADING_REQUESTS_PER_MINUTE / args.processes or None,
+        'tokens_per_minute': Config.GRADING_TOKENS_PER_MINUTE / args.processes or None,
+        'max_in_flight': max(1, Config.GRADING_MAX_IN_FLIGHT // args.processes),
+        'max_retries': Config.GRADING_MAX_RETRIES,
+        'base_delay': Config.GRADING_RETRY_BASE_DELAY,
+        'max_delay': Config.GRADING_RETRY_MAX_DELAY,
+    }
+    blank_page = None
+    if args.skip_blank:
+        blank_page = {'ink_delta': Config.GRADING_BLANK_INK_DELTA, 'max_ink_ratio': Config.GRADING_BLANK_MAX_INK_RATIO,
+                      'max_std': Config.GRADING_BLANK_MAX_STD, 'use_template': Config.GRADING_BLANK_USE_TEMPLATE}
+    breaker_options = {'failure_threshold': Config.GRADING_CIRCUIT_FAILURES, 'reset_timeout': Config.GRADING_CIRCUIT_RESET}
+
+    try:
+        results = run_manifest(submissions, checkpoint, processes=args.processes, max_workers=args.workers,
+                               backend_name=args.backend, scheduler_options=scheduler_options,
+                               breaker_options=breaker_options, cache_options=cache_options, preprocess=preprocess,
+                               blank_page=blank_page)
+    except KeyboardInterrupt:
+        return
+    finally:
+        checkpoint.close()
+
+    done = sum(1 for record in results.values() if record['status'] == 'done')
+    blank_pages = sum(len(record.get('blank_pages', [])) for record in results.values())
+    print(f"{done}/{len(submissions)} submissions graded, {blank_pages} blank pages skipped without a model call, "
+          f"checkpoint at {checkpoint.path}")
+
+if __name__ == '__main__':
+    run_batch()
@@ -0,0 +1,74 @@
+import argparse
+
+from app.gemini_call.backends import get_backend
+from app.gemini_call.batch import count_pages, find_submissions, grade_class, write_class_results
+from app.gemini_call.cache import ResponseCache
+from app.gemini_call.hedging import HedgedBackend
+from app.gemini_call.scheduler import ScheduledBackend, scheduler_from_config
+from config import Config
+
+def run_batch():
+    parser = argparse.ArgumentParser(description="Grade a whole class against one problem set and rubric.")
+    parser.add_argument('submissions', help="Folder with one subfolder of answer pages, or one multi-page TIFF/PDF, per student")
+    parser.add_argument('--problems', nargs='+', required=True, help="Problem image paths")
+    parser.add_argument('--standards', required=True, help="Grading standards text, or @path to read them from a file")
+    parser.add_argument('--difficulty', type=int, default=5, help="Scoring difficulty from 1 to 10")
+    parser.add_argument('--output-dir', default='class_results', help="Where per-student JSON and class_summary.json go")
+    parser.add_argument('--workers', type=int, default=Config.GRADING_MAX_WORKERS, help="Pages graded concurrently")
+    parser.add_argument('--backend', default=Config.GRADING_BACKEND, help="'gemini' or 'fake'")
+    parser.add_argument('--max-edge', type=int, default=Config.GRADING_MAX_EDGE, help="Longest edge sent to the model, 0 for originals")
+    parser.add_argument('--grayscale', action='store_true', default=Config.GRADING_GRAYSCALE)
+    parser.add_argument('--no-cache', action='store_true', help="Don't reuse or store cached page results")
+    parser.add_argument('--skip-blank', action='store_true', default=Config.GRADING_SKIP_BLANK_PAGES,
+                        help="Record pages that look blank locally as empty instead of calling the model")
+    args = parser.parse_args()
+
+    grading_standards = args.standards
+    if grading_standards.startswith('@'):
+        with open(grading_standards[1:], encoding='utf-8') as f:
+            grading_standards = f.read()
+    preprocess = None
+    if args.max_edge or args.grayscale:
+        preprocess = {'max_edge': args.max_edge or None, 'grayscale': args.grayscale,
+                      'image_format': Config.GRADING_IMAGE_FORMAT}
+    blank_page = None
+    if args.skip_blank:
+        blank_page = {'ink_delta': Config.GRADING_BLANK_INK_DELTA, 'max_ink_ratio': Config.GRADING_BLANK_MAX_INK_RATIO,
+                      'max_std': Config.GRADING_BLANK_MAX_STD, 'use_template': Config.GRADING_BLANK_USE_TEMPLATE}
+    cache = None if args.no_cache else ResponseCache(Config.GRADING_CACHE_DIR, max_entries=Config.GRADING_CACHE_MAX_ENTRIES,
+                                                     max_age=Config.GRADING_CACHE_MAX_AGE)
+
+    backend = ScheduledBackend(get_backend(args.backend), scheduler_from_config(Config))
+    if Config.GRADING_HEDGE_PERCENTILE:
+        backend = HedgedBackend(backend, Config.GRADING_HEDGE_PERCENTILE, Config.GRADING_HEDGE_MAX_EXTRA)
+
+    submissions = find_submissions(args.submissions)
+    total_pages = 0
+    for student, files in submissions.items():
+        pages, error = count_pages(files)
+        total_pages += pages
+        if error is not None:
+            print(f"{student}: {error}; will be reported as failed")
+    print(f"Grading {len(submissions)} students ({total_pages} pages) with {args.workers} workers...")
+    done = []
+
+    def report(student, results):
+        done.append(student)
+        status = f"score {results['final_score']}" if results is not None else "FAILED"
+        print(f"[{len(done)}/{len(submissions)}] {student}: {status}")
+
+    class_results = grade_class(args.problems, submissions, grading_standards, args.difficulty,
+                                max_workers=args.workers, backend=backend, cache=cache,
+                                preprocess=preprocess, on_student_result=report, blank_page=blank_page)
+    write_class_results(class_results, args.output_dir)
+
+    summary = class_results['summary']
+    print(f"{summary['pages_per_minute'] or 0:.1f} pages/min "
+          f"({summary['pages']} pages, {summary['graded']}/{summary['students']} students, {summary['elapsed_seconds']:.1f}s)")
+    print(f"Mean score {summary['final_score']['mean']}, results written to {args.output_dir}")
+    if blank_page is not None:
+        print(f"{summary['blank_pages_skipped']} of {summary['pages']} pages were blank and skipped without a model call")
+    print(f"Scheduler: {backend.scheduler.stats()}")
+
+if __name__ == '__main__':
+    run_batch()
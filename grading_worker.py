@@ -0,0 +1,20 @@
+import argparse
+
+from app.jobs import start_workers
+
+def run_workers():
+    parser = argparse.ArgumentParser(description="Run background grading workers.")
+    parser.add_argument('--workers', type=int, default=2, help="Number of worker processes")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+    args = parser.parse_args()
+
+    processes = start_workers(args.workers, args.poll_interval)
+    print(f"Started {len(processes)} grading workers. Press Ctrl+C to stop.")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("Stopping grading workers...")
+
+if __name__ == '__main__':
+    run_workers()
@@ -0,0 +1,132 @@
+"""Normalize homework pages and question results
+
+Revision ID: e4b8f0c2d915
+Revises: c71d9a4e0b36
+Create Date: 2026-10-17 12:40:18.204551
+
+"""
+import json
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b8f0c2d915'
+down_revision = 'c71d9a4e0b36'
+branch_labels = None
+depends_on = None
+
+
+homework_table = sa.table('homework',
+    sa.column('id', sa.UUID()),
+    sa.column('image_paths', sa.Text()),
+    sa.column('analysis', sa.Text()),
+)
+homework_page_table = sa.table('homework_page',
+    sa.column('id', sa.UUID()),
+    sa.column('homework_id', sa.UUID()),
+    sa.column('page_index', sa.Integer()),
+    sa.column('image_path', sa.String()),
+)
+question_result_table = sa.table('question_result',
+    sa.column('id', sa.UUID()),
+    sa.column('homework_id', sa.UUID()),
+    sa.column('position', sa.Integer()),
+    sa.column('page_index', sa.Integer()),
+    sa.column('question_number', sa.Integer()),
+    sa.column('score', sa.Float()),
+    sa.column('analysis', sa.Text()),
+)
+
+
+def upgrade():
+    op.create_table('homework_page',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('homework_id', sa.UUID(), nullable=False),
+    sa.Column('page_index', sa.Integer(), nullable=False),
+    sa.Column('image_path', sa.String(length=500), nullable=False),
+    sa.ForeignKeyConstraint(['homework_id'], ['homework.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('homework_id', 'page_index', name='uq_homework_page_index')
+    )
+    with op.batch_alter_table('homework_page', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_homework_page_homework_id'), ['homework_id'], unique=False)
+
+    op.create_table('question_result',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('homework_id', sa.UUID(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('page_index', sa.Integer(), nullable=True),
+    sa.Column('question_number', sa.Integer(), nullable=True),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('analysis', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['homework_id'], ['homework.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('question_result', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_question_result_homework_id'), ['homework_id'], unique=False)
+        batch_op.create_index('ix_question_result_question_number_score', ['question_number', 'score'], unique=False)
+
+    # Backfill the new tables from the JSON columns
+    bind = op.get_bind()
+    pages = []
+    results = []
+    for homework_id, image_paths, analysis in bind.execute(
+            sa.select(homework_table.c.id, homework_table.c.image_paths, homework_table.c.analysis)):
+        for page_index, image_path in enumerate(json.loads(image_paths or '[]')):
+            pages.append({'id': uuid.uuid4(), 'homework_id': homework_id, 'page_index': page_index, 'image_path': image_path})
+
+        try:
+            graded = json.loads(analysis or '[]')
+        except ValueError:
+            continue
+        if not isinstance(graded, dict):
+            continue
+        scores = graded.get('scores') or []
+        analyses = graded.get('analyses') or []
+        question_numbers = graded.get('question_numbers') or [None] * len(scores)
+        page_indexes = graded.get('page_indexes') or [None] * len(scores)
+        for position, (score, text, question_number, page_index) in enumerate(zip(scores, analyses, question_numbers, page_indexes)):
+            results.append({
+                'id': uuid.uuid4(),
+                'homework_id': homework_id,
+                'position': position,
+                'page_index': page_index,
+                'question_number': question_number,
+                'score': score,
+                'analysis': text if isinstance(text, str) else json.dumps(text),
+            })
+    if pages:
+        op.bulk_insert(homework_page_table, pages)
+    if results:
+        op.bulk_insert(question_result_table, results)
+
+    with op.batch_alter_table('homework', schema=None) as batch_op:
+        batch_op.drop_column('image_paths')
+
+
+def downgrade():
+    with op.batch_alter_table('homework', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_paths', sa.Text(), nullable=False, server_default='[]'))
+
+    # Fold the page rows back into the JSON column
+    bind = op.get_bind()
+    image_paths = {}
+    for homework_id, page_index, image_path in bind.execute(
+            sa.select(homework_page_table.c.homework_id, homework_page_table.c.page_index, homework_page_table.c.image_path)
+            .order_by(homework_page_table.c.homework_id, homework_page_table.c.page_index)):
+        image_paths.setdefault(homework_id, []).append(image_path)
+    for homework_id, paths in image_paths.items():
+        bind.execute(homework_table.update().where(homework_table.c.id == homework_id).values(image_paths=json.dumps(paths)))
+
+    with op.batch_alter_table('question_result', schema=None) as batch_op:
+        batch_op.drop_index('ix_question_result_question_number_score')
+        batch_op.drop_index(batch_op.f('ix_question_result_homework_id'))
+
+    op.drop_table('question_result')
+    with op.batch_alter_table('homework_page', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_homework_page_homework_id'))
+
+    op.drop_table('homework_page')
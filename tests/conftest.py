@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+from PIL import Image, ImageDraw
+
+from app import create_app
+from app.extensions import db
+from app.models import Homework, User
+from config import Config
+
+
+def make_page(path, size=(400, 300), marks=(), color='white'):
+    """Saves a page image with a black line per (x1, y1, x2, y2) mark and returns its path."""
+    img = Image.new('RGB', size, color)
+    draw = ImageDraw.Draw(img)
+    for mark in marks:
+        draw.line(mark, fill='black', width=3)
+    img.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def pages(tmp_path):
+    """Factory for page images in a temporary folder: pages('a.png', marks=[...])."""
+    def factory(name, **kwargs):
+        return make_page(tmp_path / name, **kwargs)
+    return factory
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        IMAGE_STORE_DIR = str(tmp_path / 'image_store')
+        GRADING_CACHE_DIR = str(tmp_path / 'grading_cache')
+        OVERLAY_DIR = str(tmp_path / 'overlays')
+        CORRECTED_IMAGES_DIR = str(tmp_path / 'corrected_images')
+        METRICS_DIR = str(tmp_path / 'metrics')
+        METRICS_ENABLED = False
+        GRADING_BACKEND = 'fake'
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='teacher', email='teacher@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def homework(user):
+    homework = Homework(title='Homework 1', subject='Physics', due_date=datetime.date(2026, 1, 1), user_id=user.id)
+    db.session.add(homework)
+    db.session.commit()
+    return homework
+
+
+@pytest.fixture
+def client(app, user):
+    """Test client logged in as user."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,41 @@
+from PIL import Image
+
+from app.gemini_call.annotate import draw_modifications, load_font, render_pages, to_absolute
+
+RED = (255, 0, 0)
+
+
+def test_to_absolute_scales_ratios_and_keeps_pixels():
+    assert to_absolute([0.5, 0.5, 1, 0.25], 200, 100) == [100, 50, 200, 25]
+    assert to_absolute([150, 0.5], 200, 100) == [150, 50]
+
+
+def test_load_font_is_cached_per_size():
+    assert load_font(16) is load_font(16)
+
+
+def test_draw_modifications_draws_red_rectangle():
+    img = Image.new('L', (100, 100), 255)
+
+    drawn = draw_modifications(img, [{"shape": "rectangle", "coordinates": [0.8, 0.8, 0.2, 0.2], "line_width": 1}])
+
+    assert drawn.mode == 'RGB'
+    assert drawn.getpixel((20, 50)) == RED
+    assert drawn.getpixel((50, 50)) == (255, 255, 255)
+
+
+def test_draw_modifications_skips_malformed_entries():
+    img = Image.new('RGB', (100, 100), 'white')
+
+    drawn = draw_modifications(img, [{"shape": "circle", "coordinates": [0.5]}, {"shape": "line"},
+                                     {"shape": "line", "coordinates": [0, 0.5, 1, 0.5]}])
+
+    assert drawn.getpixel((50, 50)) == RED
+
+
+def test_render_pages_keeps_input_order(pages, tmp_path):
+    inputs = [(pages(f'p{i}.png'), [{"shape": "line", "coordinates": [0, 0, 1, 1]}]) for i in range(3)]
+
+    outputs = render_pages(inputs, str(tmp_path / 'out'), max_workers=2)
+
+    assert outputs == [str(tmp_path / 'out' / f'p{i}_modified.png') for i in range(3)]
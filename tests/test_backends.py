@@ -0,0 +1,91 @@
+import pytest
+
+from app.gemini_call.backends import BackendError, BlockedResponseError, FakeBackend, GeminiBackend, get_backend
+from app.gemini_call.gemini import grade_answer_gemini
+from app.gemini_call.scheduler import CircuitBreaker, ModelScheduler, ScheduledBackend
+
+
+class BlockedResponse:
+    prompt_feedback = "block_reason: SAFETY"
+
+    def resolve(self):
+        pass
+
+    @property
+    def text(self):
+        raise ValueError("The response.text quick accessor requires a valid Part, but none were returned.")
+
+
+class BlockedModel:
+    def generate_content(self, contents, generation_config=None):
+        return BlockedResponse()
+
+
+class FailingPageBackend(FakeBackend):
+    """Fails every call for one answer page with the given error, and answers the rest normally."""
+
+    def __init__(self, page, error, **kwargs):
+        super().__init__(**kwargs)
+        self.page = page
+        self.error = error
+
+    def generate(self, contents, response_schema=None):
+        if not isinstance(contents, str) and any(f"Student Answer Sheet Page {self.page}:" in part
+                                                 for part in contents if isinstance(part, str)):
+            raise self.error
+        return super().generate(contents, response_schema)
+
+
+def test_gemini_backend_raises_blocked_error_for_response_without_text():
+    backend = GeminiBackend(api_key='test')
+    backend._model = BlockedModel()
+
+    with pytest.raises(BlockedResponseError) as excinfo:
+        backend.generate(["prompt"])
+
+    assert not excinfo.value.retryable
+    assert "SAFETY" in str(excinfo.value)
+
+
+def test_blocked_responses_do_not_open_the_circuit():
+    backend = GeminiBackend(api_key='test')
+    backend._model = BlockedModel()
+    breaker = CircuitBreaker(failure_threshold=2)
+    scheduled = ScheduledBackend(backend, ModelScheduler(breaker=breaker, base_delay=0))
+
+    for _ in range(3):
+        with pytest.raises(BlockedResponseError):
+            scheduled.generate("prompt")
+
+    assert breaker.state == 'closed'
+    assert scheduled.scheduler.stats()["retries"] == 0
+
+
+def test_blocked_model_call_fails_only_its_page(pages):
+    answers = [pages(f'answer{i}.png') for i in range(3)]
+
+    results = grade_answer_gemini([pages('problem.png')], answers, "rubric", 5, max_workers=3,
+                                  backend=FailingPageBackend(2, BlockedResponseError("blocked")))
+
+    assert results is not None
+    assert results["page_indexes"] == [0, 1, 2]
+    assert results["scores"][1] == 0
+    assert "error" in results["analyses"][1]
+    assert results["page_fingerprints"][1] is None
+    assert results["page_fingerprints"][0] is not None and results["page_fingerprints"][2] is not None
+
+
+@pytest.mark.parametrize("error", [BackendError("400 bad request"), BackendError("503", retryable=True)])
+def test_other_backend_errors_fail_the_whole_grading(pages, error):
+    answers = [pages(f'answer{i}.png') for i in range(3)]
+    backend = ScheduledBackend(FailingPageBackend(2, error), ModelScheduler(base_delay=0, max_retries=1))
+
+    results = grade_answer_gemini([pages('problem.png')], answers, "rubric", 5, max_workers=3, backend=backend)
+
+    assert results is None  # Not a zero for page 2 and a final score from the other pages
+
+
+def test_get_backend_rejects_unknown_name():
+    assert isinstance(get_backend('fake'), FakeBackend)
+    with pytest.raises(ValueError):
+        get_backend('nope')
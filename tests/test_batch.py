@@ -0,0 +1,134 @@
+import json
+import os
+
+from app.gemini_call.backends import FakeBackend
+from app.gemini_call.batch import (Checkpoint, find_submissions, grade_class, load_manifest, run_manifest,
+                                   summarize_class, write_class_results)
+
+
+def class_folder(tmp_path, pages):
+    root = tmp_path / 'class'
+    (root / 'alice').mkdir(parents=True)
+    (root / 'bob').mkdir()
+    (root / 'empty').mkdir()
+    pages(os.path.join('class', 'alice', '2.png'), marks=[(0, 0, 50, 50)])
+    pages(os.path.join('class', 'alice', '1.png'))
+    pages(os.path.join('class', 'bob', '1.png'), marks=[(0, 50, 50, 0)])
+    pages(os.path.join('class', 'carol.png'))
+    (root / 'notes.txt').write_text('not a page')
+    return str(root)
+
+
+def test_find_submissions(tmp_path, pages):
+    submissions = find_submissions(class_folder(tmp_path, pages))
+
+    assert list(submissions) == ['alice', 'bob', 'carol']
+    assert [os.path.basename(path) for path in submissions['alice']] == ['1.png', '2.png']
+
+
+def test_grade_class_grades_every_student(tmp_path, pages):
+    submissions = find_submissions(class_folder(tmp_path, pages))
+    backend = FakeBackend(questions_per_page=2)
+    finished = []
+
+    class_results = grade_class([pages('problem.png')], submissions, "rubric", 5, max_workers=3, backend=backend,
+                                on_student_result=lambda student, results: finished.append(student))
+
+    summary = class_results['summary']
+    assert sorted(finished) == ['alice', 'bob', 'carol']
+    assert (summary['students'], summary['graded'], summary['pages'], summary['failed']) == (3, 3, 4, [])
+    assert set(summary['question_averages']) == {'1', '2'}
+    assert backend.uploads == 1  # One problem set for the whole class
+
+
+def test_failed_students_are_reported():
+    results = {"page_indexes": [0], "scores": [4], "question_numbers": [1], "final_score": 4,
+               "image_modifications": [[]]}
+
+    summary = summarize_class({'alice': results, 'bob': None}, elapsed=2.0)
+
+    assert summary['failed'] == ['bob']
+    assert summary['final_score']['mean'] == 4
+    assert summary['pages_per_minute'] == 30
+
+
+def test_write_class_results(tmp_path):
+    class_results = {'students': {'a/b': {'final_score': 1}, 'c': None}, 'summary': {'students': 2}}
+
+    write_class_results(class_results, str(tmp_path))
+
+    assert sorted(os.listdir(tmp_path)) == ['a_b.json', 'class_summary.json']
+    assert json.loads((tmp_path / 'class_summary.json').read_text()) == {'students': 2}
+
+
+def manifest(tmp_path, pages, students=('alice', 'bob', 'carol')):
+    entries = []
+    for n, student in enumerate(students):
+        answers = [f'{student}-{page}.png' for page in range(2)]
+        for page, name in enumerate(answers):
+            pages(name, marks=[(10 * n, 10 * page, 100, 100)])
+        entries.append({'id': student, 'answers': answers})
+    pages('problem.png')
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps({'problems': ['problem.png'], 'standards': 'rubric', 'submissions': entries}))
+    return load_manifest(str(path))
+
+
+def checkpoint_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_checkpoint_ignores_torn_line(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    path.write_text(json.dumps({'type': 'submission', 'submission': 'alice', 'status': 'done'}) + '\n'
+                    + '{"type": "page", "submiss')
+
+    checkpoint = Checkpoint(str(path))
+    checkpoint.append({'type': 'submission', 'submission': 'bob', 'status': 'failed'})
+    checkpoint.close()
+
+    assert set(checkpoint.submissions) == {'alice', 'bob'}
+    assert set(Checkpoint(str(path)).submissions) == {'alice', 'bob'}  # The new record wasn't glued onto the torn one
+
+
+def test_run_manifest_checkpoints_pages_before_their_submission(tmp_path, pages):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    submissions = manifest(tmp_path, pages)
+
+    results = run_manifest(submissions, Checkpoint(path), processes=2, max_workers=2, backend_name='fake')
+
+    assert {student: record['status'] for student, record in results.items()} == \
+        {'alice': 'done', 'bob': 'done', 'carol': 'done'}
+    seen_pages = {}
+    for record in checkpoint_records(path):
+        if record['type'] == 'page':
+            seen_pages.setdefault(record['submission'], set()).add(record['page'])
+        else:
+            assert seen_pages.get(record['submission']) == {0, 1}
+
+
+def test_missing_answer_file_fails_only_its_submission(tmp_path, pages):
+    submissions = manifest(tmp_path, pages)
+    os.remove(submissions[1]['answers'][1])
+
+    results = run_manifest(submissions, Checkpoint(str(tmp_path / 'checkpoint.jsonl')), processes=2,
+                           backend_name='fake')
+
+    assert results['bob']['status'] == 'failed'
+    assert 'bob-1.png' in results['bob']['error']
+    assert results['alice']['status'] == results['carol']['status'] == 'done'
+
+
+def test_resume_reuses_checkpointed_pages(tmp_path, pages):
+    path = tmp_path / 'checkpoint.jsonl'
+    submissions = manifest(tmp_path, pages)
+    run_manifest(submissions, Checkpoint(str(path)), processes=2, backend_name='fake')
+    # Simulate a run interrupted after every page was graded but before any submission finished
+    page_records = [record for record in checkpoint_records(path) if record['type'] == 'page']
+    path.write_text(''.join(json.dumps(record) + '\n' for record in page_records))
+
+    results = run_manifest(submissions, Checkpoint(str(path)), processes=2, backend_name='fake')
+
+    assert all(record['status'] == 'done' for record in results.values())
+    assert [record for record in checkpoint_records(path) if record['type'] == 'page'] == page_records
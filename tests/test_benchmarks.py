@@ -0,0 +1,70 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.gemini_call.timing import StageTimings, percentile
+from benchmarks.bench_db_writes import check_processes
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([0, 10], 95) == 9.5
+
+
+def test_stage_timings_summary():
+    timings = StageTimings()
+    with timings.stage('model_call'):
+        pass
+    timings.record('model_call', 0.5)
+
+    summary = timings.summary()['model_call']
+
+    assert summary['count'] == 2
+    assert summary['total'] >= 0.5
+
+
+def test_bench_grading_writes_results(tmp_path):
+    output = tmp_path / 'bench.json'
+    subprocess.run([sys.executable, '-m', 'benchmarks.bench_grading', '--pages', '2', '--concurrency', '2',
+                    '--exams', '1', '--latency', '0', '--jitter', '0', '--output', str(output)],
+                   cwd=REPO_ROOT, check=True, capture_output=True, timeout=120)
+
+    results = json.loads(output.read_text())['results']
+
+    assert [(r['pages'], r['concurrency'], r['failed_exams']) for r in results] == [(2, 2, 0)]
+    assert results[0]['model_calls'] == 3  # Two pages plus the feedback call
+
+
+def crash():
+    raise SystemExit(3)
+
+
+def test_check_processes_fails_on_crashed_or_stuck_child():
+    crashed = multiprocessing.Process(target=crash, name='writer-0')
+    crashed.start()
+    crashed.join(10)
+    with pytest.raises(RuntimeError, match='writer-0 exited with code 3'):
+        check_processes([crashed])
+
+    stuck = multiprocessing.Process(target=time.sleep, args=(60,), name='reader-0')
+    stuck.start()
+    with pytest.raises(RuntimeError, match='reader-0 did not finish'):
+        check_processes([stuck])
+    assert not stuck.is_alive()
+
+
+def test_bench_db_writes_completes():
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.bench_db_writes', '--writers', '2', '--readers', '1',
+                             '--writes', '5', '--homeworks', '4', '--read-seconds', '0.2', '--timeout', '60'],
+                            cwd=REPO_ROOT, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert 'profile on' in result.stdout
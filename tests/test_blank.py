@@ -0,0 +1,104 @@
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.gemini_call.backends import FakeBackend
+from app.gemini_call.blank import detect_blank_page, template_thumbnail
+from app.gemini_call.gemini import grade_answer_gemini
+
+# A letter page scanned at 200 dpi
+PAGE_SIZE = (1700, 2200)
+
+
+def problem_sheet():
+    """A printed problem sheet: a title and a few lines of questions in the top half."""
+    img = Image.new('L', PAGE_SIZE, 245)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=48)
+    draw.text((150, 120), "Homework 3: Linear equations", fill=20, font=font)
+    for n in range(4):
+        draw.text((150, 300 + 220 * n), f"{n + 1}. Solve {n + 2}x + {n} = {3 * n + 8}", fill=20, font=font)
+    return img
+
+
+def write_answer(img, text="x = 4", position=(300, 1900)):
+    """Adds a short handwritten-size answer in pen strokes a few pixels wide."""
+    ImageDraw.Draw(img).text(position, text, fill=40, font=ImageFont.load_default(size=90))
+    return img
+
+
+def test_blank_page_is_blank():
+    blank, stats = detect_blank_page(Image.new('L', PAGE_SIZE, 245))
+
+    assert blank
+    assert stats['ink_ratio'] == 0
+
+
+def test_near_blank_scan_with_specks_is_blank():
+    img = Image.new('L', PAGE_SIZE, 240)
+    pixels = img.load()
+    rng = random.Random(0)
+    for _ in range(300):  # Dust specks a few pixels across, about as much ink as the sparse answer below
+        x, y = rng.randrange(PAGE_SIZE[0] - 3), rng.randrange(PAGE_SIZE[1] - 3)
+        for dx in range(3):
+            for dy in range(3):
+                pixels[x + dx, y + dy] = rng.randrange(0, 200)
+    ImageDraw.Draw(img).rectangle((0, 0, PAGE_SIZE[0], 6), fill=215)  # Faint shadow along the scanner edge
+
+    assert detect_blank_page(img)[0]
+
+
+def test_sparse_answer_is_not_blank():
+    img = write_answer(Image.new('L', PAGE_SIZE, 245))
+
+    blank, stats = detect_blank_page(img)
+
+    assert not blank
+    assert stats['ink_ratio'] > 0
+
+
+def test_thin_light_strokes_on_a_300_dpi_scan_are_not_blank():
+    img = Image.new('L', (2480, 3508), 245)  # A4 at 300 dpi, about 7 pixels per thumbnail pixel
+    draw = ImageDraw.Draw(img)
+    for n in range(5):  # A few lines of light pencil, 2 pixels wide
+        draw.line((400, 1000 + 60 * n, 1400, 1030 + 60 * n), fill=100, width=2)
+
+    assert not detect_blank_page(img)[0]
+
+
+def test_light_marks_on_a_dark_page_are_not_blank():
+    img = Image.new('L', PAGE_SIZE, 30)
+    ImageDraw.Draw(img).text((300, 1900), "x = 4", fill=220, font=ImageFont.load_default(size=90))
+
+    assert not detect_blank_page(img)[0]
+
+
+def test_unanswered_problem_sheet_is_blank_only_against_its_template():
+    sheet = problem_sheet()
+    templates = [template_thumbnail(sheet)]
+
+    assert not detect_blank_page(sheet)[0]  # Printed text is ink against the paper alone
+    blank, stats = detect_blank_page(sheet, templates)
+    assert blank
+    assert stats['reference'] == 0
+
+
+def test_answer_on_problem_sheet_is_not_blank():
+    templates = [template_thumbnail(problem_sheet())]
+
+    assert not detect_blank_page(write_answer(problem_sheet()), templates)[0]
+
+
+def test_blank_pages_are_skipped_without_a_model_call(tmp_path):
+    problem = str(tmp_path / 'problem.png')
+    blank = str(tmp_path / 'blank.png')
+    answered = str(tmp_path / 'answered.png')
+    problem_sheet().save(problem)
+    Image.new('L', PAGE_SIZE, 245).save(blank)
+    write_answer(problem_sheet()).save(answered)
+    backend = FakeBackend()
+
+    results = grade_answer_gemini([problem], [blank, answered], "rubric", 5, backend=backend, blank_page={})
+
+    assert results['blank_pages'] == [0]
+    assert backend.calls == 2  # The answered page and the feedback
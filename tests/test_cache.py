@@ -0,0 +1,71 @@
+import os
+import time
+
+from app.gemini_call.backends import FakeBackend
+from app.gemini_call.cache import ResponseCache, digest_image, make_cache_key
+from app.gemini_call.gemini import grade_answer_gemini
+
+KEY_ARGS = (["p" * 64], "a" * 64, 0, "rubric", 5, "fake", 1)
+
+
+def test_cache_key_changes_with_every_grading_input():
+    base = make_cache_key(*KEY_ARGS)
+    assert make_cache_key(*KEY_ARGS) == base
+    for position, changed in enumerate([["q" * 64], "b" * 64, 1, "other rubric", 6, "other-model", 2]):
+        args = list(KEY_ARGS)
+        args[position] = changed
+        assert make_cache_key(*args) != base
+    assert make_cache_key(*KEY_ARGS, options={"preprocess": {"max_edge": 1024}}) != base
+
+
+def test_digest_image_matches_for_path_and_bytes(pages):
+    path = pages('page.png')
+    with open(path, 'rb') as f:
+        assert digest_image(path) == digest_image(f.read())
+
+
+def test_set_then_get_round_trips(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.set("ab" * 32, {"scores": [3]})
+
+    assert cache.get("ab" * 32) == {"scores": [3]}
+    assert cache.get("cd" * 32) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_oldest_entries_are_evicted_over_max_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_entries=10)
+    keys = [f"{i:064x}" for i in range(11)]
+    now = time.time()
+    for n, key in enumerate(keys):
+        cache.set(key, {"n": n})
+        # Distinct mtimes so "oldest" is well defined
+        os.utime(cache._path(key), (now - 100 + n, now - 100 + n))
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[-1]) == {"n": 10}
+    assert cache.stats()["evictions"] == 2  # Trimmed to 90% of max_entries
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_age=60)
+    cache.set("ab" * 32, {"scores": [3]})
+    old = time.time() - 120
+    os.utime(cache._path("ab" * 32), (old, old))
+
+    assert cache.get("ab" * 32) is None
+    assert not os.path.exists(cache._path("ab" * 32))
+
+
+def test_grading_reuses_cached_pages(pages, tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache'))
+    problem, answer = pages('problem.png'), pages('answer.png')
+    backend = FakeBackend()
+
+    first = grade_answer_gemini([problem], [answer], "rubric", 5, cache=cache, backend=backend)
+    calls = backend.calls
+    second = grade_answer_gemini([problem], [answer], "rubric", 5, cache=cache, backend=backend)
+
+    assert second["scores"] == first["scores"]
+    assert backend.calls == calls + 1  # Only the feedback call
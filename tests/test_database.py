@@ -0,0 +1,31 @@
+from flask import Flask
+
+from app.database import engine_options
+from app.extensions import db
+from config import Config
+
+
+def app_for(uri, **extra):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(SQLALCHEMY_DATABASE_URI=uri, **extra)
+    return app
+
+
+def test_postgres_gets_pool_and_statement_timeout():
+    options = engine_options(app_for('postgresql://u@localhost/db'))
+
+    assert options['pool_size'] == Config.DB_POOL_SIZE
+    assert options['pool_pre_ping'] is True
+    assert 'statement_timeout' in options['connect_args']['options']
+
+
+def test_sqlite_gets_busy_timeout_and_explicit_options_win():
+    assert engine_options(app_for('sqlite:///x.db'))['connect_args'] == {'timeout': Config.SQLITE_BUSY_TIMEOUT_MS / 1000}
+    options = engine_options(app_for('sqlite:///x.db', SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {}}))
+    assert options['connect_args'] == {}
+
+
+def test_sqlite_connections_use_wal(app):
+    assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+    assert db.session.execute(db.text('PRAGMA busy_timeout')).scalar() == Config.SQLITE_BUSY_TIMEOUT_MS
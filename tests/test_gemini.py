@@ -0,0 +1,55 @@
+import os
+
+from PIL import Image
+
+from app.gemini_call.backends import FakeBackend
+from app.gemini_call.gemini import apply_image_modifications, grade_answer_gemini
+
+MODIFICATION = {"shape": "rectangle", "coordinates": [0.1, 0.1, 0.5, 0.5], "text": "Check"}
+
+
+def test_concurrent_grading_keeps_page_order(pages):
+    problem = pages('problem.png')
+    answers = [pages(f'answer{i}.png', marks=[(10, 10 + 20 * i, 200, 10 + 20 * i)]) for i in range(6)]
+
+    serial = grade_answer_gemini([problem], answers, "rubric", 5, backend=FakeBackend(questions_per_page=2))
+    concurrent = grade_answer_gemini([problem], answers, "rubric", 5, max_workers=4,
+                                     backend=FakeBackend(questions_per_page=2, jitter=0.02))
+
+    assert concurrent["scores"] == serial["scores"]
+    assert concurrent["page_indexes"] == [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+    assert len(concurrent["image_modifications"]) == 6
+
+
+def test_on_page_result_called_once_per_page(pages):
+    answers = [pages(f'answer{i}.png') for i in range(3)]
+    seen = []
+
+    grade_answer_gemini([pages('problem.png')], answers, "rubric", 5, max_workers=3, backend=FakeBackend(),
+                        on_page_result=lambda i, scores, analyses, mods: seen.append(i))
+
+    assert sorted(seen) == [0, 1, 2]
+
+
+def test_apply_image_modifications_names_output_after_path(pages, tmp_path):
+    path = pages('scan.png')
+
+    output = apply_image_modifications(path, [MODIFICATION], str(tmp_path / 'out'))
+
+    assert output == str(tmp_path / 'out' / 'scan_modified.png')
+    assert os.path.exists(output)
+
+
+def test_apply_image_modifications_names_unnamed_opened_image(tmp_path):
+    img = Image.new('RGB', (100, 100), 'white')
+
+    output = apply_image_modifications(img, [MODIFICATION], str(tmp_path / 'out'))
+
+    assert output == str(tmp_path / 'out' / 'page_modified.png')
+
+
+def test_apply_image_modifications_names_opened_file_after_it(pages, tmp_path):
+    with Image.open(pages('scan.png')) as img:
+        output = apply_image_modifications(img, [MODIFICATION], str(tmp_path / 'out'))
+
+    assert output == str(tmp_path / 'out' / 'scan_modified.png')
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from app.gemini_call.backends import BackendError, BackendResponse
+from app.gemini_call.hedging import HedgedBackend
+
+
+class ScriptedBackend:
+    """Backend whose n-th call sleeps delays[n] seconds (0 once the list runs out) and returns its call number."""
+
+    model_name = 'scripted'
+
+    def __init__(self, delays=(), errors=()):
+        self.delays = list(delays)
+        self.errors = list(errors)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, contents, response_schema=None):
+        with self._lock:
+            n = self.calls
+            self.calls += 1
+        time.sleep(self.delays[n] if n < len(self.delays) else 0)
+        if n < len(self.errors) and self.errors[n]:
+            raise self.errors[n]
+        return BackendResponse(str(n))
+
+
+def warmed_up(backend, latency=0.01, **kwargs):
+    hedged = HedgedBackend(backend, hedge_percentile=50, max_extra=1.0, min_samples=5, **kwargs)
+    hedged._latencies.extend([latency] * 5)
+    return hedged
+
+
+def test_no_hedging_before_min_samples():
+    hedged = HedgedBackend(ScriptedBackend([0.05]), min_samples=5)
+
+    assert hedged.generate("prompt").text == '0'
+    assert hedged.stats()['hedged'] == 0
+    assert hedged.hedge_delay() is None
+
+
+def test_slow_call_is_hedged_and_hedge_wins():
+    hedged = warmed_up(ScriptedBackend([0.3]))
+
+    assert hedged.generate("prompt").text == '1'
+    assert hedged.stats()['hedge_wins'] == 1
+
+
+def test_losing_primary_latency_is_recorded_from_request_start():
+    hedged = warmed_up(ScriptedBackend([0.3]))
+
+    hedged.generate("prompt")
+    time.sleep(0.4)  # Let the losing primary finish
+
+    latencies = list(hedged._latencies)
+    assert len(latencies) == 6
+    assert latencies[-1] >= 0.3
+
+
+def test_hedge_latencies_are_not_recorded():
+    hedged = warmed_up(ScriptedBackend([0.3, 0.0]))
+
+    hedged.generate("prompt")
+
+    assert len(hedged._latencies) == 5  # The primary is still running; the winning hedge adds nothing
+
+
+def test_extra_requests_are_capped():
+    hedged = HedgedBackend(ScriptedBackend([0.05] * 20), hedge_percentile=50, max_extra=0.1, min_samples=5)
+    hedged._latencies.extend([0.001] * 5)
+
+    for _ in range(10):
+        hedged.generate("prompt")
+
+    assert hedged.stats()['hedged'] <= 1
+
+
+def test_error_is_raised_when_every_call_fails():
+    hedged = HedgedBackend(ScriptedBackend(errors=[BackendError("boom")]))
+
+    with pytest.raises(BackendError):
+        hedged.generate("prompt")
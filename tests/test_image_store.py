@@ -0,0 +1,147 @@
+import hashlib
+import io
+import os
+
+from PIL import Image
+
+from app.image_store import HashingTempFile, ImageStore, get_image_store, normalized_extension, page_frames
+
+
+def pdf_bytes(count):
+    frames = [Image.new('RGB', (144, 72), (60 * n, 60 * n, 60 * n)) for n in range(count)]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format='PDF', save_all=True, append_images=frames[1:])
+    return buffer.getvalue()
+
+
+def test_put_file_stores_by_digest_and_deduplicates(tmp_path):
+    store = ImageStore(str(tmp_path))
+    data = b'page bytes' * 1000
+
+    digest, path, existed = store.put_file(io.BytesIO(data), '.png')
+    again = store.put_file(io.BytesIO(data), '.png')
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert path == os.path.join(str(tmp_path), digest[:2], digest[2:4], f'{digest}.png')
+    assert again == (digest, path, True)
+    assert not existed
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_uncommitted_temp_file_is_deleted_on_close(tmp_path):
+    temp_file = HashingTempFile(str(tmp_path))
+    temp_file.write(b'partial upload')
+
+    temp_file.close()
+
+    assert not os.path.exists(temp_file.path)
+
+
+def test_detached_temp_file_is_kept_on_close(tmp_path):
+    temp_file = HashingTempFile(str(tmp_path))
+    temp_file.write(b'complete upload')
+
+    path = temp_file.detach()
+    temp_file.close()
+
+    with open(path, 'rb') as f:
+        assert f.read() == b'complete upload'
+
+
+def test_resolve_accepts_only_blobs_of_the_store(tmp_path):
+    store = ImageStore(str(tmp_path / 'store'))
+    digest, path, _ = store.put_file(io.BytesIO(b'image'), '.png')
+
+    assert store.resolve(digest) == path
+    assert store.resolve(path) == path
+    assert store.resolve(os.path.join(str(tmp_path), 'store', digest[:2], '..', digest[:2], digest[2:4],
+                                      f'{digest}.png')) == path
+    assert store.resolve('f' * 64) is None
+    assert store.resolve(str(tmp_path / f'{digest}.png')) is None
+    assert store.resolve(None) is None
+
+
+def test_normalized_extension():
+    assert normalized_extension('Scan.JPG') == '.jpg'
+    assert normalized_extension('notes.txt') is None
+    assert normalized_extension('exam.PDF') == '.pdf'
+    assert normalized_extension('scan.tiff') == '.tiff'
+    assert normalized_extension(None) is None
+
+
+def test_upload_pages_streams_into_store(client, homework, app):
+    response = client.post(f'/homework/{homework.id}/pages', content_type='multipart/form-data', data={
+        'pages': [(io.BytesIO(b'first'), 'a.png'), (io.BytesIO(b'first'), 'b.png')],
+    })
+
+    assert response.status_code == 201
+    assert [page['deduplicated'] for page in response.json['pages']] == [False, True]
+    assert homework.get_images()[0] == homework.get_images()[1]
+    assert os.listdir(os.path.join(app.config['IMAGE_STORE_DIR'], 'tmp')) == []
+
+
+def test_upload_pages_rejects_unsupported_files(client, homework):
+    response = client.post(f'/homework/{homework.id}/pages', content_type='multipart/form-data', data={
+        'pages': [(io.BytesIO(b'x'), 'notes.txt')],
+    })
+
+    assert response.status_code == 400
+    assert homework.get_images() == []
+
+
+def test_page_frames(tmp_path, pages):
+    path = tmp_path / 'exam.pdf'
+    path.write_bytes(pdf_bytes(3))
+    tiff = tmp_path / 'single.tif'
+    Image.new('RGB', (10, 10)).save(tiff)
+
+    assert page_frames(str(path), '.pdf') == [0, 1, 2]
+    assert page_frames(str(tiff), '.tif') == [None]
+    assert page_frames(pages('a.png'), '.png') == [None]
+
+
+def test_upload_pages_expands_pdf_to_one_page_per_pdf_page(client, homework):
+    response = client.post(f'/homework/{homework.id}/pages', content_type='multipart/form-data', data={
+        'pages': [(io.BytesIO(b'cover'), 'cover.png'), (io.BytesIO(pdf_bytes(3)), 'exam.pdf')],
+    })
+
+    assert response.status_code == 201
+    assert [(page['page_index'], page['frame']) for page in response.json['pages']] == \
+        [(0, None), (1, 0), (2, 1), (3, 2)]
+    assert [frame for _, frame in homework.get_pages()] == [None, 0, 1, 2]
+    assert len(set(homework.get_images()[1:])) == 1  # Stored once
+
+
+def stored_blobs(app):
+    root = app.config['IMAGE_STORE_DIR']
+    return sorted(name for folder, _, names in os.walk(root) if folder != os.path.join(root, 'tmp') for name in names)
+
+
+def test_upload_pages_rejects_unreadable_pdf(app, client, homework):
+    response = client.post(f'/homework/{homework.id}/pages', content_type='multipart/form-data', data={
+        'pages': [(io.BytesIO(b'cover'), 'cover.png'), (io.BytesIO(b'%PDF-broken'), 'exam.pdf')],
+    })
+
+    assert response.status_code == 400
+    assert 'exam.pdf' in response.json['error']
+    assert homework.get_images() == []
+    # Nothing from a rejected request is left for store.resolve to hand out later
+    assert stored_blobs(app) == []
+    assert os.listdir(os.path.join(app.config['IMAGE_STORE_DIR'], 'tmp')) == []
+    with app.test_request_context():
+        assert get_image_store().resolve(hashlib.sha256(b'%PDF-broken').hexdigest()) is None
+
+
+def test_replace_page_takes_a_single_page_pdf_only(app, client, homework):
+    client.post(f'/homework/{homework.id}/pages', content_type='multipart/form-data',
+                data={'pages': [(io.BytesIO(b'cover'), 'cover.png')]})
+
+    rejected = client.put(f'/homework/{homework.id}/pages/0', content_type='multipart/form-data',
+                          data={'page': (io.BytesIO(pdf_bytes(2)), 'two.pdf')})
+    replaced = client.put(f'/homework/{homework.id}/pages/0', content_type='multipart/form-data',
+                          data={'page': (io.BytesIO(pdf_bytes(1)), 'one.pdf')})
+
+    assert rejected.status_code == 400
+    assert replaced.status_code == 200
+    assert homework.get_pages()[0][1] == 0
+    assert len(stored_blobs(app)) == 2  # The cover and the one-page PDF, not the rejected one
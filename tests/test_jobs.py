@@ -0,0 +1,121 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+from app.extensions import db
+from app.jobs import claim_next_job, enqueue_grading_job, requeue_stale_jobs, run_job
+from app.models import GradingJob, QuestionResult
+
+
+def test_claim_next_job_takes_oldest_queued_job(homework):
+    first = enqueue_grading_job(homework, "rubric")
+    enqueue_grading_job(homework, "rubric")
+
+    job = claim_next_job('worker-1')
+
+    assert job.id == first.id
+    assert (job.status, job.worker, job.attempts) == ('running', 'worker-1', 1)
+    assert job.heartbeat_at is not None
+
+
+def test_claim_next_job_returns_none_when_queue_is_empty(app):
+    assert claim_next_job('worker-1') is None
+
+
+def test_stale_running_job_is_requeued(homework):
+    enqueue_grading_job(homework, "rubric")
+    job = claim_next_job('dead-worker')
+    job.heartbeat_at = datetime.utcnow() - timedelta(seconds=700)
+    job.add_page_result(0, [5], ["ok"], [])
+    db.session.commit()
+
+    assert requeue_stale_jobs(lease=600, max_attempts=3) == 1
+
+    db.session.refresh(job)
+    assert (job.status, job.worker, job.started_at) == ('queued', None, None)
+    assert job.get_page_results() == []
+    assert claim_next_job('worker-2').attempts == 2
+
+
+def test_job_with_recent_heartbeat_is_left_running(homework):
+    enqueue_grading_job(homework, "rubric")
+    job = claim_next_job('busy-worker')
+
+    assert requeue_stale_jobs(lease=600, max_attempts=3) == 0
+
+    db.session.refresh(job)
+    assert job.status == 'running'
+
+
+def test_stale_job_fails_after_max_attempts(homework):
+    enqueue_grading_job(homework, "rubric")
+    job = claim_next_job('dead-worker')
+    job.attempts = 3
+    job.heartbeat_at = datetime.utcnow() - timedelta(seconds=700)
+    db.session.commit()
+
+    assert requeue_stale_jobs(lease=600, max_attempts=3) == 0
+
+    db.session.refresh(job)
+    assert job.status == 'failed'
+    assert job.finished_at is not None
+    assert db.session.scalar(db.select(db.func.count()).select_from(GradingJob)
+                             .where(GradingJob.status == 'queued')) == 0
+
+
+def test_pdf_upload_is_graded_and_annotated_per_page(app, client, homework, pages):
+    app.config['ANNOTATION_MODE'] = 'raster'
+    frames = [Image.new('RGB', (144, 72), 'white') for _ in range(3)]
+    pdf = io.BytesIO()
+    frames[0].save(pdf, format='PDF', save_all=True, append_images=frames[1:])
+    client.post(f'/homework/{homework.id}/pages', content_type='multipart/form-data',
+                data={'pages': [(io.BytesIO(pdf.getvalue()), 'exam.pdf')]})
+    enqueue_grading_job(homework, "rubric", problem_image_paths=[pages('problem.png')])
+
+    job = claim_next_job('worker-1')
+    run_job(job)
+
+    assert job.status == 'done', job.error
+    assert sorted(result['page'] for result in job.get_page_results()) == [0, 1, 2]
+    for page_index in range(3):
+        overlay = client.get(f'/homework/{homework.id}/pages/{page_index}/overlay').json
+        assert set(overlay) == {'version', 'image_url', 'modifications'}
+        original = client.get(overlay['image_url'])
+        assert original.mimetype == 'image/png'
+        with Image.open(io.BytesIO(original.data)) as img:
+            assert img.size == (400, 200)
+            assert img.getpixel((40, 40))[:3] == (255, 255, 255)
+        response = client.get(f'/homework/{homework.id}/pages/{page_index}/annotated.png')
+        assert response.status_code == 200
+        with Image.open(io.BytesIO(response.data)) as annotated:
+            assert annotated.size == (400, 200)  # Rasterized at 200 dpi, not the PDF itself
+            assert annotated.getpixel((40, 40))[:3] == (255, 0, 0)
+    corrected = os.path.join(app.config['CORRECTED_IMAGES_DIR'], str(homework.id))
+    assert sorted(os.listdir(corrected)) == ['page_0.png', 'page_1.png', 'page_2.png']
+
+
+def test_job_fails_when_a_page_cannot_be_graded(app, homework, pages, monkeypatch):
+    from app import jobs
+    from app.gemini_call.backends import BackendError, FakeBackend
+    from app.gemini_call.scheduler import ModelScheduler, ScheduledBackend
+
+    class OutageOnPage2(FakeBackend):
+        def generate(self, contents, response_schema=None):
+            if not isinstance(contents, str) and any("Answer Sheet Page 2:" in part for part in contents
+                                                     if isinstance(part, str)):
+                raise BackendError("503 Service Unavailable", retryable=True, status=503)
+            return super().generate(contents, response_schema)
+
+    monkeypatch.setattr(jobs, '_backend', ScheduledBackend(OutageOnPage2(), ModelScheduler(base_delay=0, max_retries=1)))
+    homework.add_image(pages('a.png', marks=[(0, 0, 50, 50)]))
+    homework.add_image(pages('b.png', marks=[(50, 0, 0, 50)]))
+    db.session.commit()
+    enqueue_grading_job(homework, "rubric", problem_image_paths=[pages('problem.png')])
+
+    job = claim_next_job('worker-1')
+    run_job(job)
+
+    assert job.status == 'failed'
+    assert db.session.scalar(db.select(db.func.count()).select_from(QuestionResult)) == 0
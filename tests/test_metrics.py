@@ -0,0 +1,78 @@
+import json
+import multiprocessing
+import os
+
+from app import metrics
+from app.metrics import Counter, Histogram
+from config import Config
+
+
+def test_histogram_renders_cumulative_buckets(tmp_path):
+    histogram = Histogram('stage_seconds', "Stage durations.", ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, 'model_call')
+    merged = {}
+    metrics._merge(merged, {'stage_seconds': histogram.snapshot()})
+
+    assert merged['stage_seconds']['series'][('model_call',)] == ([1, 1, 1], 5.55, 3)
+
+
+def test_counter_labels_are_escaped():
+    counter = Counter('events_total', "Events.", ('event',))
+    counter.inc('a"b', amount=2)
+
+    assert counter.snapshot()['series'] == [[['a"b'], 2]]
+    assert metrics._format_labels(('event',), ('a"b',)) == '{event="a\\"b"}'
+
+
+def dead_pid():
+    process = multiprocessing.Process(target=int)
+    process.start()
+    process.join()
+    return process.pid
+
+
+def dump_counter(directory, pid, jobs):
+    snapshot = {'grading_jobs_total': {'kind': 'counter', 'help': "Jobs.", 'labelnames': ['status'],
+                                       'series': [[['done'], jobs]]}}
+    with open(os.path.join(directory, f'{pid}.json'), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+
+
+def test_render_skips_and_removes_dumps_of_dead_workers(tmp_path):
+    before = metrics.render(str(tmp_path))
+    stale = dead_pid()
+    dump_counter(str(tmp_path), stale, 1000)
+    dump_counter(str(tmp_path), os.getppid(), 7)
+
+    text = metrics.render(str(tmp_path))
+
+    assert 'grading_jobs_total{status="done"} 1000' not in text
+    assert not os.path.exists(tmp_path / f'{stale}.json')
+    assert os.path.exists(tmp_path / f'{os.getppid()}.json')
+    assert text != before
+
+
+def test_dump_overwrites_own_file(tmp_path):
+    dump_counter(str(tmp_path), os.getpid(), 1000)
+
+    metrics.dump(str(tmp_path))
+
+    with open(tmp_path / f'{os.getpid()}.json', encoding='utf-8') as f:
+        assert set(json.load(f)) == {metric.name for metric in metrics.METRICS}
+
+
+def test_metrics_endpoint_is_off_by_default(client):
+    if 'METRICS_ENABLED' not in os.environ:
+        assert Config.METRICS_ENABLED is False
+    assert client.get('/metrics').status_code == 404
+
+
+def test_metrics_endpoint_requires_token_when_set(app, client):
+    app.config.update(METRICS_ENABLED=True, METRICS_TOKEN='s3cret')
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert '# TYPE grading_jobs_total counter' in response.get_data(as_text=True)
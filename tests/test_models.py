@@ -0,0 +1,101 @@
+import json
+
+from app.extensions import db
+from app.models import Homework, QuestionResult
+
+
+def grading_results(scores, page_indexes, question_numbers=None):
+    pages = max(page_indexes, default=-1) + 1
+    return {
+        'scores': scores,
+        'analyses': [f'analysis {n}' for n in range(len(scores))],
+        'question_numbers': question_numbers or list(range(1, len(scores) + 1)),
+        'page_indexes': page_indexes,
+        'image_modifications': [[] for _ in range(pages)],
+        'final_score': sum(scores),
+        'feedback': 'feedback',
+    }
+
+
+def test_pages_keep_their_order(homework):
+    for name in ['a.png', 'b.png', 'c.png']:
+        homework.add_image(name)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(Homework, homework.id).get_images() == ['a.png', 'b.png', 'c.png']
+
+
+def test_set_results_stores_one_row_per_question(homework):
+    homework.add_image('a.png')
+    homework.add_image('b.png')
+    homework.set_results(grading_results([4, 6, 9], [0, 0, 1]))
+    db.session.commit()
+
+    rows = [(r.position, r.page_index, r.question_number, r.score) for r in homework.question_results]
+    assert rows == [(0, 0, 1, 4), (1, 0, 2, 6), (2, 1, 3, 9)]
+    assert json.loads(homework.analysis)['final_score'] == 19
+
+
+def test_set_results_replaces_earlier_rows(homework):
+    homework.add_image('a.png')
+    homework.set_results(grading_results([4, 6], [0, 0]))
+    db.session.commit()
+    homework.set_results(grading_results([8], [0]))
+    db.session.commit()
+
+    assert db.session.scalar(db.select(db.func.count()).select_from(QuestionResult)) == 1
+
+
+def test_average_score_across_homeworks(homework, user):
+    other = Homework(title='Homework 2', subject='Physics', due_date=homework.due_date, user_id=user.id)
+    db.session.add(other)
+    homework.set_results(grading_results([4], [0], [1]))
+    other.set_results(grading_results([8], [0], [1]))
+    db.session.commit()
+
+    assert QuestionResult.average_score(1) == 6
+    assert QuestionResult.average_score(2) is None
+
+
+def test_results_without_page_data_clear_stored_page_results(homework):
+    homework.add_image('a.png')
+    homework.set_results(dict(grading_results([4], [0]), page_fingerprints=['f0']))
+    db.session.commit()
+
+    # Minimal results, as written by benchmarks and older tools: no fingerprints, modifications or page indexes
+    homework.set_results({'scores': [5], 'analyses': ['x'], 'final_score': 5})
+    db.session.commit()
+
+    assert homework.previous_results() == ([None], None)
+    assert [(r.page_index, r.score) for r in homework.question_results] == [(None, 5)]
+
+
+def test_previous_results_round_trip_per_page(homework):
+    homework.add_image('a.png')
+    homework.add_image('b.png')
+    results = dict(grading_results([4, 6, 9], [0, 0, 1]), page_fingerprints=['f0', None],
+                   feedback_fingerprint='ff')
+    results['image_modifications'] = [[{'shape': 'line', 'coordinates': [0, 0, 1, 1]}], []]
+    homework.set_results(results)
+    db.session.commit()
+
+    previous_pages, previous_feedback = homework.previous_results()
+
+    assert previous_pages[0] == {'fingerprint': 'f0', 'scores': [4, 6], 'analyses': ['analysis 0', 'analysis 1'],
+                                 'question_numbers': [1, 2], 'image_modifications': results['image_modifications'][0]}
+    assert previous_pages[1] is None  # Failed pages are regraded
+    assert previous_feedback == {'fingerprint': 'ff', 'feedback': 'feedback'}
+
+
+def test_replace_image_drops_only_that_pages_result(homework):
+    homework.add_image('a.png')
+    homework.add_image('b.png')
+    homework.set_results(dict(grading_results([4, 6], [0, 1]), page_fingerprints=['f0', 'f1']))
+    homework.replace_image(1, 'c.png')
+    db.session.commit()
+
+    previous_pages, _ = homework.previous_results()
+
+    assert previous_pages[0]['fingerprint'] == 'f0'
+    assert previous_pages[1] is None
@@ -0,0 +1,61 @@
+import io
+import os
+
+from PIL import Image
+
+from app.gemini_call.overlays import load_overlay, render_page, save_overlay, save_overlays
+
+LINE = {"shape": "line", "coordinates": [0, 0.5, 1, 0.5], "line_width": 3}
+
+
+def test_save_and_load_overlay(pages, tmp_path):
+    image_path = pages('page.png')
+
+    save_overlay(str(tmp_path), 'hw', 0, image_path, [LINE])
+
+    overlay = load_overlay(str(tmp_path), 'hw', 0)
+    assert overlay["image"] == image_path
+    assert overlay["modifications"] == [LINE]
+    assert load_overlay(str(tmp_path), 'hw', 1) is None
+
+
+def test_save_overlays_writes_one_document_per_page(pages, tmp_path):
+    paths = save_overlays(str(tmp_path), 'hw', [pages('a.png'), pages('b.png')], [[LINE], []])
+
+    assert [os.path.basename(path) for path in paths] == ['page_0.json', 'page_1.json']
+    assert load_overlay(str(tmp_path), 'hw', 1)["modifications"] == []
+
+
+def test_render_page_draws_modifications_without_touching_original(pages, tmp_path):
+    image_path = pages('page.png', size=(100, 100))
+    save_overlay(str(tmp_path), 'hw', 0, image_path, [LINE])
+
+    with Image.open(io.BytesIO(render_page(str(tmp_path), 'hw', 0))) as rendered:
+        assert rendered.getpixel((50, 50))[:3] == (255, 0, 0)
+    with Image.open(image_path) as original:
+        assert original.getpixel((50, 50)) == (255, 255, 255)
+    assert render_page(str(tmp_path), 'hw', 1) is None
+
+
+def test_rewritten_overlay_is_not_served_stale(pages, tmp_path):
+    image_path = pages('page.png', size=(100, 100))
+    path = save_overlay(str(tmp_path), 'hw', 0, image_path, [LINE])
+    first = render_page(str(tmp_path), 'hw', 0)
+
+    save_overlay(str(tmp_path), 'hw', 0, image_path, [])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert render_page(str(tmp_path), 'hw', 0) != first
+
+
+def test_render_page_of_multi_page_file_uses_its_frame(tmp_path):
+    tiff = str(tmp_path / 'exam.tif')
+    frames = [Image.new('RGB', (100, 100), shade) for shade in ('white', 'blue')]
+    frames[0].save(tiff, save_all=True, append_images=frames[1:])
+    save_overlay(str(tmp_path), 'hw', 1, tiff, [LINE], frame=1)
+
+    assert load_overlay(str(tmp_path), 'hw', 1)["frame"] == 1
+    with Image.open(io.BytesIO(render_page(str(tmp_path), 'hw', 1))) as rendered:
+        assert rendered.getpixel((50, 50))[:3] == (255, 0, 0)
+        assert rendered.getpixel((10, 10))[:3] == (0, 0, 255)
@@ -0,0 +1,78 @@
+import pytest
+from PIL import Image
+
+from app.gemini_call.pages import PageSource, count_frames, is_pdf
+
+
+def multi_page(path, count, size=(200, 100)):
+    """Writes count pages of different shades to a multi-page TIFF or PDF, chosen by path's extension."""
+    frames = [Image.new('RGB', size, (40 * n, 40 * n, 40 * n)) for n in range(count)]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+    return str(path)
+
+
+def test_missing_file_is_reported_up_front(tmp_path, pages):
+    with pytest.raises(FileNotFoundError, match='missing.png'):
+        PageSource([pages('a.png'), str(tmp_path / 'missing.png')])
+
+
+def test_multi_frame_tiff_expands_to_one_page_per_frame(tmp_path, pages):
+    source = PageSource([pages('a.png'), multi_page(tmp_path / 'b.tif', 3)])
+
+    assert len(source) == 4
+    assert count_frames(str(tmp_path / 'b.tif')) == 3
+    with source.open(3) as img:
+        assert img.convert('L').getpixel((0, 0)) == 80
+
+
+def test_pdf_pages_are_rasterized_at_dpi(tmp_path):
+    path = multi_page(tmp_path / 'exam.pdf', 3)
+    source = PageSource([path], dpi=144)
+
+    assert is_pdf(path)
+    assert len(source) == 3
+    with source.open(1) as img:
+        assert img.size == (400, 200)  # PIL wrote the pages at 72 dpi
+
+
+def test_open_closes_the_image(pages):
+    source = PageSource([pages('a.png')])
+
+    with source.open(0) as img:
+        img.load()
+    with pytest.raises(ValueError):
+        img.getpixel((0, 0))
+
+
+def test_digest_is_stable_and_frame_specific(tmp_path, pages):
+    tiff = multi_page(tmp_path / 'b.tif', 2)
+    source = PageSource([pages('a.png'), tiff])
+
+    digests = [source.digest(i) for i in range(len(source))]
+
+    assert digests == [PageSource([pages('a.png'), tiff]).digest(i) for i in range(3)]
+    assert len(set(digests)) == 3
+    assert PageSource([tiff], dpi=100).digest(0) == source.digest(1)  # dpi only matters for PDFs
+
+
+def test_from_pages_keeps_stored_frames(tmp_path, pages):
+    pdf = multi_page(tmp_path / 'exam.pdf', 3)
+    expanded = PageSource([pages('a.png'), pdf])
+
+    source = PageSource.from_pages([(pages('a.png'), None), (pdf, 0), (pdf, 2)])
+
+    assert len(source) == 3
+    assert len(source.inputs) == 2  # Pages of one file share it
+    assert [source.digest(i) for i in range(3)] == [expanded.digest(i) for i in (0, 1, 3)]
+    with source.open(2) as img:
+        assert img.convert('L').getpixel((0, 0)) == 80
+    with pytest.raises(FileNotFoundError):
+        PageSource.from_pages([(str(tmp_path / 'missing.pdf'), 0)])
+
+
+def test_load_image_is_still_importable_from_gemini(pages):
+    from app.gemini_call import gemini, pages as pages_module
+
+    assert gemini.load_image is pages_module.load_image
+    with gemini.load_image(pages('a.png')) as img:
+        assert img.size == (400, 300)
@@ -0,0 +1,50 @@
+import datetime
+import uuid
+
+import pytest
+
+from app.extensions import db
+from app.models import Homework
+from app.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips():
+    key = (datetime.date(2026, 3, 1), uuid.uuid4())
+
+    assert decode_cursor(encode_cursor(*key)) == key
+
+
+def test_malformed_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+
+
+@pytest.fixture
+def homeworks(user):
+    # Several homeworks share a due date, so the id is what keeps the order total
+    rows = [Homework(title=f'hw{n}', subject='Maths', due_date=datetime.date(2026, 1, 1 + n // 3), user_id=user.id)
+            for n in range(10)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return sorted(rows, key=lambda row: (row.due_date, row.id))
+
+
+def fetch_all(client, **params):
+    ids, cursor = [], None
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        body = client.get('/api/homework', query_string=query).json
+        ids.extend(row['id'] for row in body['homeworks'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_every_homework_once_in_order(client, homeworks):
+    assert fetch_all(client, limit=3) == [str(row.id) for row in homeworks]
+    assert fetch_all(client, limit=4, order='desc') == [str(row.id) for row in reversed(homeworks)]
+
+
+def test_invalid_parameters_are_rejected(client, homeworks):
+    assert client.get('/api/homework', query_string={'limit': 0}).status_code == 400
+    assert client.get('/api/homework', query_string={'cursor': 'garbage'}).status_code == 400
@@ -0,0 +1,52 @@
+import io
+
+from PIL import Image
+
+from app.gemini_call.backends import FakeBackend
+from app.gemini_call.gemini import grade_answer_gemini
+from app.gemini_call.preprocess import preprocess_image
+
+
+def decode(blob):
+    return Image.open(io.BytesIO(blob['data']))
+
+
+def test_resizes_to_max_edge_keeping_aspect_ratio():
+    blob = preprocess_image(Image.new('RGB', (4000, 2000), 'white'), max_edge=1000)
+
+    assert blob['mime_type'] == 'image/jpeg'
+    assert decode(blob).size == (1000, 500)
+
+
+def test_small_pages_keep_their_size():
+    assert decode(preprocess_image(Image.new('RGB', (300, 200), 'white'), max_edge=1000)).size == (300, 200)
+
+
+def test_exif_orientation_is_applied():
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotated 90 degrees
+    Image.new('RGB', (400, 200), 'white').save(buffer, format='JPEG', exif=exif)
+
+    blob = preprocess_image(Image.open(io.BytesIO(buffer.getvalue())), max_edge=None)
+
+    assert decode(blob).size == (200, 400)
+
+
+def test_grayscale_and_transparency():
+    assert decode(preprocess_image(Image.new('RGB', (10, 10), 'red'), grayscale=True, image_format='PNG')).mode == 'L'
+
+    flattened = decode(preprocess_image(Image.new('RGBA', (10, 10), (0, 0, 0, 0)), image_format='WEBP'))
+    assert flattened.mode == 'RGB'
+    assert flattened.getpixel((5, 5)) == (255, 255, 255)
+
+
+def test_grading_reports_payload_sizes(pages):
+    answers = [pages('answer.png', size=(3000, 2000))]
+
+    results = grade_answer_gemini([pages('problem.png', size=(3000, 2000))], answers, "rubric", 5,
+                                  backend=FakeBackend(), preprocess={'max_edge': 800})
+
+    page = results['payload']['pages'][0]
+    assert page['bytes_after'] < page['bytes_before']
+    assert results['payload']['problem_bytes_after'] < results['payload']['problem_bytes_before']
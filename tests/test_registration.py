@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from app.gemini_call.backends import BackendError, FakeBackend, ImageRef
+from app.gemini_call.gemini import ProblemSet, grade_answer_gemini
+
+
+def test_problem_images_are_uploaded_once_per_backend(pages):
+    backend = FakeBackend()
+    problems = [pages('problem1.png', marks=[(0, 0, 50, 50)]), pages('problem2.png', marks=[(50, 0, 0, 50)])]
+
+    for student in range(3):
+        answers = [pages(f's{student}p{i}.png', marks=[(0, i, 50, i)]) for i in range(2)]
+        grade_answer_gemini(problems, answers, "rubric", 5, backend=backend, max_workers=2)
+
+    assert backend.uploads == 2
+
+
+def test_shared_problem_set_registers_on_first_page_only(pages):
+    backend = FakeBackend()
+    problem_set = ProblemSet([pages('problem.png')])
+
+    assert problem_set.references(backend) is problem_set.references(backend)
+    assert backend.uploads == 1
+
+
+def test_shared_problem_set_registers_with_each_backend(pages):
+    first, second = FakeBackend(), FakeBackend()
+    problem_set = ProblemSet([pages('problem.png')])
+
+    problem_set.references(first)
+    refs = problem_set.references(second)
+
+    assert second.uploads == 1
+    second.generate(refs + ["prompt"])  # Refs handed out by the first backend would be rejected here
+
+
+def test_shared_problem_set_re_registers_expiring_references(pages):
+    backend = FakeBackend()
+    problem_set = ProblemSet([pages('problem.png')])
+    refs = problem_set.references(backend)
+    refs[0].expires_at = time.time() + 10  # Inside the re-upload margin
+
+    fresh = problem_set.references(backend)
+
+    assert backend.uploads == 2
+    assert fresh[0] is not refs[0] and not fresh[0].expired()
+
+
+def test_registration_key_includes_preprocessing(pages):
+    problem = pages('problem.png')
+
+    assert ProblemSet([problem]).keys != ProblemSet([problem], preprocess={'max_edge': 100}).keys
+
+
+def test_expiring_reference_is_uploaded_again(pages):
+    backend = FakeBackend()
+    refs = backend.register_images([{'mime_type': 'image/png', 'data': b'x'}], ['key'])
+    refs[0].expires_at = time.time() + 10  # Inside the re-upload margin
+
+    backend.register_images([{'mime_type': 'image/png', 'data': b'x'}], ['key'])
+
+    assert backend.uploads == 2
+
+
+def test_unknown_reference_is_rejected():
+    with pytest.raises(BackendError):
+        FakeBackend().generate([ImageRef('missing', None), "prompt"])
@@ -0,0 +1,56 @@
+from app.gemini_call.backends import FakeBackend
+from app.gemini_call.gemini import grade_answer_gemini
+
+
+def previous_from(results):
+    pages = [
+        {'fingerprint': fingerprint, 'scores': [s for s, i in zip(results['scores'], results['page_indexes']) if i == page],
+         'analyses': [a for a, i in zip(results['analyses'], results['page_indexes']) if i == page],
+         'question_numbers': [q for q, i in zip(results['question_numbers'], results['page_indexes']) if i == page],
+         'image_modifications': results['image_modifications'][page]}
+        for page, fingerprint in enumerate(results['page_fingerprints'])
+    ]
+    return pages, {'fingerprint': results['feedback_fingerprint'], 'feedback': results['feedback']}
+
+
+def test_unchanged_regrade_makes_no_model_calls(pages):
+    problem = pages('problem.png')
+    answers = [pages(f'a{i}.png', marks=[(0, i, 80, i)]) for i in range(3)]
+    backend = FakeBackend()
+    first = grade_answer_gemini([problem], answers, "rubric", 5, backend=backend)
+    calls = backend.calls
+
+    previous_pages, previous_feedback = previous_from(first)
+    second = grade_answer_gemini([problem], answers, "rubric", 5, backend=backend,
+                                 previous_pages=previous_pages, previous_feedback=previous_feedback)
+
+    assert backend.calls == calls
+    assert second['scores'] == first['scores']
+    assert second['page_fingerprints'] == first['page_fingerprints']
+
+
+def test_changed_page_is_the_only_one_regraded(pages):
+    problem = pages('problem.png')
+    answers = [pages(f'a{i}.png', marks=[(0, i, 80, i)]) for i in range(3)]
+    backend = FakeBackend()
+    first = grade_answer_gemini([problem], answers, "rubric", 5, backend=backend)
+    calls = backend.calls
+
+    answers[1] = pages('a1-fixed.png', marks=[(0, 50, 80, 50)])
+    second = grade_answer_gemini([problem], answers, "rubric", 5, backend=backend, previous_pages=previous_from(first)[0])
+
+    assert backend.calls == calls + 2  # The changed page and the feedback
+    assert second['page_fingerprints'][0] == first['page_fingerprints'][0]
+    assert second['page_fingerprints'][1] != first['page_fingerprints'][1]
+
+
+def test_changed_rubric_regrades_every_page(pages):
+    problem = pages('problem.png')
+    answers = [pages(f'a{i}.png', marks=[(0, i, 80, i)]) for i in range(2)]
+    backend = FakeBackend()
+    first = grade_answer_gemini([problem], answers, "rubric", 5, backend=backend)
+    calls = backend.calls
+
+    grade_answer_gemini([problem], answers, "stricter rubric", 5, backend=backend, previous_pages=previous_from(first)[0])
+
+    assert backend.calls == calls + 3
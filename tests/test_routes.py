@@ -0,0 +1,138 @@
+import io
+import json
+import uuid
+
+from PIL import Image
+
+from app.extensions import db
+from app.gemini_call.overlays import save_overlay
+from app.image_store import get_image_store
+from app.jobs import enqueue_grading_job
+from app.models import GradingJob, User
+
+
+def test_grade_homework_accepts_image_store_digest(client, homework, pages):
+    with open(pages('problem.png'), 'rb') as f:
+        digest, path, _ = get_image_store().put_file(f, '.png')
+
+    response = client.post(f'/homework/{homework.id}/grade',
+                           json={'grading_standards': 'rubric', 'problem_images': [digest]})
+
+    assert response.status_code == 202
+    job = db.session.get(GradingJob, uuid.UUID(response.json['job_id']))
+    assert job.get_problem_images() == [path]
+
+
+def test_grade_homework_accepts_stored_path(client, homework, pages):
+    with open(pages('problem.png'), 'rb') as f:
+        _, path, _ = get_image_store().put_file(f, '.png')
+
+    response = client.post(f'/homework/{homework.id}/grade',
+                           json={'grading_standards': 'rubric', 'problem_images': path})
+
+    assert response.status_code == 202
+
+
+def test_grade_homework_rejects_paths_outside_image_store(client, homework, pages):
+    outside = pages('secret.png')
+    for reference in ['/etc/passwd', outside, 'image_store/../config.py', '0' * 64, ['x'], 5]:
+        response = client.post(f'/homework/{homework.id}/grade',
+                               json={'grading_standards': 'rubric', 'problem_images': [reference]})
+        assert response.status_code == 400, reference
+    assert db.session.scalar(db.select(db.func.count()).select_from(GradingJob)) == 0
+
+
+def test_grade_homework_rejects_traversal_into_a_blob_name(client, homework, pages):
+    with open(pages('problem.png'), 'rb') as f:
+        digest, path, _ = get_image_store().put_file(f, '.png')
+    # Same file name, different folder
+    copy = pages(f'{digest}.png')
+
+    response = client.post(f'/homework/{homework.id}/grade',
+                           json={'grading_standards': 'rubric', 'problem_images': [copy]})
+
+    assert response.status_code == 400
+
+
+def test_job_status_and_stream_of_finished_job(client, homework):
+    job = enqueue_grading_job(homework, "rubric")
+    job.add_page_result(0, [7], ["good"], [])
+    job.add_page_result(1, [3], ["weak"], [])
+    job.status = 'done'
+    homework.analysis = json.dumps({'final_score': 10, 'feedback': 'Well done'})
+    db.session.commit()
+
+    assert client.get(f'/jobs/{job.id}').json['status'] == 'done'
+    body = client.get(f'/jobs/{job.id}/stream').get_data(as_text=True)
+
+    events = [block.split('\n') for block in body.strip().split('\n\n')]
+    assert [lines[0] for lines in events] == ['event: page', 'event: page', 'event: done']
+    assert json.loads(events[1][1][len('data: '):])['scores'] == [3]
+    assert json.loads(events[2][1][len('data: '):]) == {'final_score': 10, 'feedback': 'Well done'}
+
+
+def test_stream_of_failed_job_ends_with_error(client, homework):
+    job = enqueue_grading_job(homework, "rubric")
+    job.status = 'failed'
+    job.error = 'boom'
+    db.session.commit()
+
+    body = client.get(f'/jobs/{job.id}/stream').get_data(as_text=True)
+
+    assert body == 'event: failed\ndata: {"error": "boom"}\n\n'
+
+
+def test_jobs_of_other_users_are_not_found(app, client, homework):
+    other = User(username='other', email='other@example.com', password='x')
+    db.session.add(other)
+    db.session.commit()
+    job = enqueue_grading_job(homework, "rubric")
+    other_client = app.test_client()
+    with other_client.session_transaction() as session:
+        session['_user_id'] = str(other.id)
+
+    assert other_client.get(f'/jobs/{job.id}').status_code == 404
+    assert other_client.get(f'/jobs/{job.id}/stream').status_code == 404
+
+
+def test_page_image_serves_the_original_page(app, client, homework, pages):
+    path = pages('a.png', marks=[(0, 0, 50, 50)])
+    homework.add_image(path)
+    db.session.commit()
+    save_overlay(app.config['OVERLAY_DIR'], homework.id, 0, path, [])
+
+    overlay = client.get(f'/homework/{homework.id}/pages/0/overlay').json
+    response = client.get(overlay['image_url'])
+
+    assert 'image' not in overlay  # No server paths in the response
+    assert overlay['image_url'] == f'/homework/{homework.id}/pages/0/image'
+    assert response.mimetype == 'image/png'
+    with open(path, 'rb') as f:
+        assert response.data == f.read()
+    assert client.get(f'/homework/{homework.id}/pages/1/image').status_code == 404
+
+
+def test_page_image_rasterizes_tiff_frames(client, homework, tmp_path):
+    path = str(tmp_path / 'exam.tif')
+    frames = [Image.new('RGB', (60, 40), color) for color in ('white', 'blue')]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+    homework.add_image(path, frame=1)
+    db.session.commit()
+
+    response = client.get(f'/homework/{homework.id}/pages/0/image')
+
+    assert response.mimetype == 'image/png'
+    with Image.open(io.BytesIO(response.data)) as img:
+        assert img.getpixel((0, 0))[:3] == (0, 0, 255)
+
+
+def test_pages_of_other_users_are_not_found(app, homework, pages):
+    homework.add_image(pages('a.png'))
+    other = User(username='other', email='other@example.com', password='x')
+    db.session.add(other)
+    db.session.commit()
+    other_client = app.test_client()
+    with other_client.session_transaction() as session:
+        session['_user_id'] = str(other.id)
+
+    assert other_client.get(f'/homework/{homework.id}/pages/0/image').status_code == 404
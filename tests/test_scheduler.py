@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+
+from app.gemini_call.backends import BackendError, BlockedResponseError, FakeBackend
+from app.gemini_call.scheduler import (CircuitBreaker, CircuitOpenError, ModelScheduler, ScheduledBackend, TokenBucket,
+                                       TOKENS_PER_IMAGE, estimate_tokens, scheduler_from_config)
+from config import Config
+
+
+class Flaky:
+    """Callable that raises the given errors in turn, then returns 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+def test_token_bucket_turns_debt_into_wait():
+    bucket = TokenBucket(per_minute=60, capacity=2)
+
+    assert bucket.reserve(1, now=bucket.updated) == 0
+    assert bucket.reserve(1, now=bucket.updated) == 0
+    assert bucket.reserve(1, now=bucket.updated) == pytest.approx(1.0)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("x" * 40) == 11
+    assert estimate_tokens([object(), "x" * 40]) == TOKENS_PER_IMAGE + 11
+
+
+def test_retryable_errors_are_retried():
+    scheduler = ModelScheduler(base_delay=0)
+    fn = Flaky(BackendError("503", retryable=True), BackendError("429", retryable=True, status=429))
+
+    assert scheduler.call(fn) == 'ok'
+    assert fn.calls == 3
+    assert scheduler.stats()['retries'] == 2
+    assert scheduler.stats()['throttled'] == 1
+
+
+def test_non_retryable_error_is_raised_at_once():
+    scheduler = ModelScheduler(base_delay=0)
+    fn = Flaky(BackendError("400 bad request"))
+
+    with pytest.raises(BackendError):
+        scheduler.call(fn)
+    assert fn.calls == 1
+    assert scheduler.stats()['failures'] == 1
+
+
+def test_retries_are_bounded():
+    scheduler = ModelScheduler(base_delay=0, max_retries=2)
+    fn = Flaky(*[BackendError("503", retryable=True)] * 5)
+
+    with pytest.raises(BackendError):
+        scheduler.call(fn)
+    assert fn.calls == 3
+
+
+def test_backoff_honors_retry_after():
+    scheduler = ModelScheduler(base_delay=0.01, max_delay=5, seed=1)
+
+    assert scheduler.backoff(0, BackendError("429", retry_after=2.0)) == 2.0
+    assert scheduler.backoff(0, BackendError("429", retry_after=60.0)) == 5
+
+
+def test_circuit_opens_after_consecutive_failures_and_probes_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    scheduler = ModelScheduler(breaker=breaker, max_retries=0)
+    for _ in range(2):
+        with pytest.raises(BackendError):
+            scheduler.call(Flaky(BackendError("500", retryable=True)))
+
+    assert breaker.state == 'open'
+    fn = Flaky()
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(fn)
+    assert fn.calls == 0
+
+    time.sleep(0.06)
+    assert scheduler.call(fn) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def open_breaker(scheduler):
+    for _ in range(scheduler.breaker.failure_threshold):
+        with pytest.raises(BackendError):
+            scheduler.call(Flaky(BackendError("500", retryable=True)))
+    time.sleep(scheduler.breaker.reset_timeout + 0.01)
+    assert scheduler.breaker.state == 'half_open'
+
+
+@pytest.mark.parametrize('error', [BackendError("429", retryable=True, status=429), BlockedResponseError("blocked")])
+def test_half_open_probe_answered_by_the_service_closes_the_circuit(error):
+    scheduler = ModelScheduler(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05), max_retries=0)
+    open_breaker(scheduler)
+
+    with pytest.raises(BackendError):
+        scheduler.call(Flaky(error))
+
+    assert scheduler.breaker.state == 'closed'
+    assert scheduler.call(Flaky()) == 'ok'
+
+
+def test_half_open_probe_that_crashes_reopens_the_circuit():
+    scheduler = ModelScheduler(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05), max_retries=0)
+    open_breaker(scheduler)
+
+    with pytest.raises(ValueError):
+        scheduler.call(Flaky(ValueError("unexpected")))
+
+    assert scheduler.breaker.state == 'open'
+    time.sleep(0.06)
+    assert scheduler.call(Flaky()) == 'ok'  # The next probe is let through
+
+
+def test_quota_errors_do_not_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1)
+    scheduler = ModelScheduler(breaker=breaker, max_retries=0)
+
+    with pytest.raises(BackendError):
+        scheduler.call(Flaky(BackendError("429", retryable=True, status=429)))
+
+    assert breaker.state == 'closed'
+
+
+def test_in_flight_calls_are_capped():
+    scheduler = ModelScheduler(max_in_flight=2)
+    peak = []
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            peak.append(scheduler.in_flight)
+        time.sleep(0.02)
+
+    threads = [threading.Thread(target=scheduler.call, args=(call,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+
+
+def test_scheduled_backend_rides_out_a_fake_quota():
+    backend = ScheduledBackend(FakeBackend(rate_limit_rate=0.3, seed=3), ModelScheduler(base_delay=0.001, max_retries=20))
+
+    for _ in range(10):
+        assert backend.generate("feedback prompt").text
+    assert backend.rate_limited > 0  # Read through to the wrapped FakeBackend
+
+
+def test_scheduler_from_config():
+    scheduler = scheduler_from_config(Config)
+
+    assert scheduler.max_in_flight == Config.GRADING_MAX_IN_FLIGHT
+    assert scheduler.breaker.failure_threshold == Config.GRADING_CIRCUIT_FAILURES
@@ -0,0 +1,82 @@
+import json
+
+from app.gemini_call.backends import BackendResponse, FakeBackend
+from app.gemini_call.gemini import MAX_REASKS, grade_answer_gemini
+from app.gemini_call.schema import extract_json, parse_page_response, reask_prompt
+from app.gemini_call.timing import StageTimings
+
+VALID = {"page_results": [{"question_number": 1, "score": 7, "analysis": "ok"}],
+         "image_modifications": [{"shape": "line", "coordinates": [0, 0, 1, 1]}]}
+
+
+class ScriptedResponses(FakeBackend):
+    """FakeBackend whose page calls return the given texts in turn; records the contents of each call."""
+
+    def __init__(self, texts):
+        super().__init__()
+        self.texts = list(texts)
+        self.page_calls = []
+
+    def generate(self, contents, response_schema=None):
+        if isinstance(contents, str):
+            return BackendResponse("feedback")
+        self.page_calls.append(contents)
+        return BackendResponse(self.texts.pop(0))
+
+
+def test_extract_json_tolerates_fences_and_prose():
+    assert extract_json("```json\n{\"a\": 1}\n```") == {"a": 1}
+    assert extract_json("Here you go: {\"a\": 1} hope it helps") == {"a": 1}
+
+
+def test_valid_response_parses():
+    assert parse_page_response(json.dumps(VALID)) == (VALID, [])
+
+
+def test_zero_means_no_answers():
+    assert parse_page_response("0") == ({"page_results": [], "image_modifications": []}, [])
+
+
+def test_schema_errors_are_reported_with_paths():
+    result, errors = parse_page_response(json.dumps({"page_results": [{"score": "high", "analysis": "x"}],
+                                                     "image_modifications": []}))
+
+    assert result is None
+    assert "$.page_results[0].question_number: missing" in errors
+    assert "$.page_results[0].score: expected number, got str" in errors
+
+
+def test_invalid_modifications_are_dropped_not_fatal():
+    response = dict(VALID, image_modifications=[{"shape": "star", "coordinates": [0, 0]}, VALID["image_modifications"][0]])
+
+    result, errors = parse_page_response(json.dumps(response))
+
+    assert errors == []
+    assert result["image_modifications"] == VALID["image_modifications"]
+
+
+def test_reask_prompt_lists_errors():
+    assert "- $.x: missing" in reask_prompt(["$.x: missing"])
+
+
+def test_only_the_failing_page_is_reasked(pages):
+    backend = ScriptedResponses(["not json", json.dumps(VALID), json.dumps(VALID)])
+    timings = StageTimings()
+
+    results = grade_answer_gemini([pages('problem.png')], [pages('a.png'), pages('b.png')], "rubric", 5,
+                                  backend=backend, timings=timings)
+
+    assert results["scores"] == [7, 7]
+    assert len(backend.page_calls) == 3
+    assert "Previous response:\nnot json" in backend.page_calls[1]
+    assert timings.counters["reask"] == 1
+
+
+def test_page_fails_after_max_reasks(pages):
+    backend = ScriptedResponses(["not json"] * (MAX_REASKS + 1))
+
+    results = grade_answer_gemini([pages('problem.png')], [pages('a.png')], "rubric", 5, backend=backend)
+
+    assert results["scores"] == [0]
+    assert "error" in results["analyses"][0]
+    assert results["page_fingerprints"] == [None]
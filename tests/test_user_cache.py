@@ -0,0 +1,70 @@
+import time
+
+from app.extensions import db
+from app.models import User, load_user, user_cache
+from app.user_cache import UserCache
+
+
+def make_user(n):
+    user = User(username=f'user{n}', email=f'user{n}@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_hit_returns_user_without_query(app):
+    cache = UserCache(User)
+    user = make_user(1)
+    cache.set(user)
+    db.session.expunge_all()
+
+    statements = []
+    listener = lambda *args: statements.append(args)
+    db.event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        cached = cache.get(user.id)
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert cached.username == 'user1'
+    assert statements == []
+    assert cache.stats()['hits'] == 1
+
+
+def test_entries_expire_after_ttl(app):
+    cache = UserCache(User, ttl=0.01)
+    user = make_user(1)
+    cache.set(user)
+    time.sleep(0.02)
+
+    assert cache.get(user.id) is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_least_recently_used_user_is_evicted(app):
+    cache = UserCache(User, max_size=2)
+    users = [make_user(n) for n in range(3)]
+    cache.set(users[0])
+    cache.set(users[1])
+    cache.get(users[0].id)
+    cache.set(users[2])
+
+    assert cache.get(users[1].id) is None
+    assert cache.get(users[0].id) is not None
+
+
+def test_updating_a_user_invalidates_its_entry(app):
+    user_cache.clear()
+    user = make_user(1)
+    assert load_user(str(user.id)) is not None
+    assert user_cache.stats()['size'] == 1
+
+    user.username = 'renamed'
+    db.session.commit()
+
+    assert user_cache.stats()['size'] == 0
+    assert load_user(str(user.id)).username == 'renamed'
+
+
+def test_load_user_rejects_malformed_ids(app):
+    assert load_user('not-a-uuid') is None